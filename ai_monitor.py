@@ -1,247 +1,453 @@
 # ai_monitor.py
-import re, time, os, json
-import pandas as pd
+import time, os, atexit
 import numpy as np
 from datetime import datetime, timedelta
 from collections import deque, defaultdict, Counter
-from sklearn.preprocessing import StandardScaler
-import tensorflow as tf
-from tensorflow import keras
-from telegram import Bot
-import asyncio
-from config import TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, MIN_WARMUP, RETRAIN_EVERY, LOG_FILE
+from config import (MIN_WARMUP, RETRAIN_EVERY, LOG_FILE, WARMUP_EPOCHS, RETRAIN_EPOCHS,
+                    RETRAIN_BACKGROUND, RETRAIN_WARM_START, OFFSET_FILE, TAIL_POLL_SEC,
+                    ANOMALY_DB, ANOMALY_OUTPUTS, ROLLUPS_ENABLED, DETECT_WORKERS,
+                    METRICS_PORT, METRICS_HOST, CHECKPOINT_DIR, DETECTOR, THRESHOLD_SEED_ROWS,
+                    LOG_FORMAT, BINARY_LOG_FILE, BINARY_OFFSET_FILE, INGEST_ADDRESS)
+from features import featurize
+from tx_buffer import TxRingBuffer
+from tx_parser import parse_block, format_lines
+from window_rules import WindowRuleEngine
+from rules import evaluate_batch, add_composite, mask_to_types, BIT
+from alerts import AlertDispatcher
+from retrainer import BackgroundTrainer, ModelState
+from fast_infer import reconstruction_error
+from detectors import make_detector, detector_of
+from tailer import LogTailer
+from tx_binary import BinaryTailer
+from ingest import IngestServer
+from anomaly_sink import AnomalySink
+from anomaly_store import AnomalyStore
+from rollups import RollupAggregator, RollupStore
+from parallel import ShardPool, scoring_state
+from metrics import REGISTRY
+from checkpoint import save_checkpoint, load_latest
+from thresholds import ThresholdTracker
 
 # ---- anomaly output file ----
 ANOMALY_FILE = LOG_FILE + ".anomalies.jsonl"
 
-# ---- Telegram bot ----
-bot = Bot(token=TELEGRAM_TOKEN)
-def send_alert(msg):
-    asyncio.run(send_alert_async(msg))
-    
-async def send_alert_async(msg):
+# ---- Telegram alerts (background dispatcher, see alerts.py) ----
+dispatcher = AlertDispatcher()
+atexit.register(dispatcher.close)
+
+def send_alert(msg, key=None):
+    """Queue an alert without blocking detection; alerts sharing a key may be merged."""
     print(msg)
-    try:
-        await bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=msg)
-    except Exception as e:
-        print("Telegram send failed:", e)
-
-
-# ---- parsing ----
-TX_PATTERN = re.compile(
-    r"\[(?P<ts>[^\]]+)\]\s+status=(?P<status>\w+)\s+latency=(?P<lat>[\d\.]+)ms\s+merchant=(?P<merchant>\S+)\s+region=(?P<region>\S+)\s+amount=(?P<amount>[\d\.]+)"
-)
-
-def parse_lines(lines):
-    rows = []
-    for L in lines:
-        m = TX_PATTERN.search(L)
-        if m:
-            d = m.groupdict()
-            rows.append({
-                "timestamp": d["ts"],
-                "status": 1 if d["status"]=="SUCCESS" else 0,
-                "latency": float(d["lat"]),
-                "merchant": d["merchant"],
-                "region": d["region"],
-                "amount": float(d["amount"]),
-                "raw": L.strip()
-            })
-    if not rows:
-        return pd.DataFrame(columns=["timestamp","status","latency","merchant","region","amount","raw"])
-    return pd.DataFrame(rows)
-
-# ---- feature engineering ----
-def featurize(df, merchant_map=None, region_map=None, scaler:StandardScaler=None):
-    # map merchants and regions to integers (consistent mapping)
-    if merchant_map is None:
-        merchant_map = {m:i for i,m in enumerate(sorted(df["merchant"].unique()))}
-    if region_map is None:
-        region_map = {r:i for i,r in enumerate(sorted(df["region"].unique()))}
-    df = df.copy()
-    df["merchant_id"] = df["merchant"].map(merchant_map).fillna(-1).astype(int)
-    df["region_id"] = df["region"].map(region_map).fillna(-1).astype(int)
-
-    # numeric features: latency, amount, status, merchant_id, region_id, hour
-    df["hour"] = pd.to_datetime(df["timestamp"]).dt.hour
-    X = df[["latency","amount","status","merchant_id","region_id","hour"]].astype(float).values
-
-    # scale
-    if scaler is None:
-        scaler = StandardScaler()
-        Xs = scaler.fit_transform(X)
-    else:
-        Xs = scaler.transform(X)
-    return Xs, scaler, merchant_map, region_map
+    dispatcher.submit(msg, key)
 
-# ---- AutoEncoder model builder ----
-def build_autoencoder(input_dim):
-    inputs = keras.Input(shape=(input_dim,))
-    x = keras.layers.Dense(32, activation="relu")(inputs)
-    x = keras.layers.Dense(16, activation="relu")(x)
-    encoded = keras.layers.Dense(8, activation="relu")(x)
 
-    x = keras.layers.Dense(16, activation="relu")(encoded)
-    x = keras.layers.Dense(32, activation="relu")(x)
-    outputs = keras.layers.Dense(input_dim, activation="linear")(x)
+# ---- training (runs on the BackgroundTrainer thread) ----
+def train_model(frame, prev=None, epochs=RETRAIN_EPOCHS, warm_start=False, detector=DETECTOR):
+    """Fit a detector (see detectors.py) on a buffer snapshot and derive its initial threshold.
 
-    model = keras.Model(inputs, outputs)
-    model.compile(optimizer="adam", loss="mse")
-    return model
+    Retrains keep the previous feature maps and scaler; with warm_start the
+    autoencoder starts from the previous weights instead of random init,
+    incremental detectors always continue from the previous statistics.
+    """
+    if prev is None:
+        X, scaler, merchant_map, region_map = featurize(frame, None, None, None)
+    else:
+        X, scaler, merchant_map, region_map = featurize(frame, prev.merchant_map, prev.region_map, prev.scaler)
+    det = make_detector(detector)
+    prev_det = detector_of(prev) if prev is not None else None
+    if prev_det is not None and prev_det.name != det.name:
+        prev_det = None   # backend changed in config: start fresh, keep maps and scaler
+    det.fit(X, prev_det, epochs=epochs, warm_start=warm_start)
+    # starting point only: the monitor keeps the threshold up to date from the scored batches
+    seed_scores = det.score(X[-THRESHOLD_SEED_ROWS:])
+    threshold = det.threshold(seed_scores)
+    seed = (frame[["timestamp", "merchant"]].tail(len(seed_scores)).reset_index(drop=True), seed_scores)
+    version = prev.version + 1 if prev is not None else 1
+    return ModelState(getattr(det, "model", None), scaler, merchant_map, region_map, threshold, len(X), version, 0.0,
+                      det if det.portable else None, seed)
+
+# ---- Monitor ----
+class Monitor:
+    """Detection pipeline state: rolling buffer, model state, trainer and windows.
+
+    Feed parsed batches (see tx_parser) in log order with process_batch();
+    monitor_log() drives it from the log tailer.
+    """
+
+    def __init__(self, anomaly_file=ANOMALY_FILE, anomaly_db=ANOMALY_DB, outputs=ANOMALY_OUTPUTS, alert=None,
+                 retrain_every=RETRAIN_EVERY, rollups=ROLLUPS_ENABLED, metrics=None, checkpoint_dir=None):
+        # rolling buffer for training (parsed columns, each line parsed once)
+        self.buffer = TxRingBuffer(capacity=5000)  # keep recent 5000 transactions
+        self.state = None       # current ModelState; replaced as a whole when a retrain finishes
+        self.thresholds = ThresholdTracker()   # streaming score quantiles of the current model
+        self.checkpoint_dir = checkpoint_dir   # every trained model is saved here (see checkpoint.py); live monitor only
+        self.trainer = BackgroundTrainer(self.train, background=RETRAIN_BACKGROUND)
+        self.warmed_up = False
+        self.processed = 0
+        self.retrain_every = retrain_every
+        # short-term structures for behavioral rules
+        self.windows = WindowRuleEngine()  # burst / card_testing / merchant_spike (see config.py)
+        self.sink = AnomalySink(anomaly_file) if "jsonl" in outputs else None
+        self.store = AnomalyStore(anomaly_db) if "sqlite" in outputs else None
+        # per-minute / per-hour transaction metrics for the dashboard
+        self.rollups = RollupAggregator(RollupStore(anomaly_db)) if rollups else None
+        self.alert = alert or send_alert
+        self.metrics = metrics or REGISTRY   # stage timings / counters (see metrics.py)
+
+    def train(self, frame, prev=None, **kwargs):
+        """train_model() plus a checkpoint of the result (runs on the trainer thread)."""
+        state = train_model(frame, prev, **kwargs)
+        if self.checkpoint_dir:
+            try:
+                save_checkpoint(state, self.checkpoint_dir)
+            except Exception as e:
+                print("Failed to save model checkpoint:", e)
+        return state
+
+    def restore(self):
+        """Start from the newest checkpoint, skipping the warmup; False if there is none."""
+        state = load_latest(self.checkpoint_dir) if self.checkpoint_dir else None
+        if state is None:
+            return False
+        self.use_model(state)
+        print(f"Model v{state.version} restored from checkpoint. threshold:", state.threshold)
+        self.alert(f"♻️ AI model v{state.version} restored from checkpoint. anomaly threshold={state.threshold:.4f}")
+        return True
+
+    def poll_model(self):
+        """Swap in a finished model (model, scaler, maps and threshold together)."""
+        trained = self.trainer.poll()
+        if trained is None:
+            if self.state is None and self.warmed_up and not self.trainer.busy and self.processed >= MIN_WARMUP:
+                # the warmup training failed: try again once as many new rows have arrived
+                print(f"Retrying {DETECTOR} detector training ({len(self.buffer)} rows)...")
+                self.trainer.submit(self.buffer.to_frame(), None, epochs=WARMUP_EPOCHS)
+                self.processed = 0
+            return
+        retrained = self.state is not None
+        state = trained
+        self.use_model(state)
+        self.metrics.observe("retrain_seconds", state.train_sec)
+        print(f"Model v{state.version} ready in {state.train_sec:.1f}s. threshold set to:", state.threshold)
+        if retrained:
+            self.alert(f"🔁 AI model retrained on {state.n_samples} samples. new threshold={state.threshold:.4f}")
+        else:
+            self.alert(f"✅ AI model trained on {state.n_samples} samples. anomaly threshold={state.threshold:.4f}")
+
+    def use_model(self, state):
+        """Detect with state from now on (also used to start from a fixed, pre-trained state)."""
+        prev, self.state = self.state, state
+        self.warmed_up = True
+        # scores of a new model have their own scale: keep the score history moved to that scale,
+        # or start over from the new model's scores on its training tail
+        if prev is None or not self.thresholds.rescale(prev.threshold, state.threshold):
+            self.thresholds.reset(state.threshold)
+            if state.seed is not None:
+                self.thresholds.update(*state.seed)
+        self.metrics.set("model_version", state.version)
+        self.metrics.set("model_threshold", self.thresholds.global_threshold())
+
+    def score(self, new_df):
+        """Autoencoder reconstruction error per row, or None before the first model."""
+        state = self.state
+        if state is None:
+            return None
+        with self.metrics.timer("featurize"):
+            X_new, _, _, _ = featurize(new_df, state.merchant_map, state.region_map, state.scaler)
+        with self.metrics.timer("predict"):
+            if state.scorer is not None:
+                return state.scorer.score(X_new)
+            return reconstruction_error(state.model, X_new)
+
+    def ingest(self, new_df):
+        """Buffer and rollup bookkeeping; False until the warmup batch has been seen."""
+        if not new_df.empty:
+            with self.metrics.timer("buffer"):
+                self.buffer.extend(new_df)
+            if self.rollups is not None:
+                with self.metrics.timer("rollups"):
+                    self.rollups.add_batch(new_df)
+                    self.rollups.maybe_flush()
+
+        # initial warmup: collect MIN_WARMUP then train
+        if not self.warmed_up:
+            if len(self.buffer) >= MIN_WARMUP:
+                print(f"Warmup reached ({len(self.buffer)}). Training {DETECTOR} detector...")
+                self.trainer.submit(self.buffer.to_frame(), None, epochs=WARMUP_EPOCHS)
+                self.warmed_up = True
+                self.processed = 0
+            return False
+        return True
+
+    def process_batch(self, new_df):
+        """Run detection on one parsed batch; returns the anomaly records."""
+        if new_df.empty or not self.ingest(new_df):
+            return []
+
+        # online detection for the new lines only; rules run while the
+        # first model is still training, the autoencoder joins once ready
+        rec_err = self.score(new_df)
+        threshold = self.threshold(new_df, rec_err)
+
+        # rule-based detection as column masks over the whole batch
+        with self.metrics.timer("rules"):
+            masks = evaluate_batch(new_df, rec_err, threshold, self.windows)
+        self.update_threshold(new_df, rec_err)
+        records = self.emit(new_df, masks, rec_err)
+        self.maybe_retrain(len(new_df))
+        return records
+
+    def threshold(self, new_df, rec_err):
+        """Per-row threshold from the scores seen so far (None without scores)."""
+        if rec_err is None:
+            return None
+        with self.metrics.timer("threshold"):
+            return self.thresholds.thresholds(new_df)
+
+    def update_threshold(self, new_df, rec_err):
+        if rec_err is None:
+            return
+        with self.metrics.timer("threshold"):
+            self.thresholds.update(new_df, rec_err)
+        self.metrics.set("model_threshold", self.thresholds.global_threshold())
+
+    @property
+    def pending(self):
+        """Batches accepted by process_batch() whose records are not written yet."""
+        return 0
+
+    def flush(self):
+        """Finish pending batches; returns their anomaly records."""
+        return []
+
+    def maybe_retrain(self, n_rows):
+        # periodic retrain to adapt to concept drift (detection keeps the current model)
+        self.processed += n_rows
+        state = self.state
+        if state is not None and self.processed >= self.retrain_every and not self.trainer.busy:
+            print("Retraining detector with latest buffer...")
+            frame = self.buffer.to_frame()
+            if getattr(state.scorer, "incremental", False) and state.scorer.name == DETECTOR:
+                frame = frame.tail(self.processed)   # only the rows since the last fit
+            self.trainer.submit(frame, state, epochs=RETRAIN_EPOCHS, warm_start=RETRAIN_WARM_START)
+            self.processed = 0
+
+    def emit(self, new_df, masks, rec_err):
+        """Write and alert the flagged rows of a batch; returns their records."""
+        metrics = self.metrics
+        metrics.set("last_batch_timestamp_seconds", time.time())
+        with metrics.timer("records"):
+            records = self.build_records(new_df, masks, rec_err)
+        if not records:
+            return records
+        with metrics.timer("write"):
+            self.write_anomalies(records)
+        with metrics.timer("alert"):
+            for an in records:
+                # send Telegram (concise); same type sets are coalesced into digests
+                self.alert(f"🚨 Anomaly [{', '.join(an['types'])}] merchant={an['merchant']} amount={an['amount']} latency={an['latency']:.1f} err={an['err']}",
+                           key=", ".join(an["types"]))
+        metrics.inc("anomaly_records_total", len(records))
+        for t, bit in BIT.items():
+            n = int(np.count_nonzero(masks & bit))
+            if n:
+                metrics.inc("anomalies_total", n, type=t)
+        return records
+
+    @staticmethod
+    def build_records(new_df, masks, rec_err):
+        """Anomaly records for the flagged rows of a batch."""
+        flagged = np.flatnonzero(masks)
+        if not len(flagged):
+            return []
+        detected_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        def col(name):
+            return new_df[name].to_numpy()[flagged].tolist()
+        # datetime_as_string formats the whole column in C ("YYYY-MM-DDTHH:MM:SS")
+        ts = new_df["timestamp"].to_numpy(dtype="datetime64[ns]")[flagged].astype("datetime64[s]")
+        ts_str = [t.replace("T", " ") for t in np.datetime_as_string(ts).tolist()]
+        errs = rec_err[flagged].tolist() if rec_err is not None else [None] * len(flagged)
+        # binary logs carry no line text: rebuild it for the flagged rows only
+        raws = col("raw") if "raw" in new_df.columns else format_lines(new_df.iloc[flagged])
+        records = []
+        for mask, t, merchant, region, amount, latency, status, err, raw in zip(
+                masks[flagged].tolist(), ts_str, col("merchant"), col("region"), col("amount"),
+                col("latency"), col("status"), errs, raws):
+            records.append({
+                "detected_at": detected_at,
+                "timestamp": t,
+                "merchant": merchant,
+                "region": region,
+                "amount": float(amount),
+                "latency": float(latency),
+                "status": int(status),
+                "types": list(mask_to_types(mask)),
+                "err": float(err) if mask & BIT["autoencoder"] else None,
+                "raw": raw
+            })
+        return records
+
+    def write_anomalies(self, records):
+        # append the whole batch to the anomaly file in one write
+        if self.sink is not None:
+            try:
+                self.sink.write_batch(records)
+            except Exception as e:
+                print("Failed to write anomaly file:", e)
+        # and to the indexed store queried by the dashboard (one transaction)
+        if self.store is not None:
+            try:
+                self.store.insert_many(records)
+            except Exception as e:
+                print("Failed to write anomaly store:", e)
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+        if self.store is not None:
+            self.store.close()
+        if self.rollups is not None:
+            self.rollups.flush(final=True)
+            self.rollups.store.close()
+        self.trainer.shutdown(wait=False)
+
+class ShardedMonitor(Monitor):
+    """Monitor with scoring and per-merchant rules spread over worker processes.
+
+    Batches are split by merchant across DETECT_WORKERS processes (see
+    parallel.ShardPool), which featurize, score and run the single-row and
+    card_testing / merchant_spike rules. This process stays the reader and
+    the aggregator: it keeps the buffer, rollups and trainer, applies the
+    global burst window and the composite rule to the merged masks in log
+    order, and writes every record to the one sink/store. process_batch()
+    returns the records of the batches that finished meanwhile.
+    """
+
+    def __init__(self, workers=DETECT_WORKERS, **kwargs):
+        # fork the workers before the trainer / alert threads exist
+        self.pool = ShardPool(workers)
+        super().__init__(**kwargs)
+
+    def use_model(self, state):
+        # batches in flight were scored by the previous model: finish them with its thresholds
+        self.flush()
+        super().use_model(state)
+        self.pool.set_model(scoring_state(state))
+
+    def process_batch(self, new_df):
+        if self.ingest(new_df):
+            rec_err = None
+            if self.state is not None and self.state.scorer is None:
+                rec_err = self.score(new_df)   # Keras fallback stays in this process
+            with self.metrics.timer("dispatch"):
+                self.pool.submit(new_df, rec_err, tag=new_df)
+            self.maybe_retrain(len(new_df))
+        return self.collect()
+
+    def collect(self, wait=False):
+        records = []
+        with self.metrics.timer("shard_wait"):
+            done = self.pool.results(wait)
+        for new_df, masks, rec_err in done:
+            if new_df.empty:
+                continue
+            threshold = self.threshold(new_df, rec_err)
+            with self.metrics.timer("rules"):
+                if threshold is not None:
+                    masks[rec_err > threshold] |= BIT["autoencoder"]
+                ts = new_df["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+                masks[self.windows.evaluate_burst(ts)] |= BIT["burst"]
+                add_composite(masks)
+            self.update_threshold(new_df, rec_err)
+            records += self.emit(new_df, masks, rec_err)
+        return records
+
+    @property
+    def pending(self):
+        return len(self.pool)
+
+    def flush(self):
+        return self.collect(wait=True)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.pool.close()
+            super().close()
+
+def create_monitor(workers=DETECT_WORKERS, **kwargs):
+    """Single-process Monitor, or ShardedMonitor when workers > 0."""
+    if workers > 0:
+        return ShardedMonitor(workers, **kwargs)
+    return Monitor(**kwargs)
 
 # ---- Monitor loop ----
+def start_monitor():
+    """create_monitor() restored from the last checkpoint, with its metrics published."""
+    # only the live monitor reads and writes CHECKPOINT_DIR (benchmarks / tests must not replace its models)
+    monitor = create_monitor(checkpoint_dir=CHECKPOINT_DIR)
+    atexit.register(monitor.close)
+    # detect right away with the last saved model instead of waiting for MIN_WARMUP lines
+    monitor.restore()
+
+    # gauges refreshed whenever metrics are rendered (HTTP scrape / textfile)
+    metrics = monitor.metrics
+    def collect_gauges():
+        metrics.set("pending_batches", monitor.pending)
+        for outcome, n in dispatcher.stats.items():
+            metrics.set("alerts_total", n, outcome=outcome)
+    metrics.add_collector(collect_gauges)
+    if METRICS_PORT:
+        host, port = metrics.serve(METRICS_PORT, METRICS_HOST)
+        print(f"Metrics at http://{host}:{port}/metrics")
+    return monitor
+
+def monitor_ingest(address=INGEST_ADDRESS):
+    """Detect on batches sent by producers over a socket (see ingest.py) instead of tailing a file."""
+    IngestServer(start_monitor(), address).run()
+
 def monitor_log():
-    # rolling buffer for training (deque of raw lines)
-    buffer_lines = deque(maxlen=5000)  # keep recent 5000 lines
-    merchant_map = None
-    region_map = None
-    scaler = None
-    model = None
-    threshold = None
-    processed = 0
-
-    # short-term structures for behavioral rules
-    recent_window = deque()  # (timestamp:datetime, merchant, amount)
-    merchant_windows = defaultdict(deque)  # merchant -> deque of timestamps
-    WINDOW_SEC = 60  # sliding window for velocity/spike/card testing
-
-    last_size = 0
-    print("Starting AI monitor - watching", LOG_FILE)
+    monitor = start_monitor()
+    metrics = monitor.metrics
+    # resumes from the committed offset in OFFSET_FILE after a restart
+    binary = LOG_FORMAT == "binary"
+    log_file = BINARY_LOG_FILE if binary else LOG_FILE
+    tailer = BinaryTailer(log_file, BINARY_OFFSET_FILE) if binary else LogTailer(log_file, OFFSET_FILE)
+    positions = deque()   # tailer position after each batch handed to the monitor
+    metrics.add_collector(lambda: metrics.set("lag_bytes", tailer.lag_bytes()))
+
+    print("Starting AI monitor - watching", log_file)
+    if not os.path.exists(log_file):
+        print("Log file not found. waiting...")
     while True:
-        if not os.path.exists(LOG_FILE):
-            print("Log file not found. waiting...")
-            time.sleep(2); continue
-
-        # read new lines (tail-like)
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            f.seek(last_size)
-            new_lines = f.readlines()
-            last_size = f.tell()
-
-        if new_lines:
-            for l in new_lines:
-                buffer_lines.append(l)
-
-            buffer_df = parse_lines(list(buffer_lines))
-            if buffer_df.empty:
-                time.sleep(1); continue
-
-            # initial warmup: collect MIN_WARMUP then train
-            if model is None and len(buffer_df) >= MIN_WARMUP:
-                print(f"Warmup reached ({len(buffer_df)}). Training AutoEncoder...")
-                X, scaler, merchant_map, region_map = featurize(buffer_df, None, None, None)
-                model = build_autoencoder(X.shape[1])
-                model.fit(X, X, epochs=20, batch_size=32, verbose=0)
-                rec = np.mean((model.predict(X) - X)**2, axis=1)
-                threshold = np.percentile(rec, 97.5)
-                print("Model trained. threshold set to:", threshold)
-                send_alert(f"✅ AI model trained on {len(X)} samples. anomaly threshold={threshold:.4f}")
-                processed = len(buffer_df)
-                continue
-
-            # after model exists: do online detection for the new_lines only
-            if model is not None:
-                new_df = parse_lines(new_lines)
-                if not new_df.empty:
-                    # autoencoder detection
-                    X_new, _, _, _ = featurize(new_df, merchant_map, region_map, scaler)
-                    X_pred = model.predict(X_new)
-                    rec_err = np.mean((X_pred - X_new)**2, axis=1)
-                    idxs = np.where(rec_err > threshold)[0]
-
-                    # behavioral / rule-based detection per row
-                    now = datetime.utcnow()
-                    for i, row in new_df.reset_index(drop=True).iterrows():
-                        types = []
-                        # autoencoder flag
-                        if i in idxs:
-                            types.append("autoencoder")
-
-                        # rule thresholds
-                        if row["latency"] > 1000:
-                            types.append("high_latency")
-                        if row["amount"] > 500000:   # 고액 기준 (환경에 맞게 조정)
-                            types.append("high_amount")
-                        if str(row["merchant"]).startswith("odd_"):
-                            types.append("unknown_merchant")
-                        if str(row["region"]).startswith("odd_region"):
-                            types.append("unknown_region")
-                        if row["status"] == 0:
-                            types.append("failure")
-                        hour = pd.to_datetime(row["timestamp"]).hour
-                        if hour in {0,1,2,3,4}:
-                            types.append("off_hour")
-
-                        # update short-term windows for behavioral patterns
-                        ts = pd.to_datetime(row["timestamp"])
-                        recent_window.append((ts, row["merchant"], row["amount"]))
-                        merchant_windows[row["merchant"]].append(ts)
-
-                        # pop expired
-                        cutoff = ts - pd.Timedelta(seconds=WINDOW_SEC)
-                        while recent_window and recent_window[0][0] < cutoff:
-                            recent_window.popleft()
-                        while merchant_windows[row["merchant"]] and merchant_windows[row["merchant"]][0] < cutoff:
-                            merchant_windows[row["merchant"]].popleft()
-
-                        # burst: many overall transactions in short time
-                        if len([x for x in recent_window if x[0] >= cutoff]) >= 8:
-                            types.append("burst")
-
-                        # card testing: same merchant small amounts many times in window
-                        small_count = sum(1 for t,m,a in recent_window if m == row["merchant"] and a < 2000)
-                        if small_count >= 6:
-                            types.append("card_testing")
-
-                        # merchant spike / velocity: merchant had many tx in window
-                        if len(merchant_windows[row["merchant"]]) >= 10:
-                            types.append("merchant_spike")
-
-                        # composite: multiple flags
-                        if sum(1 for _ in types) >= 3:
-                            types.append("composite")
-
-                        if types:
-                            # prepare anomaly record
-                            an = {
-                                "detected_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                "timestamp": row["timestamp"],
-                                "merchant": row["merchant"],
-                                "region": row["region"],
-                                "amount": float(row["amount"]),
-                                "latency": float(row["latency"]),
-                                "status": int(row["status"]),
-                                "types": sorted(list(set(types))),
-                                "err": float(rec_err[i]) if i in idxs else None,
-                                "raw": row.get("raw", "")
-                            }
-                            # append to anomaly file
-                            try:
-                                os.makedirs(os.path.dirname(ANOMALY_FILE) or ".", exist_ok=True)
-                                with open(ANOMALY_FILE, "a", encoding="utf-8") as af:
-                                    af.write(json.dumps(an, ensure_ascii=False) + "\n")
-                            except Exception as e:
-                                print("Failed to write anomaly file:", e)
-
-                            # send Telegram (concise)
-                            try:
-                                send_alert(f"🚨 Anomaly [{', '.join(an['types'])}] merchant={an['merchant']} amount={an['amount']} latency={an['latency']:.1f} err={an['err']}")
-                            except Exception:
-                                pass
-
-                    # periodic retrain to adapt to concept drift
-                    processed += len(new_df)
-                    if processed >= RETRAIN_EVERY:
-                        print("Retraining AutoEncoder with latest buffer...")
-                        X_full, scaler, merchant_map, region_map = featurize(buffer_df, merchant_map, region_map, scaler)
-                        model = build_autoencoder(X_full.shape[1])
-                        model.fit(X_full, X_full, epochs=10, batch_size=32, verbose=0)
-                        rec = np.mean((model.predict(X_full) - X_full)**2, axis=1)
-                        threshold = np.percentile(rec, 97.5)
-                        processed = 0
-                        send_alert(f"🔁 AI model retrained on {len(X_full)} samples. new threshold={threshold:.4f}")
-
-        time.sleep(1)
+        monitor.poll_model()
+        metrics.maybe_flush()
+        with metrics.timer("read"):
+            data = tailer.read()   # text block, or zero-copy records of a binary log
+        if len(data):
+            with metrics.timer("parse"):
+                new_df, malformed = (tailer.to_frame(data), 0) if binary else parse_block(data)
+            metrics.inc("lines_ingested_total", len(new_df) + malformed)
+            metrics.inc("parse_failures_total", malformed)
+            metrics.inc("batches_total")
+            monitor.process_batch(new_df)
+            positions.append(tailer.position())
+        elif monitor.pending:
+            monitor.flush()
+        else:
+            tailer.wait(TAIL_POLL_SEC)   # wakes on file change (inotify) or after the poll interval
+            continue
+        # lines are committed only after their anomalies were written
+        done = None
+        while len(positions) > monitor.pending:
+            done = positions.popleft()
+        if done is not None:
+            with metrics.timer("commit"):
+                tailer.commit(done)
 
 if __name__ == "__main__":
-    monitor_log()
+    if INGEST_ADDRESS:
+        monitor_ingest()
+    else:
+        monitor_log()
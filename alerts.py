@@ -0,0 +1,199 @@
+# alerts.py
+# non-blocking Telegram alert dispatcher: bounded queue, coalescing, rate limiting, retries
+import asyncio, threading, time
+from collections import deque
+from config import (TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, TELEGRAM_API_BASE, ALERT_QUEUE_SIZE,
+                    ALERT_OVERFLOW, ALERT_COALESCE_SEC, ALERT_RATE_PER_SEC, ALERT_BURST,
+                    ALERT_MAX_RETRIES, ALERT_BACKOFF_SEC)
+
+DIGEST_PREVIEW = 5   # messages quoted in a digest before "+N more"
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, at most `capacity` stored."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def acquire(self):
+        self._refill()
+        while self._tokens < 1:
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+            self._refill()
+        self._tokens -= 1
+
+def telegram_sender(token=TELEGRAM_TOKEN, chat_id=TELEGRAM_CHAT_ID, api_base=TELEGRAM_API_BASE):
+    """Return (send, close) coroutines sharing one telegram.Bot session."""
+    from telegram import Bot
+    bot = Bot(token=token, base_url=api_base.rstrip("/") + "/bot")
+    initialized = False
+
+    async def send(text):
+        nonlocal initialized
+        if not initialized:
+            await bot.initialize()
+            initialized = True
+        await bot.send_message(chat_id=chat_id, text=text)
+
+    async def close():
+        if initialized:
+            await bot.shutdown()
+
+    return send, close
+
+class AlertDispatcher:
+    """Sends alerts from a background thread that owns one event loop.
+
+    submit() never blocks the caller: alerts go into a bounded queue and, when
+    it is full, either the oldest queued alert (drop_oldest) or the new one
+    (drop_new) is dropped. Alerts submitted with the same key within
+    coalesce_sec are merged into one digest message. Sends are rate limited by
+    a token bucket and retried with exponential backoff (honouring
+    retry_after when the API reports one).
+
+    `sender` is an optional (send, close) pair of coroutine functions; by
+    default a Telegram bot is used (see TELEGRAM_API_BASE).
+    """
+
+    def __init__(self, sender=None, maxsize=ALERT_QUEUE_SIZE, overflow=ALERT_OVERFLOW,
+                 coalesce_sec=ALERT_COALESCE_SEC, rate=ALERT_RATE_PER_SEC, burst=ALERT_BURST,
+                 max_retries=ALERT_MAX_RETRIES, backoff_sec=ALERT_BACKOFF_SEC):
+        if overflow not in ("drop_oldest", "drop_new"):
+            raise ValueError(f"unknown overflow policy: {overflow}")
+        self._sender = sender
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.coalesce_sec = coalesce_sec
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_sec = backoff_sec
+
+        self._queue = deque()           # (key, text)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._thread = None
+        self._closing = False
+        self.stats = {"submitted": 0, "dropped": 0, "sent": 0, "failed": 0, "digests": 0}
+
+    # ---- caller side ----
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name="alert-dispatcher", daemon=True)
+            self._thread.start()
+        ready.wait()
+
+    def submit(self, text, key=None):
+        """Queue an alert; returns False if it was dropped."""
+        if self._thread is None:
+            self.start()
+        accepted = True
+        with self._lock:
+            self.stats["submitted"] += 1
+            if len(self._queue) >= self.maxsize:
+                self.stats["dropped"] += 1
+                if self.overflow == "drop_new":
+                    accepted = False
+                else:
+                    self._queue.popleft()
+            if accepted:
+                self._queue.append((key, text))
+        if accepted:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return accepted
+
+    def close(self, timeout=10.0):
+        """Flush queued alerts (up to timeout) and stop the background loop."""
+        if self._thread is None:
+            return
+        self._closing = True
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+        self._thread.join(timeout)
+
+    # ---- dispatcher thread ----
+    def _run(self, ready):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        ready.set()
+        try:
+            self._loop.run_until_complete(self._main())
+        finally:
+            self._loop.close()
+
+    def _drain(self):
+        with self._lock:
+            batch = list(self._queue)
+            self._queue.clear()
+        return batch
+
+    def _coalesce(self, batch):
+        """Group by key (keeping first-seen order); key None is never merged."""
+        groups = {}
+        out = []
+        for key, text in batch:
+            if key is not None and key in groups:
+                groups[key][1].append(text)
+                continue
+            group = (key, [text])
+            if key is not None:
+                groups[key] = group
+            out.append(group)
+        messages = []
+        for key, texts in out:
+            if len(texts) == 1:
+                messages.append(texts[0])
+                continue
+            self.stats["digests"] += 1
+            lines = texts[:DIGEST_PREVIEW]
+            if len(texts) > DIGEST_PREVIEW:
+                lines.append(f"... +{len(texts) - DIGEST_PREVIEW} more")
+            messages.append(f"🧾 {len(texts)}x [{key}] within {self.coalesce_sec:g}s\n" + "\n".join(lines))
+        return messages
+
+    async def _deliver(self, send, text):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await send(text)
+                self.stats["sent"] += 1
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.stats["failed"] += 1
+                    print("Telegram send failed:", e)
+                    return
+                delay = getattr(e, "retry_after", None)
+                if hasattr(delay, "total_seconds"):
+                    delay = delay.total_seconds()
+                await asyncio.sleep(delay or self.backoff_sec * (2 ** attempt))
+
+    async def _main(self):
+        send, close = self._sender or telegram_sender()
+        bucket = TokenBucket(self.rate, self.burst)
+        try:
+            while True:
+                if not self._queue:
+                    if self._closing:
+                        break
+                    await self._wakeup.wait()
+                    self._wakeup.clear()
+                    continue
+                if not self._closing and self.coalesce_sec > 0:
+                    # give similar alerts a moment to accumulate
+                    await asyncio.sleep(self.coalesce_sec)
+                for text in self._coalesce(self._drain()):
+                    await bucket.acquire()
+                    await self._deliver(send, text)
+        finally:
+            await close()
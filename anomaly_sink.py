@@ -0,0 +1,93 @@
+# anomaly_sink.py
+# buffered JSONL writer for anomaly records (format read by app.py unchanged)
+import json, os, time
+from config import ANOMALY_FSYNC, ANOMALY_FSYNC_SEC, ANOMALY_ROTATE_BYTES, ANOMALY_ROTATE_SEC, ANOMALY_BACKUPS
+
+try:
+    import orjson   # optional, much faster encoder
+except ImportError:
+    orjson = None
+
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+def encode_record(record):
+    """One JSONL line (str, with newline) for an anomaly record."""
+    if orjson is not None:
+        return orjson.dumps(record).decode("utf-8") + "\n"
+    return _encode(record) + "\n"
+
+class AnomalySink:
+    """Keeps the anomaly file open and writes one batch per poll cycle.
+
+    fsync: "never" (flush to the OS only), "batch" (fsync after every
+    write_batch) or "interval" (at most every fsync_sec). The file is
+    rotated to path.1 .. path.N when it exceeds rotate_bytes or is older
+    than rotate_sec (0 disables either check).
+    """
+
+    def __init__(self, path, fsync=ANOMALY_FSYNC, fsync_sec=ANOMALY_FSYNC_SEC, rotate_bytes=ANOMALY_ROTATE_BYTES,
+                 rotate_sec=ANOMALY_ROTATE_SEC, backups=ANOMALY_BACKUPS):
+        if fsync not in ("never", "batch", "interval"):
+            raise ValueError(f"unknown fsync policy: {fsync}")
+        self.path = path
+        self.fsync = fsync
+        self.fsync_sec = fsync_sec
+        self.rotate_bytes = rotate_bytes
+        self.rotate_sec = rotate_sec
+        self.backups = backups
+        self._fh = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._last_fsync = 0.0
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fh = open(self.path, "ab", buffering=1 << 16)
+        self._size = self._fh.tell()
+        self._opened_at = time.time()
+
+    def _should_rotate(self):
+        if self.rotate_bytes and self._size >= self.rotate_bytes:
+            return True
+        return bool(self.rotate_sec) and time.time() - self._opened_at >= self.rotate_sec
+
+    def rotate(self):
+        """path -> path.1 -> ... -> path.N (oldest dropped); reopen a fresh file."""
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if self.backups > 0 and os.path.exists(self.path):
+            for i in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        self._open()
+
+    def write_batch(self, records):
+        """Append records with a single write; returns the number written."""
+        if not records:
+            return 0
+        if self._fh is None:
+            self._open()
+        elif self._should_rotate():
+            self.rotate()
+        data = "".join(map(encode_record, records)).encode("utf-8")
+        self._fh.write(data)
+        self._size += len(data)
+        self._fh.flush()
+        now = time.monotonic()
+        if self.fsync == "batch" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_sec):
+            os.fsync(self._fh.fileno())
+            self._last_fsync = now
+        return len(records)
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.flush()
+            if self.fsync != "never":
+                os.fsync(self._fh.fileno())
+            self._fh.close()
+            self._fh = None
@@ -0,0 +1,157 @@
+# anomaly_store.py
+# embedded, indexed anomaly store (SQLite, WAL) with the queries the dashboard needs
+import json, os, sqlite3, threading
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS anomalies (
+    id          INTEGER PRIMARY KEY,
+    detected_at TEXT NOT NULL,      -- 'YYYY-MM-DD HH:MM:SS' (sorts chronologically)
+    timestamp   TEXT,
+    merchant    TEXT,
+    region      TEXT,
+    amount      REAL,
+    latency     REAL,
+    status      INTEGER,
+    err         REAL,
+    types       TEXT,               -- JSON list, as in anomalies.jsonl
+    raw         TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_anomalies_detected_at ON anomalies(detected_at);
+CREATE INDEX IF NOT EXISTS idx_anomalies_merchant ON anomalies(merchant, detected_at);
+
+-- one row per (anomaly, type): type filters and counts without parsing JSON
+CREATE TABLE IF NOT EXISTS anomaly_types (
+    anomaly_id  INTEGER NOT NULL REFERENCES anomalies(id),
+    type        TEXT NOT NULL,
+    detected_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_anomaly_types_type ON anomaly_types(type, detected_at);
+CREATE INDEX IF NOT EXISTS idx_anomaly_types_detected_at ON anomaly_types(detected_at, type);
+"""
+
+COLUMNS = ["detected_at", "timestamp", "merchant", "region", "amount", "latency", "status", "err", "types", "raw"]
+
+class AnomalyStore:
+    """SQLite anomaly store. ai_monitor writes with insert_many(); the dashboard
+    opens it with readonly=True and uses the query helpers, which all run
+    on indexes so they stay fast over months of history."""
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def has_anomalies(self):
+        """False while the database has no anomalies table (e.g. only the rollups are written to it)."""
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'anomalies'").fetchone() is not None
+
+    # ---- writes ----
+    def insert_many(self, records):
+        """Insert anomaly records (dicts as written to anomalies.jsonl) in one transaction."""
+        if not records:
+            return 0
+        with self._lock, self.conn:
+            # take the write lock before reading MAX(id): another writer process cannot hand out
+            # the same ids in between (it waits for this transaction, up to the busy timeout)
+            self.conn.execute("BEGIN IMMEDIATE")
+            start = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM anomalies").fetchone()[0] + 1
+            rows, type_rows = [], []
+            for i, r in enumerate(records, start):
+                types = list(r.get("types") or [])
+                rows.append((i, r["detected_at"], r.get("timestamp"), r.get("merchant"), r.get("region"),
+                             r.get("amount"), r.get("latency"), r.get("status"), r.get("err"),
+                             json.dumps(types), r.get("raw")))
+                type_rows.extend((i, t, r["detected_at"]) for t in types)
+            self.conn.executemany(f"INSERT INTO anomalies (id, {', '.join(COLUMNS)}) VALUES ({', '.join('?' * 11)})", rows)
+            self.conn.executemany("INSERT INTO anomaly_types (anomaly_id, type, detected_at) VALUES (?, ?, ?)", type_rows)
+        return len(rows)
+
+    # ---- queries ----
+    def _query(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    @staticmethod
+    def _where(since=None, until=None, merchant=None, column="detected_at"):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append(f"{column} >= ?"); params.append(str(since))
+        if until is not None:
+            clauses.append(f"{column} < ?"); params.append(str(until))
+        if merchant is not None:
+            clauses.append("merchant = ?"); params.append(merchant)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, since=None, until=None):
+        where, params = self._where(since, until)
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM anomalies{where}", params).fetchone()[0]
+
+    def type_counts(self, since=None, until=None):
+        """{type: count} over the period."""
+        where, params = self._where(since, until)
+        # range-scan the time index instead of walking the whole type index
+        hint = " INDEXED BY idx_anomaly_types_detected_at" if since is not None else ""
+        with self._lock:
+            rows = self.conn.execute(f"SELECT type, COUNT(*) FROM anomaly_types{hint}{where} GROUP BY type", params).fetchall()
+        return dict(rows)
+
+    def time_buckets(self, since=None, until=None, bucket="minute", anomaly_type=None):
+        """Anomaly counts per minute/hour/day as DataFrame(bucket datetime, count)."""
+        width = {"minute": 16, "hour": 13, "day": 10}[bucket]
+        table = "anomalies"
+        where, params = self._where(since, until)
+        if anomaly_type is not None:
+            table = "anomaly_types"
+            where += (" AND " if where else " WHERE ") + "type = ?"
+            params.append(anomaly_type)
+        df = self._query(f"SELECT substr(detected_at, 1, {width}) AS bucket, COUNT(*) AS count "
+                         f"FROM {table}{where} GROUP BY bucket ORDER BY bucket", params)
+        df["bucket"] = pd.to_datetime(df["bucket"])
+        return df
+
+    def latest(self, limit=100, merchant=None, anomaly_type=None):
+        """Most recent anomalies, newest first, in the anomalies.jsonl column layout."""
+        where, params = self._where(merchant=merchant)
+        if anomaly_type is not None:
+            where += (" AND " if where else " WHERE ") + "id IN (SELECT anomaly_id FROM anomaly_types WHERE type = ?)"
+            params.append(anomaly_type)
+        df = self._query(f"SELECT {', '.join(COLUMNS)} FROM anomalies{where} "
+                         f"ORDER BY detected_at DESC, id DESC LIMIT ?", params + [int(limit)])
+        df["types"] = [json.loads(t) if t else [] for t in df["types"]]
+        df["detected_at"] = pd.to_datetime(df["detected_at"])
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        return df
+
+def import_jsonl(store, path, batch=5000):
+    """Load an existing anomalies.jsonl into the store; returns rows imported."""
+    total, records = 0, []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+            if len(records) >= batch:
+                total += store.insert_many(records); records = []
+    return total + store.insert_many(records)
+
+if __name__ == "__main__":
+    # python anomaly_store.py  -> import the current anomalies.jsonl into ANOMALY_DB
+    from config import LOG_FILE, ANOMALY_DB
+    store = AnomalyStore(ANOMALY_DB)
+    print("imported", import_jsonl(store, LOG_FILE + ".anomalies.jsonl"), "anomalies into", ANOMALY_DB)
+    store.close()
@@ -1,7 +1,13 @@
 # app.py
 import streamlit as st
 import pandas as pd, time, os, json
-from config import LOG_FILE
+from config import LOG_FILE, LOG_FORMAT, BINARY_LOG_FILE, ANOMALY_DB, METRICS_FILE, METRICS_FLUSH_SEC
+from tx_parser import parse_block
+from tx_binary import BinaryLog
+from tail_reader import TailCache
+from anomaly_store import AnomalyStore
+from rollups import RollupStore
+from metrics import parse_text, PREFIX
 from datetime import datetime
 from streamlit_autorefresh import st_autorefresh
 from collections import Counter, defaultdict
@@ -18,45 +24,16 @@ n_recent = st.sidebar.slider("최근표시건수", 50, 1000, 200)
 
 ANOMALY_FILE = LOG_FILE + ".anomalies.jsonl"
 
-def read_log(limit_lines=5000):
-    if not os.path.exists(LOG_FILE):
-        return pd.DataFrame()
-    with open(LOG_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()[-limit_lines:]
-    import re
-    pattern = re.compile(
-        r"\[(?P<ts>[^\]]+)\]\s+status=(?P<status>\w+)\s+latency=(?P<lat>[\d\.]+)ms\s+merchant=(?P<merchant>\S+)\s+region=(?P<region>\S+)\s+amount=(?P<amount>[\d\.]+)"
-    )
-    rows=[]
-    for L in lines:
-        m = pattern.search(L)
-        if m:
-            d = m.groupdict()
-            rows.append({
-                "timestamp": pd.to_datetime(d["ts"]),
-                "status": 1 if d["status"]=="SUCCESS" else 0,
-                "latency": float(d["lat"]),
-                "merchant": d["merchant"],
-                "region": d["region"],
-                "amount": float(d["amount"]),
-                "raw": L.strip()
-            })
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    df = df.sort_values("timestamp").tail(n_recent)
-    return df
+def parse_log_text(text):
+    return parse_block(text)[0]
 
-def read_anomalies(limit=1000):
+def parse_anomaly_text(text):
     items = []
-    if not os.path.exists(ANOMALY_FILE):
-        return pd.DataFrame()
-    with open(ANOMALY_FILE, "r", encoding="utf-8") as f:
-        for l in f.readlines()[-limit:]:
-            try:
-                items.append(json.loads(l))
-            except:
-                continue
+    for l in text.splitlines():
+        try:
+            items.append(json.loads(l))
+        except:
+            continue
     if not items:
         return pd.DataFrame()
     df = pd.DataFrame(items)
@@ -67,8 +44,36 @@ def read_anomalies(limit=1000):
         df["timestamp"] = pd.to_datetime(df["timestamp"])
     return df
 
+# shared by all sessions/tabs: each file is read from its end once, then only
+# the bytes appended since the previous refresh are parsed
+@st.cache_resource
+def log_tail(path, limit):
+    return TailCache(path, limit, parse_log_text)
+
+# binary log: memory-mapped, the last records are viewed in place (no parsing)
+@st.cache_resource
+def binary_log(path):
+    return BinaryLog(path)
+
+@st.cache_resource
+def anomaly_tail(path, limit):
+    return TailCache(path, limit, parse_anomaly_text)
+
+def read_log(limit_lines=5000):
+    if LOG_FORMAT == "binary":
+        df = binary_log(BINARY_LOG_FILE).tail_frame(limit_lines)
+    else:
+        df = log_tail(LOG_FILE, limit_lines).get()
+    if df.empty:
+        return pd.DataFrame()
+    df = df.sort_values("timestamp").tail(n_recent)
+    return df
+
+def read_anomalies(limit=1000):
+    # copy: the cached frame is shared between sessions
+    return anomaly_tail(ANOMALY_FILE, limit).get().copy()
+
 df = read_log()
-an_df = read_anomalies(1000)
 
 col1, col2, col3 = st.columns([1,1,1])
 with col1:
@@ -85,6 +90,71 @@ with col3:
     else:
         st.metric("최근 거절율(%)", "-")
 
+# --- 파이프라인 상태 (ai_monitor가 METRICS_FILE에 기록하는 Prometheus 지표) ---
+def read_metrics(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None, None
+    values = defaultdict(float)
+    for name, labels, value in parse_text(text):
+        values[(name[len(PREFIX):], tuple(sorted(labels.items())))] = value
+    return values, mtime
+
+def metric(values, name, **labels):
+    return values.get((name, tuple(sorted(labels.items()))), 0.0)
+
+if METRICS_FILE and os.path.exists(METRICS_FILE):
+    values, mtime = read_metrics(METRICS_FILE)
+    if values is not None:
+        st.subheader("파이프라인 상태")
+        now = time.time()
+        # 이전 새로고침 대비 증가량으로 처리율 계산 (세션별)
+        prev = st.session_state.get("metrics_prev")
+        lines = metric(values, "lines_ingested_total")
+        rate = None
+        if prev is not None and mtime > prev[1]:
+            rate = (lines - prev[0]) / (mtime - prev[1])
+        if prev is None or mtime > prev[1]:
+            st.session_state["metrics_prev"] = (lines, mtime)
+
+        age = now - mtime
+        last_batch = metric(values, "last_batch_timestamp_seconds")
+        h1, h2, h3, h4, h5 = st.columns(5)
+        h1.metric("수집 라인", f"{lines:,.0f}", f"{rate:,.1f}/s" if rate is not None else None)
+        h2.metric("지연(lag, bytes)", f"{metric(values, 'lag_bytes'):,.0f}")
+        h3.metric("파싱 실패", f"{metric(values, 'parse_failures_total'):,.0f}")
+        h4.metric("이상 레코드", f"{metric(values, 'anomaly_records_total'):,.0f}")
+        h5.metric("알림 드롭", f"{metric(values, 'alerts_total', outcome='dropped'):,.0f}")
+        if age > 3 * METRICS_FLUSH_SEC:
+            st.error(f"ai_monitor 지표가 {age:.0f}초 동안 갱신되지 않았습니다 (모니터 중단 여부 확인).")
+        elif last_batch and now - last_batch > 60:
+            st.info(f"마지막 배치 처리 후 {now - last_batch:.0f}초 경과 (신규 로그 없음).")
+
+        # 단계별 누적 시간 / 배치당 평균
+        stages = []
+        for (name, labels), v in values.items():
+            if name == "stage_seconds_sum":
+                stage = dict(labels)["stage"]
+                count = metric(values, "stage_seconds_count", stage=stage)
+                stages.append((stage, v, count, 1000 * v / count if count else 0.0))
+        if stages:
+            stage_df = pd.DataFrame(stages, columns=["stage", "total_sec", "batches", "mean_ms"])
+            stage_df["share_%"] = 100 * stage_df["total_sec"] / stage_df["total_sec"].sum()
+            stage_df = stage_df.sort_values("total_sec", ascending=False)
+            s1, s2 = st.columns([2, 3])
+            with s1:
+                st.caption("단계별 누적 처리 시간 비중(%)")
+                st.bar_chart(stage_df.set_index("stage")["share_%"])
+            with s2:
+                retrains = metric(values, "retrain_seconds_count")
+                retrain_mean = metric(values, "retrain_seconds_sum") / retrains if retrains else 0.0
+                st.caption(f"모델 v{metric(values, 'model_version'):.0f} · 재학습 {retrains:.0f}회 (평균 {retrain_mean:.1f}s) · "
+                           f"대기 배치 {metric(values, 'pending_batches'):.0f}")
+                st.dataframe(stage_df.reset_index(drop=True), hide_index=True)
+
 # --- 이상 타입 한글 매핑 ---
 TYPE_KO = {
     "autoencoder": "AI 이상(AutoEncoder)",
@@ -112,18 +182,12 @@ def types_to_ko_list(types):
         pass
     return []
 
-# anomaly summary
-st.subheader("이상 이벤트 요약")
-if an_df.empty:
-    st.write("감지된 이상 이벤트가 없습니다.")
-else:
-    # add a column with Korean labels for display (keeps existing column for table)
-    an_df["types_ko"] = an_df["types"].apply(types_to_ko_list)
-
-    # 필터링: UI에서 제외할 이상 타입 (원문 키)
-    SKIP_TYPES = {"merchant_spike", "off_hour", "unknown_region"}
+# 필터링: UI에서 제외할 이상 타입 (원문 키)
+SKIP_TYPES = {"merchant_spike", "off_hour", "unknown_region"}
 
-    # flatten and count using 원문 keys -> 한글 라벨 매핑, 제외 타입는 건너뜀
+def jsonl_summary(an_df):
+    """(type counts, per-minute counts, latest 100) from the recent JSONL tail."""
+    # flatten and count using 원문 keys
     type_counts = Counter()
     for raw in an_df["types"].tolist():
         keys = []
@@ -144,13 +208,51 @@ else:
                         keys = parsed
                 except Exception:
                     keys = []
-        else:
-            keys = []
         for k in keys:
-            if k in SKIP_TYPES:
-                continue
-            type_counts[ TYPE_KO.get(k, k) ] += 1
-    tc_df = pd.DataFrame(type_counts.items(), columns=["type","count"]).sort_values("count", ascending=False)
+            type_counts[k] += 1
+
+    # time series: anomalies per minute
+    per_min = pd.DataFrame(columns=["bucket", "count"])
+    if "detected_at" in an_df.columns and not an_df["detected_at"].isna().all():
+        minute = an_df["detected_at"].dt.floor("min").rename("bucket")
+        per_min = an_df.groupby(minute).size().rename("count").reset_index()
+    latest = an_df.sort_values("detected_at", ascending=False).head(100)
+    return type_counts, per_min, latest
+
+# indexed store written by ai_monitor (see anomaly_store.py); JSONL tail as fallback
+@st.cache_resource
+def open_store(path):
+    return AnomalyStore(path, readonly=True)
+
+PERIODS = {"최근 1시간": pd.Timedelta(hours=1), "최근 24시간": pd.Timedelta(days=1),
+           "최근 7일": pd.Timedelta(days=7), "최근 30일": pd.Timedelta(days=30), "전체": None}
+period = st.sidebar.selectbox("집계 기간", list(PERIODS), index=1)
+# start of the selected period, shared by the anomaly and rollup queries (None = everything)
+since = None
+if PERIODS[period] is not None:
+    since = (pd.Timestamp.now() - PERIODS[period]).strftime("%Y-%m-%d %H:%M:%S")
+
+# with ANOMALY_OUTPUTS = ("jsonl",) the database may only hold the rollups
+store = open_store(ANOMALY_DB) if os.path.exists(ANOMALY_DB) else None
+if store is not None and store.has_anomalies():
+    total = store.count(since)
+    type_counts = store.type_counts(since)
+    per_min = store.time_buckets(since, bucket="minute" if PERIODS[period] is not None and PERIODS[period] <= pd.Timedelta(days=1) else "hour")
+    latest = store.latest(100)
+else:
+    an_df = read_anomalies(1000)
+    total = len(an_df)
+    if total:
+        type_counts, per_min, latest = jsonl_summary(an_df)
+
+# anomaly summary
+st.subheader("이상 이벤트 요약")
+if not total:
+    st.write("감지된 이상 이벤트가 없습니다.")
+else:
+    # 원문 keys -> 한글 라벨 매핑, 제외 타입는 건너뜀
+    tc_df = pd.DataFrame([(TYPE_KO.get(k, k), c) for k, c in type_counts.items() if k not in SKIP_TYPES],
+                         columns=["type","count"]).sort_values("count", ascending=False)
 
     # horizontal bar: 글자 크기 키움
     if not tc_df.empty:
@@ -169,21 +271,45 @@ else:
     else:
         st.write("이상 유형 데이터가 없습니다.")
 
-    # time series: anomalies per minute
-    ts = an_df.copy()
-    if "detected_at" in ts.columns and not ts["detected_at"].isna().all():
-        ts["minute"] = ts["detected_at"].dt.floor("min")
-        per_min = ts.groupby("minute").size().rename("count").reset_index()
-        if not per_min.empty:
-            st.line_chart(per_min.set_index("minute")["count"])
+    # time series: anomalies per minute (per hour for long periods)
+    if not per_min.empty:
+        st.line_chart(per_min.set_index("bucket")["count"])
 
     st.subheader("최근 이상 목록 (최신 100)")
-    disp = an_df.sort_values("detected_at", ascending=False).head(100)
+    disp = latest
     if not disp.empty:
         # 보여줄 때 한국어 타입 컬럼도 함께 표시
+        disp = disp.assign(types_ko=disp["types"].apply(types_to_ko_list))
         disp_display = disp[["detected_at","types","types_ko","merchant","region","amount","latency","err","raw"]].reset_index(drop=True)
         st.dataframe(disp_display)
 
+# pre-aggregated per-minute / per-hour metrics written by ai_monitor (see rollups.py)
+@st.cache_resource
+def open_rollups(path):
+    return RollupStore(path, readonly=True)
+
+if os.path.exists(ANOMALY_DB):
+    span = PERIODS[period]
+    granularity = "minute" if span is not None and span <= pd.Timedelta(hours=6) else "hour"
+    try:
+        rollup = open_rollups(ANOMALY_DB).query(granularity, since)
+    except Exception:
+        rollup = pd.DataFrame()   # monitor has not created tx_rollups yet
+    if not rollup.empty:
+        st.subheader(f"거래 지표 추이 ({period}, {'분' if granularity == 'minute' else '시간'} 단위)")
+        r = rollup.set_index("bucket")
+        c1, c2 = st.columns(2)
+        with c1:
+            st.caption("거래 건수")
+            st.line_chart(r["count"])
+            st.caption("거절율(%)")
+            st.line_chart(100 * r["failure_rate"])
+        with c2:
+            st.caption("Latency p50 / p95 / p99 (ms)")
+            st.line_chart(r[["latency_p50", "latency_p95", "latency_p99"]])
+            st.caption("거래 금액 합계")
+            st.line_chart(r["amount_sum"])
+
 st.subheader("Latency 추세 (최근 거래)")
 if not df.empty:
     st.line_chart(df.set_index("timestamp")["latency"])
@@ -192,4 +318,4 @@ st.subheader("거래 목록 (최근)")
 if not df.empty:
     st.dataframe(df.sort_values("timestamp", ascending=False).reset_index(drop=True))
 
-st.warning("AI 탐지(텔레그램 전송)는 ai_monitor.py가 수행합니다. anomalies.jsonl 파일을 통해 UI에 이상 내역이 집계됩니다.")
+st.warning("AI 탐지(텔레그램 전송)는 ai_monitor.py가 수행합니다. anomalies.db(없으면 anomalies.jsonl)를 통해 UI에 이상 내역이 집계됩니다.")
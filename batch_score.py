@@ -0,0 +1,109 @@
+# batch_score.py
+# offline re-scoring of a historical log at disk speed (same model / rule semantics as ai_monitor)
+#   python batch_score.py ./logs/tx_log.txt --out ./logs/rescored.jsonl --workers 4
+import argparse, os, time
+from config import DETECT_WORKERS, WARMUP_EPOCHS, ANOMALY_OUTPUTS
+from tx_parser import iter_blocks, parse_block
+from tx_buffer import TxRingBuffer
+from checkpoint import save_checkpoint, load_checkpoint, load_latest
+from ai_monitor import create_monitor, train_model
+
+BLOCK_CHARS = 4 << 20   # ~4 MB of log text per chunk
+
+def first_rows(path, n_rows, block_chars=BLOCK_CHARS):
+    """The first n_rows parsed transactions of a log (training sample)."""
+    buf = TxRingBuffer(capacity=n_rows)
+    for text in iter_blocks(path, block_chars):
+        buf.extend(parse_block(text)[0].head(n_rows - len(buf)))
+        if len(buf) >= n_rows:
+            break
+    return buf.to_frame()
+
+def load_model(path):
+    """A checkpoint file, or the newest checkpoint of a directory (e.g. the monitor's CHECKPOINT_DIR)."""
+    if os.path.isdir(path):
+        state = load_latest(path)
+        if state is None:
+            raise ValueError(f"no checkpoint in {path}")
+        return state
+    return load_checkpoint(path)
+
+def score_log(path, state, anomaly_file=None, anomaly_db=None, workers=DETECT_WORKERS,
+              block_chars=BLOCK_CHARS, rollups=False, progress_sec=5.0):
+    """Stream path through a Monitor with a fixed model; returns (rows, malformed, anomalies).
+
+    Chunks are scored on the merchant-sharded worker pool when workers > 0;
+    burst / merchant windows follow the log timestamps exactly as in the
+    live monitor, but the model is not retrained during the run.
+    """
+    outputs = tuple(o for o, p in (("jsonl", anomaly_file), ("sqlite", anomaly_db)) if p)
+    monitor = create_monitor(workers, anomaly_file=anomaly_file, anomaly_db=anomaly_db, outputs=outputs,
+                             alert=lambda msg, key=None: None, retrain_every=float("inf"),
+                             rollups=rollups and anomaly_db is not None)
+    monitor.use_model(state)
+    rows = malformed = anomalies = 0
+    t0 = last = time.perf_counter()
+    try:
+        for text in iter_blocks(path, block_chars):
+            df, bad = parse_block(text)
+            rows += len(df)
+            malformed += bad
+            anomalies += len(monitor.process_batch(df))
+            now = time.perf_counter()
+            if progress_sec and now - last >= progress_sec:
+                last = now
+                print(f"{rows:,} rows, {anomalies:,} anomalies, {rows / (now - t0):,.0f} rows/sec")
+        anomalies += len(monitor.flush())
+    finally:
+        monitor.close()
+    return rows, malformed, anomalies
+
+def main():
+    ap = argparse.ArgumentParser(description="Re-score a historical transaction log.")
+    ap.add_argument("log")
+    ap.add_argument("--out", help="anomalies JSONL to write")
+    ap.add_argument("--db", help="anomaly store (SQLite) to write; rollups are added with --rollups")
+    ap.add_argument("--rollups", action="store_true")
+    ap.add_argument("--workers", type=int, default=DETECT_WORKERS, help="0 = single process")
+    ap.add_argument("--block-mb", type=float, default=BLOCK_CHARS / (1 << 20))
+    ap.add_argument("--model", help="checkpoint file or directory (newest version) to use instead of training")
+    ap.add_argument("--save-model", help="checkpoint directory to save the trained model to")
+    ap.add_argument("--train-rows", type=int, default=5000, help="train on the first N rows of the log")
+    ap.add_argument("--epochs", type=int, default=WARMUP_EPOCHS)
+    ap.add_argument("--append", action="store_true", help="add to existing --out / --db instead of refusing")
+    args = ap.parse_args()
+    if not args.out and not args.db:
+        base = os.path.splitext(args.log)[0]
+        if "jsonl" in ANOMALY_OUTPUTS:
+            args.out = base + ".rescored.jsonl"
+        else:
+            args.db = base + ".rescored.db"
+    # a second run into the same output would mix two scorings (checked before training)
+    existing = [p for p in (args.out, args.db) if p and os.path.exists(p)]
+    if existing and not args.append:
+        ap.error(f"{', '.join(existing)} already exists (remove it or pass --append)")
+
+    if args.model:
+        state = load_model(args.model)
+        print(f"Loaded model v{state.version} (threshold {state.threshold:.4f})")
+    else:
+        print(f"Training on the first {args.train_rows} rows...")
+        state = train_model(first_rows(args.log, args.train_rows), None, epochs=args.epochs)
+        print(f"Model trained on {state.n_samples} samples, threshold {state.threshold:.4f}")
+    if args.save_model:
+        print("saved:", save_checkpoint(state, args.save_model))
+
+    for p in existing:
+        print("appending to existing", p)
+    t0 = time.perf_counter()
+    rows, malformed, anomalies = score_log(args.log, state, args.out, args.db, args.workers,
+                                           int(args.block_mb * (1 << 20)), args.rollups)
+    dt = time.perf_counter() - t0
+    print(f"{rows:,} rows ({malformed} malformed) -> {anomalies:,} anomalies in {dt:.1f}s "
+          f"({rows / max(dt, 1e-9):,.0f} rows/sec)")
+    for p in (args.out, args.db):
+        if p:
+            print("written:", p)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/bench_detectors.py
+# detector backends (detectors.py) on a seeded, labelled backfill log: fit time, scoring
+# throughput, peak RSS (one fresh process per backend) and overlap with the autoencoder
+#   python -m benchmarks.bench_detectors --hours 6 --rate 5 --out bench_detectors.json
+import argparse, json, os, resource, sys, tempfile, time
+import multiprocessing as mp
+import numpy as np
+import config
+import generate_transactions as gen
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KiB on Linux
+
+def read_labels(path, n):
+    """LABEL_NAMES per log line (empty set for unlabelled lines)."""
+    labels = [frozenset()] * n
+    with open(path, "r", encoding="utf-8") as f:
+        next(f)
+        for row in f:
+            i, names = row.rstrip("\n").split("\t")
+            labels[int(i)] = frozenset(names.split(","))
+    return labels
+
+def _run(name, log_path, train_rows, epochs, batch_sizes, budget_rows, out_q):
+    """Fit and score one backend in a fresh process (spawn), so RSS and imports are its own."""
+    try:
+        rss0 = peak_rss_mb()
+        t0 = time.perf_counter()
+        from tx_parser import parse_block
+        from features import featurize
+        from detectors import make_detector
+        import_sec = time.perf_counter() - t0
+        with open(log_path, "r", encoding="utf-8") as f:
+            df, _ = parse_block(f.read())
+        X_train, scaler, merchant_map, region_map = featurize(df.head(train_rows))
+        X, _, _, _ = featurize(df, merchant_map, region_map, scaler)
+
+        t0 = time.perf_counter()
+        det = make_detector(name).fit(X_train, epochs=epochs)   # the autoencoder imports TensorFlow here
+        fit_sec = time.perf_counter() - t0
+        threshold = det.threshold(det.score(X_train))
+        t0 = time.perf_counter()
+        scores = det.score(X)
+        score_all_sec = time.perf_counter() - t0
+
+        throughput = {}
+        for size in batch_sizes:
+            Xb = X[train_rows:train_rows + size]
+            det.score(Xb)
+            repeat = max(3, min(1000, budget_rows // size))
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                det.score(Xb)
+            sec = (time.perf_counter() - t0) / repeat
+            throughput[str(size)] = {"ms_per_batch": sec * 1000, "rows_per_sec": size / sec}
+        out_q.put({"name": name, "import_sec": import_sec, "fit_sec": fit_sec, "threshold": threshold,
+                   "score_all_rows_per_sec": len(X) / max(score_all_sec, 1e-9), "throughput": throughput,
+                   "rss_baseline_mb": rss0, "peak_rss_mb": peak_rss_mb(),
+                   "flags": (scores > threshold).tolist()})
+    except Exception as e:
+        out_q.put({"name": name, "error": f"{type(e).__name__}: {e}"})
+
+def run_backend(name, *args):
+    ctx = mp.get_context("spawn")
+    out_q = ctx.Queue()
+    p = ctx.Process(target=_run, args=(name, *args, out_q))
+    p.start()
+    result = out_q.get()
+    p.join()
+    return result
+
+def compare(flags, ref):
+    """Agreement of two flag vectors (over the scored rows)."""
+    both = int(np.count_nonzero(flags & ref))
+    either = int(np.count_nonzero(flags | ref))
+    return {"flagged": int(flags.sum()), "shared": both,
+            "only_this": int(np.count_nonzero(flags & ~ref)), "only_reference": int(np.count_nonzero(ref & ~flags)),
+            "jaccard": both / either if either else 1.0}
+
+def label_recall(flags, labels):
+    """Share of the lines of each injected scenario that were flagged, and the flag rate of clean lines."""
+    out = {}
+    for name in gen.LABEL_NAMES:
+        idx = np.array([i for i, l in enumerate(labels) if name in l], dtype=np.int64)
+        if len(idx):
+            out[name] = float(flags[idx].mean())
+    clean = np.array([not l for l in labels])
+    out["clean_flag_rate"] = float(flags[clean].mean()) if clean.any() else None
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--detectors", default=",".join(("autoencoder", "mahalanobis", "isolation_forest")))
+    ap.add_argument("--hours", type=float, default=6.0, help="simulated span of the backfill log")
+    ap.add_argument("--rate", type=float, default=5.0, help="events per simulated second")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--train-rows", type=int, default=5000)
+    ap.add_argument("--epochs", type=int, default=config.WARMUP_EPOCHS)
+    ap.add_argument("--batch-sizes", default="1,100,5000")
+    ap.add_argument("--out", default="bench_detectors.json")
+    args = ap.parse_args()
+    names = args.detectors.split(",")
+    sizes = [int(s) for s in args.batch_sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log, labels_path = os.path.join(tmp, "tx_log.txt"), os.path.join(tmp, "labels.tsv")
+        start = np.datetime64("2025-01-01T00:00:00")
+        n = gen.backfill(log, str(start), str(start + np.timedelta64(int(args.hours * 3600), "s")),
+                         args.rate, args.seed, labels_path)
+        labels = read_labels(labels_path, n)
+        print(f"{n:,} lines ({sum(1 for l in labels if l):,} labelled), training on the first {args.train_rows}")
+        results = {name: run_backend(name, log, args.train_rows, args.epochs, sizes, 200_000) for name in names}
+
+    report = {"meta": {"lines": n, "seed": args.seed, "hours": args.hours, "rate": args.rate,
+                       "train_rows": args.train_rows, "epochs": args.epochs,
+                       "threshold_percentile": config.DETECTOR_THRESHOLD_PERCENTILE}, "detectors": {}}
+    # detection is compared on the rows after the training sample
+    ref = results.get("autoencoder", {}).get("flags")
+    ref = np.array(ref[args.train_rows:]) if ref is not None else None
+    eval_labels = labels[args.train_rows:]
+    failed = False
+    for name, r in results.items():
+        if "error" in r:
+            print(f"{name:<17} FAILED: {r['error']}")
+            report["detectors"][name] = r
+            failed = True
+            continue
+        flags = np.array(r.pop("flags")[args.train_rows:])
+        r["recall"] = label_recall(flags, eval_labels)
+        if ref is not None:
+            r["vs_autoencoder"] = compare(flags, ref)
+        report["detectors"][name] = r
+        tp = r["throughput"]
+        print(f"{name:<17} fit {r['fit_sec']:7.2f}s  " +
+              "  ".join(f"n={s}: {tp[s]['ms_per_batch']:7.3f} ms" for s in tp) +
+              f"  rss {r['peak_rss_mb']:6.0f} MB  flagged {flags.mean():6.2%}" +
+              (f"  jaccard vs AE {r['vs_autoencoder']['jaccard']:.2f}" if ref is not None else ""))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print("results written to", args.out)
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+# benchmarks/bench_e2e.py
+# end-to-end replay of seeded logs at fixed rates through the real monitor loop
+# (LogTailer -> parse_block -> Monitor.process_batch -> sink/store, Telegram stubbed),
+# plus per-stage micro-benchmarks; results are written as JSON for comparisons
+#   python -m benchmarks.bench_e2e --rates 100,1000,10000,100000 --duration 10 --out bench.json
+import argparse, asyncio, json, os, platform, resource, sqlite3, subprocess, tempfile, time
+import multiprocessing as mp
+from collections import defaultdict, deque
+import numpy as np
+import config
+from tx_parser import parse_block, parse_lines
+from features import featurize
+from rules import evaluate_batch
+from window_rules import WindowRuleEngine
+from fast_infer import reconstruction_error
+from alerts import AlertDispatcher
+from tailer import LogTailer
+from ai_monitor import create_monitor, train_model
+from benchmarks.common import seeded_lines
+
+WARM_SEED_OFFSET = 1000   # training data uses a different seed than the replayed lines
+
+def stub_sender(delay=0.0):
+    """(send, close) coroutines for AlertDispatcher that only simulate a round trip."""
+    async def send(text):
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def close():
+        pass
+
+    return send, close
+
+def percentiles(values, qs=(50, 99)):
+    if not len(values):
+        return {f"p{q}": None for q in qs}
+    return {f"p{q}": float(np.percentile(values, q)) for q in qs}
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    return resource.getrusage(who).ru_maxrss / 1024   # KiB on Linux
+
+# ---- replay ----
+def _writer(path, lines, rate, out_q):
+    """Append lines at `rate` per second; reports (end index, perf_counter) per write."""
+    n = len(lines)
+    marks = []
+    written = 0
+    with open(path, "a", encoding="utf-8") as f:
+        t0 = time.perf_counter()
+        while written < n:
+            due = min(n, int((time.perf_counter() - t0) * rate) + 1)
+            if due > written:
+                f.write("".join(lines[written:due]))
+                f.flush()
+                marks.append((due, time.perf_counter()))
+                written = due
+            else:
+                time.sleep(max(0.0, min(0.001, written / rate - (time.perf_counter() - t0))))
+    out_q.put(marks)
+
+def _monitor(log_path, work_dir, n_lines, workers, warm_lines, epochs, timeout, ready_q, out_q):
+    """Real monitor loop in its own process (for a clean peak RSS); stops after n_lines."""
+    dispatcher = AlertDispatcher(sender=stub_sender())
+    monitor = create_monitor(workers, anomaly_file=os.path.join(work_dir, "anomalies.jsonl"),
+                             anomaly_db=os.path.join(work_dir, "anomalies.db"), checkpoint_dir=None,
+                             alert=lambda msg, key=None: dispatcher.submit(msg, key))
+    # steady state: start from a trained model instead of the warmup phase
+    monitor.use_model(train_model(parse_block("".join(warm_lines))[0], None, epochs=epochs))
+    tailer = LogTailer(log_path, use_inotify=True)
+    ready_q.put(True)
+
+    emits = []            # (records emitted so far, perf_counter) after each monitor call
+    n_records = rows = 0
+    deadline = None
+    while rows < n_lines or monitor.pending:
+        text = tailer.read()
+        if text:
+            new_df, malformed = parse_block(text)
+            rows += len(new_df) + malformed
+            records = monitor.process_batch(new_df)
+            deadline = deadline or time.perf_counter() + timeout
+        elif monitor.pending:
+            records = monitor.flush()
+        else:
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            tailer.wait(0.05)
+            continue
+        if records:
+            n_records += len(records)
+            emits.append((n_records, time.perf_counter()))
+    t_done = time.perf_counter()
+    tailer.close()
+    monitor.close()
+    dispatcher.close()
+    out_q.put({"rows": rows, "t_done": t_done, "emits": emits, "alerts": dict(dispatcher.stats),
+               "peak_rss_mb": peak_rss_mb(),
+               "workers_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if workers else None})
+
+def replay(rate, duration, seed, workers, epochs, warm_rows, timeout):
+    """Write rate*duration seeded lines at `rate` tx/s into a fresh log watched by the monitor."""
+    n = max(1, int(rate * duration))
+    lines = seeded_lines(n, seed)
+    warm = seeded_lines(warm_rows, seed + WARM_SEED_OFFSET)
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as work_dir:
+        log_path = os.path.join(work_dir, "tx_log.txt")
+        open(log_path, "w").close()
+        ready_q, out_q, marks_q = ctx.Queue(), ctx.Queue(), ctx.Queue()
+        mon = ctx.Process(target=_monitor, args=(log_path, work_dir, n, workers, warm, epochs, timeout, ready_q, out_q))
+        mon.start()
+        ready_q.get()
+        writer = mp.get_context("fork").Process(target=_writer, args=(log_path, lines, rate, marks_q))
+        writer.start()
+        marks = marks_q.get()
+        writer.join()
+        result = out_q.get()
+        mon.join()
+        with sqlite3.connect(os.path.join(work_dir, "anomalies.db")) as db:
+            anomaly_raw = [r for (r,) in db.execute("SELECT raw FROM anomalies ORDER BY id")]
+
+    # write time of every line: the first write whose end index passes it
+    ends = np.array([e for e, _ in marks])
+    write_t = np.array([t for _, t in marks])
+    line_t = write_t[np.searchsorted(ends, np.arange(n), side="right")]
+    # records are emitted in log order: match each one to the next unmatched line with that text
+    positions = defaultdict(deque)
+    for i, line in enumerate(lines):
+        positions[line.rstrip("\n")].append(i)
+    emit_ends = np.array([e for e, _ in result["emits"]], dtype=np.int64)
+    emit_t = np.array([t for _, t in result["emits"]])
+    latency = []
+    for j, raw in enumerate(anomaly_raw):
+        q = positions.get(raw)
+        if not q:
+            continue
+        i = q.popleft()
+        latency.append(emit_t[np.searchsorted(emit_ends, j, side="right")] - line_t[i])
+    latency_ms = np.array(latency) * 1000
+
+    first_write, last_write = write_t[0], write_t[-1]
+    drain = result["t_done"] - last_write
+    processed_sec = result["t_done"] - first_write
+    return {
+        "target_rate": rate,
+        "lines": n,
+        "rows_processed": result["rows"],
+        "write_rate": n / max(last_write - first_write, 1e-9),
+        "throughput": result["rows"] / max(processed_sec, 1e-9),
+        "drain_sec": drain,
+        # kept up: the backlog left when the writer stopped was cleared quickly
+        "sustained": bool(result["rows"] >= n and drain <= max(1.0, 0.1 * duration)),
+        "anomalies": len(anomaly_raw),
+        "latency_ms": percentiles(latency_ms),
+        "alerts": result["alerts"],
+        "peak_rss_mb": result["peak_rss_mb"],
+        "workers_peak_rss_mb": result["workers_peak_rss_mb"],
+    }
+
+# ---- per-stage micro-benchmarks ----
+def timeit(fn, repeat):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+def stage_benchmarks(seed, batch_sizes, epochs, warm_rows, budget_rows=200_000):
+    lines = seeded_lines(max(batch_sizes), seed)
+    state = train_model(parse_lines(seeded_lines(warm_rows, seed + WARM_SEED_OFFSET)), None, epochs=epochs)
+    results = {}
+    for size in batch_sizes:
+        chunk = lines[:size]
+        df = parse_lines(chunk)
+        X, _, _, _ = featurize(df, state.merchant_map, state.region_map, state.scaler)
+        rec = state.scorer.score(X) if state.scorer is not None else reconstruction_error(state.model, X)
+        windows = WindowRuleEngine()
+        stages = {
+            "parse_lines": lambda: parse_lines(chunk),
+            "featurize": lambda: featurize(df, state.merchant_map, state.region_map, state.scaler),
+            "rules": lambda: evaluate_batch(df, rec, state.threshold, windows),
+        }
+        if state.model is not None:   # Keras autoencoder (config.DETECTOR)
+            stages["model.predict"] = lambda: reconstruction_error(state.model, X)
+        if state.scorer is not None:
+            stages["numpy_scorer"] = lambda: state.scorer.score(X)
+        repeat = max(3, min(1000, budget_rows // size))
+        for name, fn in stages.items():
+            sec = timeit(fn, repeat if name != "model.predict" else max(3, repeat // 10))
+            results.setdefault(name, {})[str(size)] = {"ms_per_batch": sec * 1000, "rows_per_sec": size / sec}
+    return results
+
+def metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "git_commit": commit,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "duration_sec": args.duration,
+        "workers": args.workers,
+        "config": {k: getattr(config, k) for k in ("FAST_INFERENCE", "RETRAIN_EVERY", "RETRAIN_BACKGROUND",
+                                                     "ANOMALY_OUTPUTS", "ROLLUPS_ENABLED", "TAIL_MAX_BATCH_BYTES")},
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rates", default="100,1000,10000,100000", help="comma separated tx/s")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds of log written per rate")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--workers", type=int, default=config.DETECT_WORKERS, help="0 = single process")
+    ap.add_argument("--epochs", type=int, default=config.WARMUP_EPOCHS)
+    ap.add_argument("--warm-rows", type=int, default=5000)
+    ap.add_argument("--timeout", type=float, default=120.0, help="give up this long after the first batch")
+    ap.add_argument("--batch-sizes", default="1,100,5000")
+    ap.add_argument("--skip-stages", action="store_true")
+    ap.add_argument("--skip-replay", action="store_true")
+    ap.add_argument("--out", default="bench_e2e.json")
+    args = ap.parse_args()
+
+    report = {"meta": metadata(args)}
+    if not args.skip_stages:
+        sizes = [int(s) for s in args.batch_sizes.split(",")]
+        report["stages"] = stage_benchmarks(args.seed, sizes, args.epochs, args.warm_rows)
+        for name, by_size in report["stages"].items():
+            print(f"{name:<14}" + "".join(f"  n={s}: {r['ms_per_batch']:8.3f} ms" for s, r in by_size.items()))
+    if not args.skip_replay:
+        report["replay"] = []
+        for rate in (int(r) for r in args.rates.split(",")):
+            r = replay(rate, args.duration, args.seed, args.workers, args.epochs, args.warm_rows, args.timeout)
+            report["replay"].append(r)
+            lat = r["latency_ms"]
+            print(f"rate {rate:>7}/s: throughput {r['throughput']:>10,.0f} tx/s  "
+                  f"{'sustained' if r['sustained'] else 'FALLING BEHIND'}  "
+                  f"latency p50 {lat['p50'] or 0:8.1f} ms  p99 {lat['p99'] or 0:8.1f} ms  "
+                  f"rss {r['peak_rss_mb']:.0f} MB")
+        sustained = [r["target_rate"] for r in report["replay"] if r["sustained"]]
+        report["max_sustained_rate"] = max(sustained) if sustained else None
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print("results written to", args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# benchmarks/bench_inference.py
+# per-batch scoring latency: Keras predict vs the NumPy fast path (fast_infer.py)
+#   python -m benchmarks.bench_inference --log ./logs/tx_log.txt
+import argparse, time
+from config import LOG_FILE
+from tx_parser import parse_lines
+from features import featurize
+from detectors import build_autoencoder
+from fast_infer import NumpyAutoencoder, check_equivalence, reconstruction_error
+
+def timeit(fn, X, repeat):
+    fn(X)   # warm up
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - t0) / repeat
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--log", default=LOG_FILE)
+    ap.add_argument("--train-rows", type=int, default=5000)
+    ap.add_argument("--epochs", type=int, default=5)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    with open(args.log, "r", encoding="utf-8") as f:
+        df = parse_lines(f.readlines()[-args.train_rows:])
+    X, _, _, _ = featurize(df)
+    model = build_autoencoder(X.shape[1])
+    model.fit(X, X, epochs=args.epochs, batch_size=32, verbose=0)
+    scorer = NumpyAutoencoder.from_keras(model)
+
+    ok, diff = check_equivalence(scorer, model, X)
+    print(f"equivalence on {len(X)} rows: {'OK' if ok else 'MISMATCH'} (max abs diff {diff:.3e})")
+
+    print(f"{'batch':>6} {'keras ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for n in (1, 5, 32, 256, 4096):
+        Xb = X[:n]
+        k = timeit(lambda x: reconstruction_error(model, x), Xb, max(args.repeat // 10, 5))
+        f = timeit(scorer.score, Xb, args.repeat)
+        print(f"{n:>6} {k*1e3:>10.3f} {f*1e3:>10.3f} {k/f:>7.0f}x")
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_parallel.py
+# single-process Monitor vs merchant-sharded ShardedMonitor on a fixed seeded log:
+# checks that both produce the same anomaly set, then compares throughput
+#   python -m benchmarks.bench_parallel --lines 200000 --workers 4
+import argparse, os, sys, tempfile, time
+from collections import Counter
+from tx_parser import parse_block
+from ai_monitor import Monitor, ShardedMonitor, train_model
+from benchmarks.common import write_seeded_log
+
+def read_batches(path, batch_lines):
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    return [parse_block("".join(lines[i:i + batch_lines]))[0] for i in range(0, len(lines), batch_lines)]
+
+def run(monitor, state, batches):
+    """Feed every batch with a fixed model (no retraining); returns (records, seconds)."""
+    monitor.use_model(state)
+    records = []
+    t0 = time.perf_counter()
+    for df in batches:
+        records += monitor.process_batch(df)
+    records += monitor.flush()
+    elapsed = time.perf_counter() - t0
+    monitor.close()
+    return records, elapsed
+
+def anomaly_set(records):
+    # detected_at is wall-clock time and err may differ in the last float32 bits
+    return Counter((r["raw"], tuple(r["types"])) for r in records)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=50000)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--batch-lines", type=int, default=2000)
+    ap.add_argument("--train-rows", type=int, default=5000)
+    ap.add_argument("--epochs", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = os.path.join(tmp, "tx_log.txt")
+        write_seeded_log(log, args.lines, args.seed)
+        batches = read_batches(log, args.batch_lines)
+        state = train_model(batches[0].head(args.train_rows), None, epochs=args.epochs)
+
+        def monitor_kwargs(name):
+            return dict(anomaly_file=os.path.join(tmp, name + ".jsonl"), anomaly_db=os.path.join(tmp, name + ".db"),
+                        alert=lambda *a, **k: None, retrain_every=float("inf"))
+
+        single, t_single = run(Monitor(**monitor_kwargs("single")), state, batches)
+        sharded, t_sharded = run(ShardedMonitor(args.workers, **monitor_kwargs("sharded")), state, batches)
+
+    same = anomaly_set(single) == anomaly_set(sharded)
+    ordered = [r["raw"] for r in single] == [r["raw"] for r in sharded]
+    print(f"{args.lines} lines, {len(single)} anomalies (single) / {len(sharded)} (sharded, {args.workers} workers)")
+    print(f"same anomaly set: {'OK' if same else 'MISMATCH'}, same order: {'OK' if ordered else 'MISMATCH'}")
+    print(f"single : {args.lines / t_single:,.0f} tx/s")
+    print(f"sharded: {args.lines / t_sharded:,.0f} tx/s")
+    if not (same and ordered):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
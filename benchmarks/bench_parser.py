@@ -0,0 +1,92 @@
+# benchmarks/bench_parser.py
+# lines/sec of tx_parser vs the previous per-line regex parser (and the binary format)
+#   python -m benchmarks.bench_parser --generate 2000000
+#   python -m benchmarks.bench_parser --log ./logs/tx_log.txt --binary
+import argparse, os, re, tempfile, time
+import pandas as pd
+import tx_parser
+import tx_binary
+
+# ---- previous implementation (ai_monitor.parse_lines / app.read_log) ----
+LEGACY_PATTERN = re.compile(
+    r"\[(?P<ts>[^\]]+)\]\s+status=(?P<status>\w+)\s+latency=(?P<lat>[\d\.]+)ms\s+merchant=(?P<merchant>\S+)\s+region=(?P<region>\S+)\s+amount=(?P<amount>[\d\.]+)"
+)
+
+BENCH_LOG = "./logs/bench_tx.txt"   # --generate target; never the monitored LOG_FILE by default
+
+def legacy_parse_lines(lines, per_row_ts=False):
+    rows = []
+    for L in lines:
+        m = LEGACY_PATTERN.search(L)
+        if m:
+            d = m.groupdict()
+            rows.append({
+                "timestamp": pd.to_datetime(d["ts"]) if per_row_ts else d["ts"],
+                "status": 1 if d["status"]=="SUCCESS" else 0,
+                "latency": float(d["lat"]),
+                "merchant": d["merchant"],
+                "region": d["region"],
+                "amount": float(d["amount"]),
+                "raw": L.strip()
+            })
+    df = pd.DataFrame(rows)
+    if not per_row_ts and not df.empty:
+        # the monitor converted timestamps later, in featurize
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df
+
+def generate_log(path, n_lines):
+    import datetime
+    from generate_transactions import generate_tx_line
+    now = datetime.datetime(2025, 1, 1, 9, 0, 0)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n_lines):
+            f.write(generate_tx_line(now + datetime.timedelta(milliseconds=250*i)) + "\n")
+
+def run(name, fn, chunks):
+    t0 = time.perf_counter()
+    rows = 0
+    for chunk in chunks:
+        rows += len(fn(chunk))
+    dt = time.perf_counter() - t0
+    n = sum(len(c) for c in chunks)
+    print(f"{name:<22} {n:>10} lines  {dt:8.2f}s  {n/dt:>12,.0f} lines/sec  ({rows} parsed)")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--log", default=BENCH_LOG)
+    ap.add_argument("--generate", type=int, default=0, help="write N synthetic lines to --log first")
+    ap.add_argument("--force", action="store_true", help="let --generate overwrite an existing --log")
+    ap.add_argument("--chunk", type=int, default=5000, help="lines per parse call")
+    ap.add_argument("--skip-per-row", action="store_true", help="skip the slow per-row timestamp variant")
+    ap.add_argument("--binary", action="store_true", help="also decode the log converted to the binary format")
+    args = ap.parse_args()
+
+    if args.generate:
+        if os.path.exists(args.log) and not args.force:
+            ap.error(f"{args.log} already exists; pass --force to overwrite it with generated lines")
+        print(f"generating {args.generate} lines -> {args.log}")
+        os.makedirs(os.path.dirname(args.log) or ".", exist_ok=True)
+        generate_log(args.log, args.generate)
+
+    with open(args.log, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    chunks = [lines[i:i+args.chunk] for i in range(0, len(lines), args.chunk)]
+
+    run("tx_parser", tx_parser.parse_lines, chunks)
+    if args.binary:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tx_log.bin")
+            tx_binary.text_to_binary(args.log, path)
+            log = tx_binary.BinaryLog(path)
+            n = len(log)
+            print(f"binary log: {os.path.getsize(path) / 1e6:.1f} MB vs text {os.path.getsize(args.log) / 1e6:.1f} MB")
+            # chunk = range of record indices; records are mmap views, decoding builds the DataFrame
+            run("tx_binary (mmap)", lambda r: log.frame(log.records(r.start, r.stop)),
+                [range(i, min(i + args.chunk, n)) for i in range(0, n, args.chunk)])
+    run("legacy (monitor)", legacy_parse_lines, chunks)
+    if not args.skip_per_row:
+        run("legacy (dashboard)", lambda c: legacy_parse_lines(c, per_row_ts=True), chunks)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# benchmarks/common.py
+# shared helpers: reproducible synthetic logs for the benchmarks
+import datetime, random
+import generate_transactions as gen
+
+def seeded_lines(n_lines, seed, merchants=200, mean_gap_ms=5000, start=datetime.datetime(2025, 1, 1, 9, 0, 0)):
+    """Generator lines (with "\\n") including bursts / merchant spikes, reproducible for a seed."""
+    rnd_state = random.getstate()
+    random.seed(seed)
+    saved_merchants = gen.MERCHANTS
+    gen.MERCHANTS = [f"M{i:04d}" for i in range(merchants)]   # enough keys to spread over shards
+    try:
+        now = start
+        lines = []
+        while len(lines) < n_lines:
+            now += datetime.timedelta(milliseconds=random.expovariate(1 / mean_gap_ms))
+            r = random.random()
+            if r < gen.PROB_BURST:
+                lines += [gen.generate_tx_line(now + datetime.timedelta(milliseconds=i * 5)) + "\n"
+                          for i in range(random.randint(3, 12))]
+            elif r < gen.PROB_BURST + gen.PROB_MERCHANT_SPIKE:
+                m = random.choice(gen.MERCHANTS)
+                for i in range(random.randint(4, 12)):
+                    line = gen.generate_tx_line(now + datetime.timedelta(milliseconds=i * 20))
+                    lines.append(line.replace("merchant=" + line.split("merchant=")[1].split()[0], f"merchant={m}") + "\n")
+            else:
+                lines.append(gen.generate_tx_line(now) + "\n")
+        return lines[:n_lines]
+    finally:
+        gen.MERCHANTS = saved_merchants
+        random.setstate(rnd_state)
+
+def write_seeded_log(path, n_lines, seed, **kwargs):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(seeded_lines(n_lines, seed, **kwargs))
@@ -0,0 +1,88 @@
+# checkpoint.py
+# versioned model checkpoints (detector parameters, scaler, feature maps, threshold) for fast restarts
+import os, re, json, glob
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from config import CHECKPOINT_DIR, CHECKPOINT_KEEP
+from retrainer import ModelState
+from detectors import DETECTORS, detector_of
+
+FORMAT = 1
+_NAME = re.compile(r"^model-v(\d+)\.npz$")
+
+def checkpoint_path(directory, version):
+    return os.path.join(directory, f"model-v{version:06d}.npz")
+
+def save_checkpoint(state, directory=CHECKPOINT_DIR, keep=CHECKPOINT_KEEP):
+    """Write state as model-v<version>.npz (atomic) and prune all but the newest `keep`.
+
+    Everything is stored as plain arrays plus a JSON header (the detector's
+    own to_arrays() output included), so loading needs neither pickle nor
+    TensorFlow.
+    """
+    os.makedirs(directory, exist_ok=True)
+    detector = detector_of(state)
+    det_meta, det_arrays = detector.to_arrays()
+    scaler = state.scaler
+    meta = {
+        **det_meta,
+        "format": FORMAT,
+        "detector": detector.name,
+        "version": int(state.version),
+        "threshold": float(state.threshold),
+        "n_samples": int(state.n_samples),
+        "train_sec": float(state.train_sec),
+        "merchant_map": {str(k): int(v) for k, v in state.merchant_map.items()},
+        "region_map": {str(k): int(v) for k, v in state.region_map.items()},
+        "scaler_n_samples": int(np.max(scaler.n_samples_seen_)),
+    }
+    arrays = {"meta": np.array(json.dumps(meta)),
+              "scaler_mean": scaler.mean_, "scaler_scale": scaler.scale_, "scaler_var": scaler.var_}
+    arrays.update(det_arrays)
+    path = checkpoint_path(directory, state.version)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    for old in list_checkpoints(directory)[:-keep] if keep else []:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    return path
+
+def list_checkpoints(directory=CHECKPOINT_DIR):
+    """Checkpoint files of a directory, oldest version first."""
+    found = []
+    for path in glob.glob(os.path.join(directory, "model-v*.npz")):
+        m = _NAME.match(os.path.basename(path))
+        if m:
+            found.append((int(m.group(1)), path))
+    return [path for _, path in sorted(found)]
+
+def load_checkpoint(path):
+    """ModelState from a checkpoint file; model is None (an autoencoder scores with its NumPy path)."""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta.get("format") != FORMAT:
+            raise ValueError(f"unsupported checkpoint format in {path}: {meta.get('format')}")
+        detector = DETECTORS[meta.get("detector", "autoencoder")].from_arrays(meta, data)
+        scaler = StandardScaler()
+        scaler.mean_ = data["scaler_mean"]
+        scaler.scale_ = data["scaler_scale"]
+        scaler.var_ = data["scaler_var"]
+    scaler.n_features_in_ = len(scaler.mean_)
+    scaler.n_samples_seen_ = meta["scaler_n_samples"]
+    return ModelState(None, scaler, meta["merchant_map"], meta["region_map"], meta["threshold"],
+                      meta["n_samples"], meta["version"], meta["train_sec"], detector)
+
+def load_latest(directory=CHECKPOINT_DIR):
+    """Newest readable checkpoint of a directory, or None (corrupt files are skipped)."""
+    for path in reversed(list_checkpoints(directory)):
+        try:
+            return load_checkpoint(path)
+        except Exception as e:
+            print(f"Skipping unreadable checkpoint {path}: {e}")
+    return None
@@ -2,9 +2,94 @@
 # Telegram 설정
 TELEGRAM_TOKEN = "TELEGRAM_TOKEN"
 TELEGRAM_CHAT_ID = "TELEGRAM_CHAT_ID"
+TELEGRAM_API_BASE = "https://api.telegram.org"   # 테스트 시 로컬 대체 서버 주소로 변경 가능
+
+# 알림 전송 (백그라운드 디스패처)
+ALERT_QUEUE_SIZE = 1000         # 대기 알림 최대 개수
+ALERT_OVERFLOW = "drop_oldest"  # 큐가 가득 찼을 때: drop_oldest | drop_new
+ALERT_COALESCE_SEC = 2.0        # 이 시간 동안 모인 같은 유형 알림은 요약 메시지 1건으로 전송
+ALERT_RATE_PER_SEC = 1.0        # 초당 전송 메시지 수 (token bucket)
+ALERT_BURST = 5                 # 순간 최대 전송 수
+ALERT_MAX_RETRIES = 3           # 전송 실패 시 재시도 횟수
+ALERT_BACKOFF_SEC = 1.0         # 재시도 대기 (지수 증가)
 
 # 이상탐지/운영 파라미터
 CONTAMINATION = 0.03    # AutoEncoder에서는 참고용; 실제 threshold는 재구성오차로 결정
 MIN_WARMUP = 200        # AutoEncoder 초기학습에 필요한 샘플 수
 RETRAIN_EVERY = 200     # 새로운 샘플 수집 후 재학습 간격
+WARMUP_EPOCHS = 20      # 초기학습 epoch
+RETRAIN_EPOCHS = 10     # 재학습 epoch
+RETRAIN_BACKGROUND = True   # 재학습을 백그라운드 스레드에서 수행 (탐지는 기존 모델로 계속)
+RETRAIN_WARM_START = True   # 재학습 시 이전 가중치에서 이어서 학습
+FAST_INFERENCE = True       # 온라인 점수 계산에 NumPy 경량 추론 경로 사용 (학습은 Keras)
+DETECTOR = "autoencoder"    # 탐지 모델: autoencoder | mahalanobis | isolation_forest (detectors.py)
+DETECTOR_THRESHOLD_PERCENTILE = 97.5   # 학습 데이터 점수의 이 분위수를 이상 기준으로 사용
+MAHALANOBIS_DECAY = 0.5     # 재학습(증분 갱신)마다 이전 평균/공분산 통계에 곱하는 가중치
+MAHALANOBIS_CLIP = 3.0      # 이 거리를 넘는 행은 가중치를 줄여 반영 (이상치에 강건)
+ISOLATION_TREES = 100       # isolation forest 트리 수
+ISOLATION_MAX_SAMPLES = 256 # 트리당 샘플 수
+# 이상 기준(threshold): 배치마다 점수를 스트리밍 분위수 스케치에 반영해 갱신 (thresholds.py)
+THRESHOLD_SEGMENT = "global"    # 기준 분리 단위: global | merchant | hour | merchant_hour (세그먼트 기준은 전체 기준보다 높을 때만 적용)
+THRESHOLD_SKETCH_ALPHA = 0.02   # 분위수 상대 오차
+THRESHOLD_HALF_LIFE = 50000     # 점수 분포 반감기 (행 수, 0=감쇠 없음)
+THRESHOLD_MIN_COUNT = 200       # 기준으로 쓰기 위한 최소 표본 수 (감쇠 반영, 재학습 시에도 스케치는 유지되므로 RETRAIN_EVERY와 무관)
+THRESHOLD_MAX_KEYS = 1000       # 세그먼트 스케치 최대 개수 (초과 시 오래 안 쓰인 것부터 제거)
+THRESHOLD_SEED_ROWS = 1000      # 학습 직후 초기 기준 계산에 쓰는 최근 학습 표본 수 (전체 버퍼 재예측 대신, 첫 모델은 이 점수로 스케치 시작)
+DETECT_WORKERS = 0          # 상점 기준 샤딩 탐지 워커 프로세스 수 (0=단일 프로세스)
+DETECT_MAX_INFLIGHT = 4     # 워커에 동시에 보내 둘 최대 배치 수
 LOG_FILE = "./logs/tx_log.txt"
+LOG_FORMAT = "text"                     # text | binary (tx_binary.py 고정 폭 레코드, mmap 으로 읽음)
+BINARY_LOG_FILE = "./logs/tx_log.bin"   # LOG_FORMAT="binary" 일 때 읽는 로그 (이름 사전은 + ".dict")
+CHECKPOINT_DIR = "./logs/checkpoints"   # 학습/재학습 후 모델 체크포인트 저장 위치 (재시작 시 최신 버전으로 즉시 탐지, 실시간 모니터만 사용), ""=사용 안 함
+CHECKPOINT_KEEP = 5                     # 보관할 체크포인트 버전 수
+
+# 단일 거래 룰 기준
+HIGH_LATENCY_MS = 1000          # 고지연 기준(ms)
+HIGH_AMOUNT = 500000            # 고액 기준 (환경에 맞게 조정)
+OFF_HOURS = (0, 1, 2, 3, 4)     # 심야 거래 시간대
+COMPOSITE_MIN_TYPES = 3         # 복합 이상으로 보는 최소 유형 수
+
+# 행위 기반 룰 (슬라이딩 윈도우)
+WINDOW_SEC = 60                 # burst / card_testing / merchant_spike 윈도우(초)
+WINDOW_MAX_LATENESS_SEC = 60    # 이 시간 이내로 순서가 뒤바뀐 거래까지 정확히 셈 (윈도우는 WINDOW_SEC + 이 값만큼만 보관)
+BURST_THRESHOLD = 8             # 윈도우 내 전체 거래 수
+CARD_TEST_MAX_AMOUNT = 2000     # 카드테스트로 보는 소액 기준
+CARD_TEST_THRESHOLD = 6         # 윈도우 내 동일 상점 소액 거래 수
+MERCHANT_SPIKE_THRESHOLD = 10   # 윈도우 내 동일 상점 거래 수
+MERCHANT_IDLE_SEC = 600         # 이 시간 동안 거래 없는 상점 상태는 제거
+MAX_MERCHANT_KEYS = 50000       # 상점별 상태 최대 개수 (탐지 엔진마다 적용: DETECT_WORKERS > 0 이면 워커별 한도라 전체는 최대 워커 수 × 이 값)
+
+# 로그 tail
+OFFSET_FILE = LOG_FILE + ".offset"   # 처리 완료 위치 저장 (재시작 시 이어서 읽기)
+BINARY_OFFSET_FILE = BINARY_LOG_FILE + ".offset"
+TAIL_CHUNK_BYTES = 1 << 20           # 한 번에 읽는 크기
+TAIL_MAX_BATCH_BYTES = 8 << 20       # 한 배치 최대 크기 (밀린 로그 처리 시)
+TAIL_POLL_SEC = 1.0                  # inotify 미지원 시 폴링 간격 / 최대 대기
+
+# 소켓 수집 서버 (ingest.py): 파일 tail 대신 생산자가 TCP / Unix 소켓으로 전송
+INGEST_ADDRESS = ""                  # "tcp://127.0.0.1:7070" 또는 "unix:///tmp/txmon.sock" 설정 시 ai_monitor가 소켓으로 수신 (""=파일 tail)
+INGEST_MAX_PENDING = 16              # 탐지 대기 배치 최대 수 (가득 차면 소켓 읽기 중단 → 생산자 전송이 막힘)
+INGEST_MAX_BATCH_BYTES = TAIL_MAX_BATCH_BYTES   # 배치 1개 최대 크기 (대기 배치는 이 크기까지 합쳐서 탐지)
+INGEST_WINDOW = 8                    # 클라이언트가 ack 없이 보낼 수 있는 최대 배치 수
+
+# 이상 이벤트 파일 (anomalies.jsonl)
+ANOMALY_FSYNC = "interval"           # never | batch | interval (ANOMALY_FSYNC_SEC마다 fsync)
+ANOMALY_FSYNC_SEC = 1.0              # interval 정책의 fsync 간격 (초)
+ANOMALY_ROTATE_BYTES = 256 << 20     # 이 크기를 넘으면 .1, .2 ... 로 로테이션 (0=사용 안 함)
+ANOMALY_ROTATE_SEC = 0               # 파일 유지 시간 기준 로테이션 (0=사용 안 함)
+ANOMALY_BACKUPS = 5                  # 보관할 로테이션 파일 수
+ANOMALY_DB = LOG_FILE + ".anomalies.db"   # SQLite 이상 이벤트 저장소 (대시보드 조회용)
+ANOMALY_OUTPUTS = ("jsonl", "sqlite")     # 이상 이벤트 기록 대상: jsonl, sqlite
+
+# 거래 지표 롤업 (분/시간 단위 집계, ANOMALY_DB의 tx_rollups 테이블)
+ROLLUPS_ENABLED = True
+ROLLUP_GRANULARITIES = ("minute", "hour")
+ROLLUP_FLUSH_SEC = 5.0          # 집계 저장 주기
+ROLLUP_MAX_KEYS = 100           # 버킷별 상점/지역 세부 집계 최대 키 수 (초과분은 (other))
+ROLLUP_SKETCH_ALPHA = 0.01      # latency 분위수 스케치 상대 오차
+
+# 파이프라인 지표 (Prometheus 텍스트 형식)
+METRICS_FILE = LOG_FILE + ".metrics.prom"   # textfile 출력 (대시보드 상태 패널, node_exporter 용), ""=사용 안 함
+METRICS_FLUSH_SEC = 5.0         # textfile 갱신 주기
+METRICS_PORT = 0                # >0 이면 http://METRICS_HOST:METRICS_PORT/metrics 제공
+METRICS_HOST = "127.0.0.1"
@@ -0,0 +1,308 @@
+# detectors.py
+# anomaly detector backends over featurize() output (selected with config.DETECTOR)
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from config import (DETECTOR, DETECTOR_THRESHOLD_PERCENTILE, FAST_INFERENCE, RETRAIN_EPOCHS,
+                    MAHALANOBIS_DECAY, MAHALANOBIS_CLIP, ISOLATION_TREES, ISOLATION_MAX_SAMPLES)
+from fast_infer import NumpyAutoencoder, check_equivalence, reconstruction_error
+
+class Detector:
+    """Interface of a detector backend.
+
+    fit(X, prev) trains on scaled features (prev is the previous detector of
+    the same backend, for warm starts / incremental updates); score(X)
+    returns one anomaly score per row, higher is more anomalous;
+    threshold(scores) derives the alert threshold from the training scores;
+    to_arrays() / from_arrays() (de)serialize into plain arrays and a JSON
+    header for checkpoint.py. A fitted detector is the ModelState scorer:
+    it is pickled to the detection workers and must score without Keras
+    unless `portable` is False.
+    """
+
+    name = None
+    incremental = False   # fit() continues prev and only needs the rows since the last fit
+    portable = True
+
+    def fit(self, X, prev=None, epochs=RETRAIN_EPOCHS, warm_start=False):
+        raise NotImplementedError
+
+    def score(self, X):
+        raise NotImplementedError
+
+    def threshold(self, scores, percentile=DETECTOR_THRESHOLD_PERCENTILE):
+        return float(np.percentile(scores, percentile))
+
+    def to_arrays(self):
+        """(JSON-able meta dict, dict of arrays)."""
+        raise NotImplementedError
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        raise NotImplementedError
+
+# ---- AutoEncoder (Keras training, NumPy scoring) ----
+def build_autoencoder(input_dim):
+    # TensorFlow is only imported once a model is actually trained
+    from tensorflow import keras
+    inputs = keras.Input(shape=(input_dim,))
+    x = keras.layers.Dense(32, activation="relu")(inputs)
+    x = keras.layers.Dense(16, activation="relu")(x)
+    encoded = keras.layers.Dense(8, activation="relu")(x)
+
+    x = keras.layers.Dense(16, activation="relu")(encoded)
+    x = keras.layers.Dense(32, activation="relu")(x)
+    outputs = keras.layers.Dense(input_dim, activation="linear")(x)
+
+    model = keras.Model(inputs, outputs)
+    model.compile(optimizer="adam", loss="mse")
+    return model
+
+class AutoencoderDetector(Detector):
+    """Reconstruction error of a dense autoencoder.
+
+    Scores with the exported NumpyAutoencoder (FAST_INFERENCE) when it
+    matches Keras on a sample, otherwise with Keras predict; the Keras
+    model is not pickled, so only the NumPy path is portable.
+    """
+
+    name = "autoencoder"
+
+    def __init__(self, net=None, model=None):
+        self.net = net       # NumpyAutoencoder
+        self.model = model   # keras.Model (None after a checkpoint restore)
+
+    @property
+    def portable(self):
+        return self.net is not None
+
+    def __getstate__(self):
+        return {"net": self.net, "model": None}
+
+    def keras_weights(self):
+        """Flat [W0, b0, W1, b1, ...] list for keras Model.set_weights."""
+        if self.model is not None:
+            return self.model.get_weights()
+        return [a for W, b, _ in self.net.get_weights() for a in (W, b)]
+
+    def fit(self, X, prev=None, epochs=RETRAIN_EPOCHS, warm_start=False):
+        model = build_autoencoder(X.shape[1])
+        if warm_start and prev is not None:
+            model.set_weights(prev.keras_weights())
+        model.fit(X, X, epochs=epochs, batch_size=32, verbose=0)
+        self.model = model
+        self.net = None
+        if FAST_INFERENCE:
+            # NumPy fast path for online scoring, verified against Keras on a sample
+            net = NumpyAutoencoder.from_keras(model)
+            ok, diff = check_equivalence(net, model, X[:256])
+            if ok:
+                self.net = net
+            else:
+                print(f"Fast inference mismatch (max diff {diff:.2e}); using Keras predict")
+        return self
+
+    def score(self, X):
+        if self.net is not None:
+            return self.net.score(X)
+        return reconstruction_error(self.model, X)
+
+    def to_arrays(self):
+        layers = self.net.get_weights() if self.net is not None else NumpyAutoencoder.from_keras(self.model).get_weights()
+        arrays = {}
+        for i, (W, b, _) in enumerate(layers):
+            arrays[f"W{i}"] = W
+            arrays[f"b{i}"] = b
+        return {"activations": [act for _, _, act in layers]}, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        return cls(NumpyAutoencoder([(arrays[f"W{i}"], arrays[f"b{i}"], act)
+                                     for i, act in enumerate(meta["activations"])]))
+
+# ---- robust Mahalanobis distance with streaming mean / covariance ----
+class MahalanobisDetector(Detector):
+    """Squared Mahalanobis distance to a streaming mean / covariance.
+
+    Statistics are merged batch by batch (weighted Welford / Chan update),
+    so a retrain only folds in the rows seen since the previous fit; older
+    statistics are down-weighted by `decay` on every fit. Rows beyond
+    `clip` standard distances get Huber weights clip / distance, so the
+    anomalies being detected barely move the estimate.
+    """
+
+    name = "mahalanobis"
+    incremental = True
+
+    def __init__(self, decay=MAHALANOBIS_DECAY, clip=MAHALANOBIS_CLIP, ridge=1e-6):
+        self.decay = decay
+        self.clip = clip
+        self.ridge = ridge
+        self.n = 0.0          # effective (weighted) sample count
+        self.mean = None
+        self.m2 = None        # weighted sum of outer products of deviations
+        self.precision = None
+
+    def _merge(self, X, w):
+        wsum = float(w.sum())
+        if wsum <= 0:
+            return
+        mb = w @ X / wsum
+        D = X - mb
+        cb = (D * w[:, None]).T @ D
+        if self.mean is None:
+            self.n, self.mean, self.m2 = wsum, mb, cb
+        else:
+            n = self.n + wsum
+            delta = mb - self.mean
+            self.mean = self.mean + delta * (wsum / n)
+            self.m2 = self.m2 + cb + np.outer(delta, delta) * (self.n * wsum / n)
+            self.n = n
+        self._update_precision()
+
+    def _update_precision(self):
+        cov = self.m2 / max(self.n, 1.0)
+        cov = cov + self.ridge * np.eye(len(cov))
+        self.precision = np.linalg.pinv(cov)
+
+    def fit(self, X, prev=None, epochs=RETRAIN_EPOCHS, warm_start=False):
+        X = np.asarray(X, dtype=np.float64)
+        if prev is not None and prev.mean is not None and len(prev.mean) == X.shape[1]:
+            self.n = prev.n * self.decay
+            self.mean = prev.mean.copy()
+            self.m2 = prev.m2 * self.decay
+            self._update_precision()
+        else:
+            # first fit: plain estimate, then one Huber-reweighted pass from scratch
+            self._merge(X, np.ones(len(X)))
+            w = self._weights(X)
+            self.n, self.mean, self.m2 = 0.0, None, None
+            self._merge(X, w)
+            return self
+        self._merge(X, self._weights(X))
+        return self
+
+    def _weights(self, X):
+        dist = np.sqrt(np.maximum(self.score(X), 0.0))
+        return np.minimum(1.0, self.clip / np.maximum(dist, 1e-12))
+
+    def score(self, X):
+        D = np.asarray(X, dtype=np.float64) - self.mean
+        return np.einsum("ij,jk,ik->i", D, self.precision, D)
+
+    def to_arrays(self):
+        meta = {"n": self.n, "decay": self.decay, "clip": self.clip, "ridge": self.ridge}
+        return meta, {"mean": self.mean, "m2": self.m2}
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        det = cls(meta["decay"], meta["clip"], meta["ridge"])
+        det.n = meta["n"]
+        det.mean = np.asarray(arrays["mean"])
+        det.m2 = np.asarray(arrays["m2"])
+        det._update_precision()
+        return det
+
+# ---- isolation forest (sklearn training, flattened NumPy scoring) ----
+def _average_path_length(n):
+    """Expected path length of an unsuccessful BST search over n points (c(n) of the paper)."""
+    n = np.asarray(n, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+class IsolationForestDetector(Detector):
+    """Isolation forest anomaly score 2^(-E[path length] / c(max_samples)).
+
+    Trees are grown by sklearn's IsolationForest, then flattened into one
+    node table (leaves point to themselves and store depth + c(leaf size)),
+    so a batch is scored with max_depth vectorized steps over all trees
+    instead of sklearn's per-tree calls. Scores equal score_samples negated.
+    """
+
+    name = "isolation_forest"
+
+    def __init__(self, n_trees=ISOLATION_TREES, max_samples=ISOLATION_MAX_SAMPLES, seed=0):
+        self.n_trees = n_trees
+        self.max_samples = max_samples
+        self.seed = seed
+
+    def fit(self, X, prev=None, epochs=RETRAIN_EPOCHS, warm_start=False):
+        forest = IsolationForest(n_estimators=self.n_trees, max_samples=min(self.max_samples, len(X)),
+                                 random_state=self.seed).fit(X)
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset = max_depth = 0
+        for est in forest.estimators_:
+            t = est.tree_
+            ids = np.arange(t.node_count)
+            leaf = t.children_left < 0
+            depth = np.zeros(t.node_count, dtype=np.int64)
+            for node in ids[~leaf]:   # children always follow their parent
+                depth[t.children_left[node]] = depth[t.children_right[node]] = depth[node] + 1
+            roots.append(offset)
+            feature.append(np.where(leaf, 0, t.feature))
+            threshold.append(t.threshold)
+            left.append(np.where(leaf, ids, t.children_left) + offset)
+            right.append(np.where(leaf, ids, t.children_right) + offset)
+            value.append(np.where(leaf, depth + _average_path_length(t.n_node_samples), 0.0))
+            offset += t.node_count
+            max_depth = max(max_depth, int(depth.max()))
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold_ = np.concatenate(threshold)
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.value = np.concatenate(value)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = max_depth
+        self.norm = float(_average_path_length([forest._max_samples])[0])
+        return self
+
+    def score(self, X, chunk=2048):
+        X = np.asarray(X, dtype=np.float32)   # sklearn trees split on float32 features
+        if not self.norm:
+            return np.ones(len(X))
+        depth = np.empty(len(X))
+        for i in range(0, len(X), chunk):   # bounds the (rows x trees) node arrays
+            Xc = X[i:i + chunk]
+            rows = np.arange(len(Xc))[:, None]
+            node = np.broadcast_to(self.roots, (len(Xc), len(self.roots)))
+            for _ in range(self.max_depth):
+                go_left = Xc[rows, self.feature[node]] <= self.threshold_[node]
+                node = np.where(go_left, self.left[node], self.right[node])
+            depth[i:i + chunk] = self.value[node].mean(axis=1)
+        return 2.0 ** (-depth / self.norm)
+
+    def to_arrays(self):
+        meta = {"n_trees": self.n_trees, "max_samples": self.max_samples, "seed": self.seed,
+                "max_depth": self.max_depth, "norm": self.norm}
+        arrays = {"feature": self.feature, "threshold": self.threshold_, "left": self.left,
+                  "right": self.right, "value": self.value, "roots": self.roots}
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        det = cls(meta["n_trees"], meta["max_samples"], meta["seed"])
+        det.feature = np.asarray(arrays["feature"]).astype(np.intp)
+        det.threshold_ = np.asarray(arrays["threshold"])
+        det.left = np.asarray(arrays["left"]).astype(np.intp)
+        det.right = np.asarray(arrays["right"]).astype(np.intp)
+        det.value = np.asarray(arrays["value"])
+        det.roots = np.asarray(arrays["roots"]).astype(np.intp)
+        det.max_depth = meta["max_depth"]
+        det.norm = meta["norm"]
+        return det
+
+DETECTORS = {cls.name: cls for cls in (AutoencoderDetector, MahalanobisDetector, IsolationForestDetector)}
+
+def make_detector(name=DETECTOR):
+    try:
+        return DETECTORS[name]()
+    except KeyError:
+        raise ValueError(f"unknown detector {name!r}; choose from {', '.join(DETECTORS)}") from None
+
+def detector_of(state):
+    """The fitted detector of a ModelState (a Keras-only autoencoder has scorer=None)."""
+    if state.scorer is not None:
+        return state.scorer
+    return AutoencoderDetector(model=state.model)
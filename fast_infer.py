@@ -0,0 +1,85 @@
+# fast_infer.py
+# NumPy forward pass of the trained Keras autoencoder for small online batches
+import numpy as np
+
+def _relu(x):
+    np.maximum(x, 0, out=x)
+
+ACTIVATIONS = {"relu": _relu, "linear": None}
+
+class NumpyAutoencoder:
+    """Dense-only forward pass with reconstruction error in the same pass.
+
+    Keras is still used for training; after each (re)train the weights are
+    exported with from_keras(). Per-layer float32 output buffers are
+    preallocated and reused, so scoring a batch of a few rows does no
+    framework dispatch and almost no allocation. Not thread-safe: use one
+    instance per scoring thread.
+    """
+
+    def __init__(self, layers, capacity=64):
+        # layers: list of (W [in, out], b [out], activation name)
+        self.layers = [(np.ascontiguousarray(W, dtype=np.float32), np.asarray(b, dtype=np.float32), act)
+                       for W, b, act in layers]
+        for _, _, act in self.layers:
+            if act not in ACTIVATIONS:
+                raise ValueError(f"unsupported activation: {act}")
+        self.input_dim = self.layers[0][0].shape[0]
+        self._alloc(capacity)
+
+    @classmethod
+    def from_keras(cls, model):
+        layers = []
+        for layer in model.layers:
+            weights = layer.get_weights()
+            if not weights:
+                continue   # InputLayer
+            W, b = weights
+            layers.append((W, b, layer.get_config().get("activation", "linear")))
+        return cls(layers)
+
+    def get_weights(self):
+        return [(W.copy(), b.copy(), act) for W, b, act in self.layers]
+
+    def _alloc(self, capacity):
+        self._capacity = capacity
+        self._x = np.empty((capacity, self.input_dim), dtype=np.float32)
+        self._bufs = [np.empty((capacity, W.shape[1]), dtype=np.float32) for W, _, _ in self.layers]
+
+    def _forward(self, X):
+        n = len(X)
+        if n > self._capacity:
+            self._alloc(max(n, 2 * self._capacity))
+        x = self._x[:n]
+        x[...] = X
+        h = x
+        for (W, b, act), buf in zip(self.layers, self._bufs):
+            out = buf[:n]
+            np.matmul(h, W, out=out)
+            out += b
+            if ACTIVATIONS[act] is not None:
+                ACTIVATIONS[act](out)
+            h = out
+        return x, h
+
+    def predict(self, X):
+        """Reconstruction of X (a copy, float32)."""
+        return self._forward(X)[1].copy()
+
+    def score(self, X):
+        """Per-row mean squared reconstruction error (float64)."""
+        x, out = self._forward(X)
+        out -= x
+        np.square(out, out=out)
+        return out.mean(axis=1, dtype=np.float64)
+
+def reconstruction_error(model, X):
+    """Reference path: Keras predict + MSE (as used before the fast path)."""
+    return np.mean((model.predict(X, verbose=0) - X)**2, axis=1)
+
+def check_equivalence(scorer, model, X, rtol=1e-3, atol=1e-6):
+    """Compare fast-path errors with Keras on X; returns (ok, max_abs_diff)."""
+    fast = scorer.score(X)
+    ref = reconstruction_error(model, X)
+    diff = float(np.max(np.abs(fast - ref))) if len(X) else 0.0
+    return bool(np.allclose(fast, ref, rtol=rtol, atol=atol)), diff
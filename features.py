@@ -0,0 +1,26 @@
+# features.py
+# model input features shared by the monitor, the trainer and the detection workers
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+def featurize(df, merchant_map=None, region_map=None, scaler:StandardScaler=None):
+    # map merchants and regions to integers (consistent mapping)
+    if merchant_map is None:
+        merchant_map = {m:i for i,m in enumerate(sorted(df["merchant"].unique()))}
+    if region_map is None:
+        region_map = {r:i for i,r in enumerate(sorted(df["region"].unique()))}
+    df = df.copy()
+    df["merchant_id"] = df["merchant"].map(merchant_map).fillna(-1).astype(int)
+    df["region_id"] = df["region"].map(region_map).fillna(-1).astype(int)
+
+    # numeric features: latency, amount, status, merchant_id, region_id, hour
+    df["hour"] = pd.to_datetime(df["timestamp"]).dt.hour
+    X = df[["latency","amount","status","merchant_id","region_id","hour"]].astype(float).values
+
+    # scale
+    if scaler is None:
+        scaler = StandardScaler()
+        Xs = scaler.fit_transform(X)
+    else:
+        Xs = scaler.transform(X)
+    return Xs, scaler, merchant_map, region_map
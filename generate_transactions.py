@@ -1,9 +1,12 @@
 # generate_transactions.py
-import random, time, datetime, os
+import random, time, datetime, os, argparse, shutil
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 LOG_DIR = "./logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 FNAME = os.path.join(LOG_DIR, "tx_log.txt")
+BIN_FNAME = os.path.join(LOG_DIR, "tx_log.bin")   # --format binary (tx_binary.py)
 
 MERCHANTS = ["CU","GS25","Starbucks","Amazon","NaverPay","Homeplus"]
 REGIONS = ["Seoul","Busan","Incheon","Daegu","Gwangju"]
@@ -19,7 +22,8 @@ PROB_BURST = 0.01
 PROB_CARD_TEST = 0.005   # 소액 반복 (card testing)
 PROB_MERCHANT_SPIKE = 0.004  # 특정 상점에서 짧은 시간에 집중
 
-def generate_tx_line(now=None):
+def generate_tx(now=None):
+    """거래 1건의 필드 (timestamp, status, latency, merchant, region, amount)"""
     if now is None:
         now = datetime.datetime.now()
 
@@ -65,46 +69,324 @@ def generate_tx_line(now=None):
     # 7) 상점 스파이크: 특정 상점에서 다수 거래를 빠르게 발생시키기 위해 호출 측에서 burst 모드 사용
     # 8) 버스트(한 번에 여러 거래) 핸들링은 main()에서 실행
 
+    return now, status, latency, merchant, region, amount
+
+def format_tx(tx):
+    now, status, latency, merchant, region, amount = tx
     timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
     return f"[{timestamp}] status={status} latency={latency:.1f}ms merchant={merchant} region={region} amount={amount}"
 
-def main(rate_per_sec=1.0):
-    print(f"Starting transaction generator -> {FNAME}")
+def generate_tx_line(now=None):
+    return format_tx(generate_tx(now))
+
+def main(rate_per_sec=1.0, fmt="text", path=None, send=None):
+    path = path or (BIN_FNAME if fmt == "binary" else FNAME)
+    print(f"Starting transaction generator -> {send or path}")
     cnt = 0
+    if send:
+        # 클라이언트 모드: 파일 대신 ai_monitor 수집 서버로 전송 (flush 마다 배치 1개, ack 대기)
+        from ingest import IngestClient
+        writer = IngestClient(send)
+    elif fmt == "binary":
+        from tx_binary import BinaryLogWriter
+        writer = BinaryLogWriter(path)
+    else:
+        writer = open(path, "a", encoding="utf-8")
     try:
-        with open(FNAME, "a", encoding="utf-8") as f:
+        with writer as f:
             while True:
                 now = datetime.datetime.now()
-                lines_to_write = []
+                txs = []
 
                 # 버스트 이벤트 발생 시 여러 거래를 빠르게 append
                 if random.random() < PROB_BURST:
                     burst_count = random.randint(3, 12)
                     for i in range(burst_count):
-                        lines_to_write.append(generate_tx_line(now + datetime.timedelta(milliseconds=i*5)))
+                        txs.append(generate_tx(now + datetime.timedelta(milliseconds=i*5)))
                 elif random.random() < PROB_MERCHANT_SPIKE:
                     # 특정 merchant spike: 같은 merchant로 연속 소수 거래 생성
                     m = random.choice(MERCHANTS)
                     for i in range(random.randint(4,12)):
-                        line = generate_tx_line(now + datetime.timedelta(milliseconds=i*20))
+                        tx = generate_tx(now + datetime.timedelta(milliseconds=i*20))
                         # replace merchant to spike merchant
-                        line = line.replace("merchant=" + line.split("merchant=")[1].split()[0], f"merchant={m}")
-                        lines_to_write.append(line)
+                        txs.append(tx[:3] + (m,) + tx[4:])
                 else:
-                    lines_to_write.append(generate_tx_line(now))
+                    txs.append(generate_tx(now))
 
-                for line in lines_to_write:
-                    f.write(line + "\n")
-                    cnt += 1
+                if fmt == "binary":
+                    ts, status, latency, merchant, region, amount = zip(*txs)
+                    f.write_columns(np.array(ts, dtype="datetime64[ns]"), np.array(status, dtype=object),
+                                    latency, np.array(merchant, dtype=object), np.array(region, dtype=object), amount)
+                else:
+                    for tx in txs:
+                        f.write(format_tx(tx) + "\n")
+                cnt += len(txs)
 
                 f.flush()
                 if cnt % 50 == 0:
-                    print(f"[heartbeat] {cnt} txs -> last: {lines_to_write[-1].split(' ',1)[1]}")
+                    print(f"[heartbeat] {cnt} txs -> last: {format_tx(txs[-1]).split(' ',1)[1]}")
                 # poisson-like spacing
                 wait = random.expovariate(rate_per_sec) if rate_per_sec>0 else 1.0
                 time.sleep(max(0.01, wait))
     except KeyboardInterrupt:
         print("Stopped by user")
 
+# ---- 백필(대량 생성) 모드 ----
+# 위 generate_tx_line / main 과 같은 확률의 시나리오를 NumPy로 한 번에 샘플링해서
+# 시뮬레이션 시간 구간 [start, end)의 전체 거래를 큰 청크 단위로 기록 (시드 고정 시 재현 가능)
+BACKFILL_CHUNK_EVENTS = 200_000   # 청크당 이벤트 수 (이벤트 = 단일 거래 / 버스트 / 상점 스파이크)
+LABEL_NAMES = ["high_latency", "high_amount", "unknown_merchant", "unknown_region", "failure",
+               "off_hour", "card_testing", "burst", "merchant_spike"]
+
+_TABLES = {}
+
+def _tables():
+    # 문자열 변환 캐시: 시각(HH:MM:SS), latency(0.1ms 단위), odd_* 이름
+    if not _TABLES:
+        _TABLES["tod"] = np.array([f"{h:02d}:{m:02d}:{s:02d}" for h in range(24) for m in range(60) for s in range(60)], dtype=object)
+        _TABLES["latency"] = np.array([f"{i // 10}.{i % 10}" for i in range(100_000)], dtype=object)
+        _TABLES["odd_merchant"] = np.array(["odd_merchant_" + str(i) for i in range(1000)], dtype=object)
+        _TABLES["odd_region"] = np.array(["odd_region_" + str(i) for i in range(1000)], dtype=object)
+        _TABLES["label"] = np.array([",".join(n for i, n in enumerate(LABEL_NAMES) if m >> i & 1)
+                                     for m in range(1 << len(LABEL_NAMES))], dtype=object)
+    return _TABLES
+
+def _sample_columns(rng, event_ns):
+    """Transaction columns (+ label bitmask per row) for events starting at event_ns (epoch ns, sorted)."""
+    t = _tables()
+    n_events = len(event_ns)
+    bit = {name: 1 << i for i, name in enumerate(LABEL_NAMES)}
+
+    # 이벤트 종류: 버스트(3~12건, 5ms 간격) / 상점 스파이크(4~12건, 20ms 간격, 같은 상점) / 단일
+    burst = rng.random(n_events) < PROB_BURST
+    spike = ~burst & (rng.random(n_events) < PROB_MERCHANT_SPIKE)
+    count = np.ones(n_events, dtype=np.int64)
+    count[burst] = rng.integers(3, 13, burst.sum())
+    count[spike] = rng.integers(4, 13, spike.sum())
+    step_ms = np.where(burst, 5, np.where(spike, 20, 0))
+    spike_merchant = rng.integers(0, len(MERCHANTS), n_events)
+
+    ev = np.repeat(np.arange(n_events), count)
+    n = len(ev)
+    pos = np.arange(n) - np.repeat(np.cumsum(count) - count, count)
+    ts = event_ns[ev] + pos * step_ms[ev] * 1_000_000
+    labels = np.zeros(n, dtype=np.int64)
+    labels[burst[ev]] |= bit["burst"]
+    labels[spike[ev]] |= bit["merchant_spike"]
+
+    # 기본 정상 분포
+    fail = rng.random(n) >= 0.96
+    latency = np.maximum(10, rng.normal(150, 40, n))
+    latency = np.where(fail, latency * rng.uniform(1.8, 4.0, n), latency)
+    merchants = np.array(MERCHANTS, dtype=object)[rng.integers(0, len(MERCHANTS), n)]
+    regions = np.array(REGIONS, dtype=object)[rng.integers(0, len(REGIONS), n)]
+    amount = np.rint(np.maximum(100, rng.normal(30000, 15000, n)))
+
+    # 이상 시나리오 (generate_tx_line 과 같은 순서/확률)
+    hit = rng.random(n) < PROB_HIGH_LATENCY
+    latency = np.where(hit, rng.uniform(1000, 8000, n), latency)
+    labels[hit] |= bit["high_latency"]
+    hit = rng.random(n) < PROB_HIGH_AMOUNT
+    amount = np.where(hit, np.rint(rng.uniform(500000, 5000000, n)), amount)
+    labels[hit] |= bit["high_amount"]
+    hit = rng.random(n) < PROB_UNKNOWN_MERCHANT
+    merchants[hit] = t["odd_merchant"][rng.integers(1, 1000, hit.sum())]
+    labels[hit] |= bit["unknown_merchant"]
+    hit = rng.random(n) < PROB_UNKNOWN_REGION
+    regions[hit] = t["odd_region"][rng.integers(1, 1000, hit.sum())]
+    labels[hit] |= bit["unknown_region"]
+    hit = rng.random(n) < PROB_FAILURE
+    fail |= hit
+    latency = np.where(hit, np.maximum(1.0, latency * rng.uniform(1.5, 5.0, n)), latency)
+    labels[hit] |= bit["failure"]
+    sec = ts // 1_000_000_000
+    hit = rng.random(n) < PROB_OFF_HOUR
+    k = hit.sum()
+    sec[hit] = (sec[hit] // 86400 * 86400 + rng.integers(0, 5, k) * 3600
+                + rng.integers(0, 60, k) * 60 + rng.integers(0, 60, k))
+    labels[hit] |= bit["off_hour"]
+    hit = rng.random(n) < PROB_CARD_TEST
+    amount = np.where(hit, np.rint(rng.uniform(100, 1500, n)), amount)
+    labels[hit] |= bit["card_testing"]
+    # 스파이크 이벤트는 상점을 하나로 덮어씀 (main 과 동일)
+    in_spike = spike[ev]
+    merchants[in_spike] = np.array(MERCHANTS, dtype=object)[spike_merchant[ev[in_spike]]]
+    labels[in_spike & (labels & bit["unknown_merchant"] > 0)] &= ~bit["unknown_merchant"]
+    cols = {"sec": sec, "ms": ts // 1_000_000 % 1000, "fail": fail, "latency": latency,
+            "merchant": merchants, "region": regions, "amount": amount}
+    return cols, labels
+
+def _sample_chunk(rng, event_ns):
+    """Lines (+ label bitmask per line) for events starting at event_ns (epoch ns, sorted)."""
+    cols, labels = _sample_columns(rng, event_ns)
+    t = _tables()
+    sec, latency, amount = cols["sec"], cols["latency"], cols["amount"]
+    # 문자열 조립: 날짜/시각/latency 는 표에서 조회
+    day = sec // 86400
+    day0 = int(day.min())
+    days = np.datetime_as_string(np.arange(day0, int(day.max()) + 1).astype("datetime64[D]")).astype(object)
+    tenths = np.rint(latency * 10).astype(np.int64)
+    lat_str = t["latency"][np.minimum(tenths, len(t["latency"]) - 1)]
+    big = tenths >= len(t["latency"])
+    lat_str[big] = [f"{v // 10}.{v % 10}" for v in tenths[big].tolist()]
+    status = np.where(cols["fail"], "FAIL", "SUCCESS").astype(object)
+    lines = [f"[{d} {h}] status={s} latency={l}ms merchant={m} region={r} amount={a}\n"
+             for d, h, s, l, m, r, a in zip(days[day - day0].tolist(), t["tod"][sec % 86400].tolist(),
+                                            status.tolist(), lat_str.tolist(), cols["merchant"].tolist(),
+                                            cols["region"].tolist(), amount.astype(np.int64).tolist())]
+    return lines, labels
+
+def _write_binary_chunk(writer, rng, event_ns):
+    """Same sampling as _sample_chunk, written as binary records (tx_binary.py)."""
+    cols, labels = _sample_columns(rng, event_ns)
+    ts_ns = (cols["sec"] * 1000 + cols["ms"]) * 1_000_000
+    # 텍스트와 같은 값: latency 0.1ms 단위, 금액 정수
+    writer.write_columns(ts_ns, ~cols["fail"], np.rint(cols["latency"] * 10) / 10, cols["merchant"],
+                         cols["region"], cols["amount"])
+    return len(ts_ns), labels
+
+def _binary_vocabulary():
+    # 모든 샤드가 같은 사전 id를 쓰도록 이름을 고정 순서로 미리 등록
+    t = _tables()
+    return {"merchant": MERCHANTS + t["odd_merchant"].tolist(), "region": REGIONS + t["odd_region"].tolist()}
+
+def backfill(path, start, end, rate_per_sec=2.0, seed=0, labels_path=None, chunk_events=BACKFILL_CHUNK_EVENTS,
+             fmt="text", send=None):
+    """Write every transaction of the simulated span [start, end) to path; returns the line count.
+
+    Events arrive as a Poisson process of rate_per_sec (like main()). With
+    labels_path, each line with an injected scenario is written there as
+    "line<TAB>labels" (0-based line number, comma separated LABEL_NAMES;
+    the 4% baseline FAIL of normal traffic is not labelled). fmt="binary"
+    writes the same transactions as tx_binary records (line = record index);
+    send = ingest server address streams the text lines there instead of path.
+    """
+    rng = np.random.default_rng(seed)
+    t_ns = int(np.datetime64(start, "ns").astype(np.int64))
+    end_ns = int(np.datetime64(end, "ns").astype(np.int64))
+    mean_gap_ns = 1e9 / rate_per_sec
+    written = 0
+    labels_f = open(labels_path, "w", encoding="utf-8", buffering=1 << 20) if labels_path else None
+    if send:
+        from ingest import IngestClient
+        out = IngestClient(send)
+    elif fmt == "binary":
+        from tx_binary import BinaryLogWriter, DICT_SUFFIX
+        for p in (path, path + DICT_SUFFIX):
+            if os.path.exists(p):
+                os.remove(p)
+        out = BinaryLogWriter(path, _binary_vocabulary())
+    else:
+        out = open(path, "w", encoding="utf-8", buffering=1 << 20)
+    try:
+        with out as f:
+            if labels_f:
+                labels_f.write("line\tlabels\n")
+            while t_ns < end_ns:
+                event_ns = t_ns + np.cumsum(rng.exponential(mean_gap_ns, chunk_events)).astype(np.int64)
+                t_ns = int(event_ns[-1])
+                event_ns = event_ns[event_ns < end_ns]
+                if not len(event_ns):
+                    break
+                if fmt == "binary":
+                    count, labels = _write_binary_chunk(f, rng, event_ns)
+                else:
+                    lines, labels = _sample_chunk(rng, event_ns)
+                    f.write("".join(lines))
+                    count = len(lines)
+                if labels_f:
+                    idx = np.flatnonzero(labels)
+                    names = _tables()["label"][labels[idx]]
+                    labels_f.write("".join(f"{i}\t{n}\n" for i, n in zip((idx + written).tolist(), names.tolist())))
+                written += count
+    finally:
+        if labels_f:
+            labels_f.close()
+    return written
+
+def _backfill_shard(args):
+    return backfill(*args)
+
+def backfill_parallel(path, start, end, rate_per_sec=2.0, seed=0, labels_path=None, shards=1, fmt="text"):
+    """Split [start, end) into `shards` consecutive spans generated by separate processes.
+
+    Shard i is seeded with (seed, i), so the output is reproducible for the
+    same seed and shard count. The parts are concatenated into path (and
+    labels_path, with line numbers shifted) in time order.
+    """
+    if shards <= 1:
+        return backfill(path, start, end, rate_per_sec, seed, labels_path, fmt=fmt)
+    start64, end64 = np.datetime64(start, "ns"), np.datetime64(end, "ns")
+    bounds = [start64 + (end64 - start64) * i // shards for i in range(shards + 1)]
+    seeds = np.random.SeedSequence(seed).spawn(shards)
+    jobs = [(f"{path}.part{i}", str(bounds[i]), str(bounds[i + 1]), rate_per_sec,
+             np.random.default_rng(seeds[i]).integers(1 << 62),
+             f"{labels_path}.part{i}" if labels_path else None, BACKFILL_CHUNK_EVENTS, fmt) for i in range(shards)]
+    with ProcessPoolExecutor(max_workers=shards) as pool:
+        counts = list(pool.map(_backfill_shard, jobs))
+
+    skip = 0
+    if fmt == "binary":
+        # 사전은 모든 샤드가 같음 (_binary_vocabulary): 첫 샤드 것을 쓰고, 이후 샤드는 헤더를 건너뜀
+        from tx_binary import HEADER, DICT_SUFFIX
+        os.replace(jobs[0][0] + DICT_SUFFIX, path + DICT_SUFFIX)
+        for job in jobs[1:]:
+            os.remove(job[0] + DICT_SUFFIX)
+    with open(path, "wb") as out:
+        for job in jobs:
+            with open(job[0], "rb") as part:
+                part.seek(skip)
+                shutil.copyfileobj(part, out, 16 << 20)
+            os.remove(job[0])
+            if fmt == "binary":
+                skip = HEADER.size
+    if labels_path:
+        offset = 0
+        with open(labels_path, "w", encoding="utf-8", buffering=1 << 20) as out:
+            out.write("line\tlabels\n")
+            for job, count in zip(jobs, counts):
+                with open(job[5], "r", encoding="utf-8") as part:
+                    next(part)
+                    for row in part:
+                        i, names = row.split("\t", 1)
+                        out.write(f"{int(i) + offset}\t{names}")
+                os.remove(job[5])
+                offset += count
+    return sum(counts)
+
 if __name__ == "__main__":
-    main(rate_per_sec=2.0)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rate", type=float, default=2.0, help="초당 거래 이벤트 수")
+    ap.add_argument("--backfill", action="store_true", help="실시간 대신 [--start, --end) 구간 전체를 즉시 생성")
+    ap.add_argument("--start", default="2025-01-01T00:00:00")
+    ap.add_argument("--end", default="2025-01-02T00:00:00")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help=f"출력 파일 (기본: text {FNAME}, binary {BIN_FNAME}, --backfill 은 필수)")
+    ap.add_argument("--force", action="store_true", help="--backfill 시 기존 --out / --labels 파일 덮어쓰기 허용")
+    ap.add_argument("--format", choices=["text", "binary"], default="text", help="로그 형식 (binary: tx_binary.py)")
+    ap.add_argument("--labels", default=None, help="주입된 이상 시나리오 정답 라벨 파일 (TSV)")
+    ap.add_argument("--shards", type=int, default=1, help="병렬 생성 프로세스 수")
+    ap.add_argument("--send", default=None, metavar="ADDRESS",
+                    help="파일 대신 ai_monitor 수집 서버로 전송 (tcp://host:port 또는 unix:///path, config.INGEST_ADDRESS)")
+    args = ap.parse_args()
+    if args.send and (args.format != "text" or args.shards > 1):
+        ap.error("--send 는 텍스트 형식, 단일 샤드만 지원 (시간 순서 유지)")
+    if args.backfill and not args.send:
+        # 백필은 출력 파일을 새로 씀: 실시간 로그를 실수로 지우지 않도록 경로 명시, 기존 파일은 --force 필요
+        if not args.out:
+            ap.error("--backfill 은 --out 출력 파일 지정 필요 (실시간 로그 덮어쓰기 방지)")
+        existing = [p for p in (args.out, args.labels) if p and os.path.exists(p)]
+        if existing and not args.force:
+            ap.error(f"{', '.join(existing)} 이미 존재 (덮어쓰려면 --force)")
+    args.out = args.out or (BIN_FNAME if args.format == "binary" else FNAME)
+    if args.backfill:
+        t0 = time.perf_counter()
+        if args.send:
+            n = backfill(args.out, args.start, args.end, args.rate, args.seed, args.labels, send=args.send)
+        else:
+            n = backfill_parallel(args.out, args.start, args.end, args.rate, args.seed, args.labels, args.shards,
+                                  args.format)
+        dt = time.perf_counter() - t0
+        print(f"{n} lines -> {args.send or args.out} in {dt:.1f}s ({n / dt:,.0f} lines/sec)")
+    else:
+        main(rate_per_sec=args.rate, fmt=args.format, path=args.out, send=args.send)
@@ -0,0 +1,357 @@
+# ingest.py
+# socket ingest (asyncio, TCP or Unix domain socket) feeding the detection pipeline as an
+# alternative to tailing LOG_FILE, and a blocking producer client (generate_transactions --send)
+#
+# protocol, both forms may be mixed on one connection:
+#   BATCH <id> <nbytes>\n<nbytes of log lines>  -> "ACK <id> <rows> <malformed>\n" once the
+#                                                  batch's anomalies are written
+#   <log line>\n                                -> bare lines, not acknowledged
+# an invalid frame is answered with "ERR <id> <reason>\n" and the connection is closed; a batch
+# whose detection raised gets "ERR <id> detection failed\n" (the connection stays open; the
+# other batches detected together with it are retried on their own)
+import asyncio, os, socket, time, traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from config import INGEST_MAX_PENDING, INGEST_MAX_BATCH_BYTES, INGEST_WINDOW, TAIL_POLL_SEC
+from tx_parser import parse_block
+
+READ_BYTES = 1 << 16
+MAX_HEADER_BYTES = 256
+
+def parse_address(address):
+    """("unix", path) or ("tcp", (host, port)) for "unix:///path", "tcp://host:port" or "host:port"."""
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://"):]
+    if address.startswith("tcp://"):
+        address = address[len("tcp://"):]
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError(f"invalid ingest address {address!r} (use tcp://host:port or unix:///path)")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+class IngestServer:
+    """Accepts transaction lines over a socket and runs them through a Monitor.
+
+    Connections only split frames; parsing and detection run on a single
+    worker thread (the Monitor is not thread-safe) in arrival order.
+    Received batches wait in a queue of at most max_pending: while it is
+    full, connections stop reading, the socket buffers fill and producers
+    block in send (backpressure instead of unbounded memory). Batches that
+    queued up while detection was busy are detected together as one
+    DataFrame (if that raises, each is detected again on its own and only
+    the failing ones get ERR). A batch is acknowledged after its anomaly records were
+    written (with a ShardedMonitor, once it is no longer pending), so a
+    producer that resends unacknowledged batches loses nothing on a crash.
+    """
+
+    def __init__(self, monitor, address, max_pending=INGEST_MAX_PENDING, max_batch_bytes=INGEST_MAX_BATCH_BYTES):
+        self.monitor = monitor
+        self.metrics = monitor.metrics
+        self.kind, self.target = parse_address(address)
+        self.max_pending = max_pending
+        self.max_batch_bytes = max_batch_bytes
+        self.connections = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-detect")
+        self._waiting = deque()   # acks per batch handed to the monitor, oldest first
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self._executor.shutdown(wait=True)
+
+    async def serve(self):
+        self._queue = asyncio.Queue(self.max_pending)
+        if self.kind == "unix":
+            if os.path.exists(self.target):
+                os.remove(self.target)   # stale socket of a previous run
+            server = await asyncio.start_unix_server(self._handle, self.target)
+            where = self.target
+        else:
+            server = await asyncio.start_server(self._handle, *self.target)
+            where = "%s:%d" % server.sockets[0].getsockname()[:2]
+        print("Starting AI monitor - ingest server listening on", where)
+        detect = asyncio.create_task(self._detect_loop())
+        try:
+            async with server:
+                serving = asyncio.create_task(server.serve_forever())
+                await asyncio.wait((serving, detect), return_when=asyncio.FIRST_COMPLETED)
+                if detect.done():
+                    # detection died: nothing would be acknowledged any more, so stop accepting
+                    serving.cancel()
+                    await self._fail_all(detect)
+                    raise RuntimeError("ingest detection stopped") from None
+                serving.result()
+        finally:
+            detect.cancel()
+            if self.kind == "unix" and os.path.exists(self.target):
+                os.remove(self.target)
+
+    # ---- connections ----
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self.metrics.set("ingest_connections", self.connections)
+        buf = bytearray()
+        try:
+            while True:
+                chunk = await reader.read(READ_BYTES)
+                if not chunk:
+                    # a last bare line may lack its newline; an unfinished BATCH frame is dropped
+                    if buf.strip() and not buf.startswith(b"BATCH "):
+                        await self._submit(bytes(buf) + b"\n", None, None)
+                    break
+                buf += chunk
+                if not await self._frames(buf, writer):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            self.metrics.set("ingest_connections", self.connections)
+            writer.close()
+
+    async def _frames(self, buf, writer):
+        """Submit the complete frames at the start of buf (consumed); False on a protocol error."""
+        while buf:
+            if buf.startswith(b"BATCH "):
+                nl = buf.find(b"\n")
+                if nl < 0:
+                    return len(buf) <= MAX_HEADER_BYTES or self._reject(writer, "-", "header too long")
+                parts = buf[:nl].split()
+                if len(parts) != 3 or not parts[2].isdigit():
+                    return self._reject(writer, "-", "malformed header")
+                batch_id, nbytes = parts[1].decode("ascii", errors="replace"), int(parts[2])
+                if nbytes > self.max_batch_bytes:
+                    return self._reject(writer, batch_id, f"batch larger than {self.max_batch_bytes} bytes")
+                end = nl + 1 + nbytes
+                if len(buf) < end:
+                    return True
+                data = bytes(buf[nl + 1:end])
+                del buf[:end]
+                await self._submit(data, writer, batch_id)
+            else:
+                # bare lines up to the next BATCH frame (or the last complete line)
+                nxt = buf.find(b"\nBATCH ")
+                cut = nxt + 1 if nxt >= 0 else buf.rfind(b"\n") + 1
+                if not cut:
+                    return len(buf) <= self.max_batch_bytes or self._reject(writer, "-", "line too long")
+                data = bytes(buf[:cut])
+                del buf[:cut]
+                await self._submit(data, None, None)
+        return True
+
+    @staticmethod
+    def _reject(writer, batch_id, reason):
+        if not writer.is_closing():
+            writer.write(f"ERR {batch_id} {reason}\n".encode("utf-8"))
+        return False
+
+    async def _fail_all(self, detect):
+        """Detection loop ended: log why, answer every unacknowledged batch with ERR and close."""
+        if not detect.cancelled() and detect.exception() is not None:
+            traceback.print_exception(detect.exception())
+        print("Ingest detection stopped - shutting down the ingest server")
+        failed = []
+        while self._waiting:
+            failed += [(writer, batch_id) for writer, batch_id, _ in self._waiting.popleft()]
+        while not self._queue.empty():
+            _, writer, batch_id = self._queue.get_nowait()
+            if writer is not None:
+                failed.append((writer, batch_id))
+        for writer, batch_id in failed:
+            self._reject(writer, batch_id, "detection stopped")
+        for writer in {writer for writer, _ in failed}:
+            writer.close()   # flushes the ERR replies
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _submit(self, data, writer, batch_id):
+        item = (data, writer, batch_id)
+        if self._queue.full():
+            # detection lags: stop reading this connection until there is room
+            t0 = time.perf_counter()
+            await self._queue.put(item)
+            self.metrics.inc("ingest_wait_seconds_total", time.perf_counter() - t0)
+        else:
+            self._queue.put_nowait(item)
+        self.metrics.set("ingest_queue_batches", self._queue.qsize())
+
+    # ---- detection (worker thread) ----
+    async def _detect_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                group = [await asyncio.wait_for(self._queue.get(), TAIL_POLL_SEC)]
+            except asyncio.TimeoutError:
+                self._ack(await loop.run_in_executor(self._executor, self._idle))
+                continue
+            size = len(group[0][0])
+            while size < self.max_batch_bytes and not self._queue.empty():
+                group.append(self._queue.get_nowait())
+                size += len(group[-1][0])
+            self.metrics.set("ingest_queue_batches", self._queue.qsize())
+            try:
+                counts, pending = await loop.run_in_executor(self._executor, self._process, [g[0] for g in group])
+            except Exception:
+                # a bad batch must not stop ingestion: it gets ERR, later batches go on
+                traceback.print_exc()
+                if len(group) == 1:
+                    self._fail(group[0])
+                    continue
+                pending = await self._detect_each(loop, group)
+                if pending is None:
+                    continue
+            else:
+                self._waiting.append([(w, i, c) for (_, w, i), c in zip(group, counts) if w is not None])
+            if pending and self._queue.empty():
+                pending = await loop.run_in_executor(self._executor, self._idle)
+            self._ack(pending)
+
+    async def _detect_each(self, loop, group):
+        """A merged group failed: detect its batches one by one, so only the failing ones get ERR.
+
+        Returns the monitor's pending count, None when every batch failed.
+        """
+        pending = None
+        for item in group:
+            try:
+                (counts,), pending = await loop.run_in_executor(self._executor, self._process, [item[0]])
+            except Exception:
+                traceback.print_exc()
+                self._fail(item)
+                continue
+            _, writer, batch_id = item
+            self._waiting.append([(writer, batch_id, counts)] if writer is not None else [])
+        return pending
+
+    def _fail(self, item):
+        _, writer, batch_id = item
+        self.metrics.inc("ingest_failed_batches_total")
+        if writer is not None:
+            self._reject(writer, batch_id, "detection failed")
+
+    def _process(self, blocks):
+        """Parse and detect one group of batches; returns ((rows, malformed) per batch, pending)."""
+        monitor, metrics = self.monitor, self.metrics
+        monitor.poll_model()
+        frames, counts = [], []
+        with metrics.timer("parse"):
+            for data in blocks:
+                df, malformed = parse_block(data.decode("utf-8", errors="replace"))
+                frames.append(df)
+                counts.append((len(df), malformed))
+            new_df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        monitor.process_batch(new_df)
+        # counted once detection went through: the batches of a failed group are detected again
+        rows, malformed = sum(c[0] for c in counts), sum(c[1] for c in counts)
+        metrics.inc("lines_ingested_total", rows + malformed)
+        metrics.inc("parse_failures_total", malformed)
+        metrics.inc("batches_total")
+        metrics.maybe_flush()
+        return counts, monitor.pending
+
+    def _idle(self):
+        """No new batches: swap in a finished model and finish pending batches."""
+        self.monitor.poll_model()
+        self.metrics.maybe_flush()
+        if self.monitor.pending:
+            self.monitor.flush()
+        return self.monitor.pending
+
+    def _ack(self, pending):
+        # same rule as the tailer commit in monitor_log: everything older than the pending batches is written
+        while len(self._waiting) > pending:
+            for writer, batch_id, (rows, malformed) in self._waiting.popleft():
+                if not writer.is_closing():
+                    writer.write(f"ACK {batch_id} {rows} {malformed}\n".encode("utf-8"))
+
+class IngestClient:
+    """Blocking producer connection to an IngestServer.
+
+    File-like, so it can replace the log file of a producer: write()
+    buffers lines, flush() sends them as BATCH frames (split at line
+    boundaries to max_batch_bytes). At most `window` batches are left
+    unacknowledged; the next send first waits for acks, so a lagging
+    monitor slows producers down. close() waits for every ack.
+    """
+
+    def __init__(self, address, window=INGEST_WINDOW, max_batch_bytes=INGEST_MAX_BATCH_BYTES, timeout=None):
+        kind, target = parse_address(address)
+        if kind == "unix":
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(target)
+        else:
+            self.sock = socket.create_connection(target, timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._acks = self.sock.makefile("rb")
+        self.window = window
+        self.max_batch_bytes = max_batch_bytes
+        self._buf = []
+        self._size = 0
+        self._next_id = 0
+        self.in_flight = 0
+        self.acked_rows = 0
+        self.malformed = 0
+
+    def write(self, text):
+        self._buf.append(text)
+        self._size += len(text)
+        if self._size >= self.max_batch_bytes:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if not self._buf:
+            return
+        data = "".join(self._buf).encode("utf-8")
+        self._buf, self._size = [], 0
+        start = 0
+        while start < len(data):
+            end = len(data)
+            if end - start > self.max_batch_bytes:
+                end = data.rfind(b"\n", start, start + self.max_batch_bytes) + 1
+                if end <= start:
+                    raise ValueError(f"log line longer than {self.max_batch_bytes} bytes")
+            self.send_batch(memoryview(data)[start:end])
+            start = end
+
+    def send_batch(self, data):
+        """Send complete log lines as one acknowledged batch; returns its id."""
+        while self.in_flight >= self.window:
+            self._read_ack()
+        self._next_id += 1
+        self.sock.sendall(b"BATCH %d %d\n" % (self._next_id, len(data)))
+        self.sock.sendall(data)
+        self.in_flight += 1
+        return self._next_id
+
+    def _read_ack(self):
+        line = self._acks.readline()
+        if not line:
+            raise ConnectionError("ingest server closed the connection")
+        kind, batch_id, *rest = line.decode("utf-8").split(" ", 2)
+        if kind != "ACK":
+            raise ConnectionError(f"ingest server rejected batch {batch_id}: {' '.join(rest).strip()}")
+        rows, malformed = rest[0].split()
+        self.in_flight -= 1
+        self.acked_rows += int(rows)
+        self.malformed += int(malformed)
+
+    def close(self):
+        try:
+            self.flush()
+            while self.in_flight:
+                self._read_ack()
+        finally:
+            self._acks.close()
+            self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
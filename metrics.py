@@ -0,0 +1,214 @@
+# metrics.py
+# in-process pipeline metrics (stage timings, counters, gauges) exported in Prometheus text format
+import os, re, threading, time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import METRICS_FILE, METRICS_FLUSH_SEC
+
+PREFIX = "txmon_"
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+RETRAIN_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "stage_seconds": ("histogram", "Time spent per pipeline stage and batch.", STAGE_BUCKETS),
+    "lines_ingested_total": ("counter", "Log lines read from the tail (parsed or not).", None),
+    "parse_failures_total": ("counter", "Non-blank lines that did not match the transaction format.", None),
+    "batches_total": ("counter", "Batches handed to the detector.", None),
+    "anomaly_records_total": ("counter", "Anomaly records written.", None),
+    "anomalies_total": ("counter", "Anomaly records by type (a record counts once per type).", None),
+    "retrain_seconds": ("histogram", "Duration of finished (re)training jobs.", RETRAIN_BUCKETS),
+    "model_version": ("gauge", "Version of the model used for detection.", None),
+    "model_threshold": ("gauge", "Current global detector score threshold (streaming quantile).", None),
+    "lag_bytes": ("gauge", "Bytes between the committed/read position and the end of the log.", None),
+    "pending_batches": ("gauge", "Batches submitted to detection workers and not yet written.", None),
+    "ingest_connections": ("gauge", "Open producer connections of the socket ingest server.", None),
+    "ingest_queue_batches": ("gauge", "Received batches waiting for detection (ingest server).", None),
+    "ingest_wait_seconds_total": ("counter", "Time producer connections stopped reading because the queue was full.", None),
+    "ingest_failed_batches_total": ("counter", "Received batches answered with ERR because detection raised.", None),
+    "alerts_total": ("counter", "Alert dispatcher outcomes (submitted, dropped, sent, failed, digests).", None),
+    "last_batch_timestamp_seconds": ("gauge", "Unix time of the last processed batch.", None),
+    "up_since_seconds": ("gauge", "Unix time the monitor started.", None),
+}
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+def _fmt_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in items) + "}"
+
+def _fmt_value(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, le in enumerate(self.buckets):
+            if value <= le:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """Thread-safe registry of the metrics declared in METRICS.
+
+    inc()/set()/observe() take keyword labels; timer(stage) observes the
+    duration of a block in stage_seconds. render() returns the Prometheus
+    text exposition; serve() and maybe_flush() publish it over HTTP and as
+    a textfile (node_exporter textfile collector, dashboard health panel).
+    """
+
+    def __init__(self, textfile=METRICS_FILE, flush_sec=METRICS_FLUSH_SEC):
+        self.textfile = textfile
+        self.flush_sec = flush_sec
+        self._values = {name: {} for name in METRICS}
+        self._lock = threading.Lock()
+        self._next_flush = 0.0
+        self._server = None
+        self._collectors = []
+        self.set("up_since_seconds", time.time())
+
+    def add_collector(self, fn):
+        """fn() is called before every render() to refresh gauges (e.g. lag, queue sizes)."""
+        self._collectors.append(fn)
+
+    def inc(self, name, value=1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[name][_labels(labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._values[name]
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(METRICS[name][2])
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - t0, stage=stage)
+
+    def render(self):
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception as e:
+                print("Metrics collector failed:", e)
+        out = []
+        with self._lock:
+            for name, (kind, help_text, _) in METRICS.items():
+                series = self._values[name]
+                if not series:
+                    continue
+                full = PREFIX + name
+                out.append(f"# HELP {full} {help_text}")
+                out.append(f"# TYPE {full} {kind}")
+                for key, v in sorted(series.items()):
+                    if kind != "histogram":
+                        out.append(f"{full}{_fmt_labels(key)} {_fmt_value(v)}")
+                        continue
+                    cumulative = 0
+                    for le, c in zip(v.buckets, v.counts):
+                        cumulative += c
+                        out.append(f"{full}_bucket{_fmt_labels(key, [('le', le)])} {cumulative}")
+                    out.append(f"{full}_bucket{_fmt_labels(key, [('le', '+Inf')])} {v.count}")
+                    out.append(f"{full}_sum{_fmt_labels(key)} {_fmt_value(v.sum)}")
+                    out.append(f"{full}_count{_fmt_labels(key)} {v.count}")
+        return "\n".join(out) + "\n"
+
+    def write_textfile(self, path=None):
+        path = path or self.textfile
+        if not path:
+            return
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def maybe_flush(self):
+        """Rewrite the textfile at most every flush_sec."""
+        now = time.monotonic()
+        if now < self._next_flush:
+            return
+        self._next_flush = now + self.flush_sec
+        try:
+            self.write_textfile()
+        except OSError as e:
+            print("Failed to write metrics file:", e)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Expose GET /metrics on a daemon thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+# process-wide registry used by ai_monitor
+REGISTRY = Metrics()
+
+# ---- reading (dashboard) ----
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+def parse_text(text):
+    """Prometheus text exposition -> list of (name, labels dict, value)."""
+    samples = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        m = _SAMPLE.match(line)
+        if not m:
+            continue
+        name, labels, value = m.groups()
+        try:
+            value = float(value)
+        except ValueError:
+            continue
+        samples.append((name, dict(_LABEL.findall(labels or "")), value))
+    return samples
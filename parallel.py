@@ -0,0 +1,177 @@
+# parallel.py
+# merchant-sharded detection worker processes (multi-process mode of ai_monitor.Monitor)
+import zlib, queue, traceback
+import multiprocessing as mp
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from config import DETECT_WORKERS, DETECT_MAX_INFLIGHT
+from features import featurize
+from rules import evaluate_rows, BIT
+from window_rules import WindowRuleEngine
+
+# columns shipped to the workers (raw text stays in the reader process)
+SHARD_COLUMNS = ["timestamp", "status", "latency", "merchant", "region", "amount"]
+
+# what a worker needs from a ModelState; the Keras model itself is not sent,
+# with scorer=None the reader computes rec_err and ships it with the rows.
+# Thresholds are streaming (thresholds.py), so the model flag is set by the reader.
+ScoringState = namedtuple("ScoringState", ["scorer", "scaler", "merchant_map", "region_map", "version"])
+
+def scoring_state(state):
+    return ScoringState(state.scorer, state.scaler, state.merchant_map, state.region_map, state.version)
+
+def shard_of(merchants, n):
+    """Worker index per row: crc32(merchant) % n (stable across processes and restarts)."""
+    codes, uniques = pd.factorize(np.asarray(merchants, dtype=object))
+    lookup = np.fromiter((zlib.crc32(str(m).encode("utf-8")) % n for m in uniques),
+                         dtype=np.int64, count=len(uniques))
+    return lookup[codes]
+
+def _worker(in_q, out_q):
+    """Score rows and run single-row (except the model flag) and per-merchant window rules for one shard."""
+    state = None
+    windows = WindowRuleEngine()   # only the merchant windows are used here; max_keys is per shard
+    try:
+        for msg in iter(in_q.get, None):
+            if msg[0] == "model":
+                state = msg[1]
+                continue
+            _, batch_id, shard, cols, now, rec_err = msg
+            df = pd.DataFrame(cols)
+            computed = None
+            if rec_err is None and state is not None and state.scorer is not None and len(df):
+                X, _, _, _ = featurize(df, state.merchant_map, state.region_map, state.scaler)
+                rec_err = computed = state.scorer.score(X)
+            mask = evaluate_rows(df)
+            ts = df["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+            card_testing, spike = windows.evaluate_merchants(ts, df["merchant"].tolist(),
+                                                             df["amount"].to_numpy(dtype=np.float64), now)
+            mask[card_testing] |= BIT["card_testing"]
+            mask[spike] |= BIT["merchant_spike"]
+            out_q.put((batch_id, shard, mask, computed))
+    except Exception:
+        out_q.put(("error", traceback.format_exc()))
+
+class _Batch:
+    __slots__ = ("tag", "mask", "rec_err", "positions", "left")
+
+    def __init__(self, tag, n, rec_err):
+        self.tag = tag
+        self.mask = np.zeros(n, dtype=np.uint16)
+        self.rec_err = rec_err
+        self.positions = {}
+        self.left = 0
+
+class ShardPool:
+    """N detection worker processes fed with merchant shards of each batch.
+
+    submit() splits a parsed batch by shard_of(merchant) and queues each
+    part to its worker; since one merchant always goes to the same worker,
+    card_testing / merchant_spike state stays shard-local and sees the
+    merchant's rows in log order. results() merges the partial masks and
+    returns finished batches in submission order, so the caller can apply
+    the global rules (burst, composite) and write one ordered sink.
+
+    Workers are forked when the pool is created; create it before any
+    model training starts. Models are broadcast with set_model(); queues
+    are FIFO per worker, so every batch submitted afterwards uses it.
+    """
+
+    def __init__(self, workers=DETECT_WORKERS, max_inflight=DETECT_MAX_INFLIGHT):
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        ctx = mp.get_context("fork")
+        self.workers = workers
+        self.max_inflight = max_inflight
+        self._in = [ctx.Queue() for _ in range(workers)]
+        self._out = ctx.Queue()
+        self._procs = [ctx.Process(target=_worker, args=(q, self._out), name=f"detect-{i}", daemon=True)
+                       for i, q in enumerate(self._in)]
+        for p in self._procs:
+            p.start()
+        self._pending = {}
+        self._next_id = 0
+        self._next_out = 0
+
+    def __len__(self):
+        """Batches submitted but not yet returned by results()."""
+        return len(self._pending)
+
+    def set_model(self, state):
+        """Broadcast a ScoringState (see scoring_state()) to every worker."""
+        for q in self._in:
+            q.put(("model", state))
+
+    def submit(self, df, rec_err=None, tag=None):
+        """Queue a parsed batch; tag is returned with its result (e.g. the batch itself)."""
+        batch_id = self._next_id
+        self._next_id += 1
+        batch = self._pending[batch_id] = _Batch(tag, len(df), rec_err)
+        if not len(df):
+            return batch_id
+        shard = shard_of(df["merchant"], self.workers)
+        columns = {c: df[c].to_numpy() for c in SHARD_COLUMNS}
+        now = int(columns["timestamp"].astype("datetime64[ns]").astype(np.int64).max())
+        # every worker gets a (possibly empty) part so all shards sweep idle
+        # merchants at the same batch boundaries as a single engine would
+        for s in range(self.workers):
+            pos = np.flatnonzero(shard == s)
+            part = {c: v[pos] for c, v in columns.items()}
+            self._in[s].put(("batch", batch_id, s, part, now, None if rec_err is None else rec_err[pos]))
+            batch.positions[s] = pos
+            batch.left += 1
+        return batch_id
+
+    def _receive(self, msg):
+        if msg[0] == "error":
+            raise RuntimeError("detection worker failed:\n" + msg[1])
+        batch_id, shard, mask, rec_err = msg
+        batch = self._pending[batch_id]
+        pos = batch.positions[shard]
+        batch.mask[pos] = mask
+        if rec_err is not None:
+            if batch.rec_err is None:
+                batch.rec_err = np.full(len(batch.mask), np.nan)
+            batch.rec_err[pos] = rec_err
+        batch.left -= 1
+
+    def _get(self, block):
+        if not block:
+            return self._out.get_nowait()
+        while True:
+            try:
+                return self._out.get(timeout=1.0)
+            except queue.Empty:
+                dead = [p.name for p in self._procs if not p.is_alive()]
+                if dead:
+                    raise RuntimeError(f"detection worker exited: {', '.join(dead)}")
+
+    def results(self, wait=False):
+        """Finished batches in submission order as (tag, mask, rec_err).
+
+        Blocks while more than max_inflight batches are pending, or until
+        everything is done with wait=True.
+        """
+        done = []
+        while True:
+            while self._next_out in self._pending and self._pending[self._next_out].left == 0:
+                batch = self._pending.pop(self._next_out)
+                done.append((batch.tag, batch.mask, batch.rec_err))
+                self._next_out += 1
+            if not self._pending:
+                break
+            block = wait or len(self._pending) > self.max_inflight
+            try:
+                self._receive(self._get(block))
+            except queue.Empty:
+                break
+        return done
+
+    def close(self, timeout=5.0):
+        for q in self._in:
+            q.put(None)
+        for p in self._procs:
+            p.join(timeout)
+            if p.is_alive():
+                p.terminate()
@@ -0,0 +1,70 @@
+# retrainer.py
+# background model training with atomic hand-over to the detection loop
+import threading, time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# everything detection needs from one training run; swapped as a single reference
+# scorer is the optional fast inference path exported from model (see fast_infer.py)
+# seed = (rows, scores) of the training tail, to start the streaming thresholds of a fresh tracker
+ModelState = namedtuple("ModelState", ["model", "scaler", "merchant_map", "region_map",
+                                       "threshold", "n_samples", "version", "train_sec", "scorer", "seed"],
+                        defaults=[None, None])
+
+class BackgroundTrainer:
+    """Runs one training job at a time off the detection thread.
+
+    submit() hands a buffer snapshot to `train_fn(frame, prev, **kwargs)`,
+    which must return a ModelState. The detection loop keeps using its
+    current state and calls poll() once per cycle; poll() returns the new
+    state exactly once when the job has finished, so the caller swaps
+    model, scaler, maps and threshold together. With background=False the
+    job runs inline inside submit() (the previous synchronous behaviour).
+    """
+
+    def __init__(self, train_fn, background=True):
+        self.train_fn = train_fn
+        self.background = background
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrain") if background else None
+        self._future = None
+        self._result = None
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self):
+        return self._future is not None and not self._future.done()
+
+    def _train(self, frame, prev, kwargs):
+        t0 = time.perf_counter()
+        state = self.train_fn(frame, prev, **kwargs)
+        return state._replace(train_sec=time.perf_counter() - t0)
+
+    def submit(self, frame, prev=None, **kwargs):
+        """Start training on `frame`; returns False if a job is still running."""
+        with self._lock:
+            if self.busy or self._result is not None:
+                return False
+            if self._executor is None:
+                self._result = self._train(frame, prev, kwargs)
+            else:
+                self._future = self._executor.submit(self._train, frame, prev, kwargs)
+            return True
+
+    def poll(self):
+        """Return the newly trained ModelState once, or None."""
+        with self._lock:
+            if self._result is not None:
+                state, self._result = self._result, None
+                return state
+            if self._future is None or not self._future.done():
+                return None
+            future, self._future = self._future, None
+        try:
+            return future.result()
+        except Exception as e:
+            print("Model training failed:", e)
+            return None
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
@@ -0,0 +1,266 @@
+# rollups.py
+# streaming per-minute / per-hour transaction rollups with a mergeable latency sketch
+import json, math, os, sqlite3, struct, threading, time
+import numpy as np
+import pandas as pd
+from config import ROLLUP_GRANULARITIES, ROLLUP_FLUSH_SEC, ROLLUP_MAX_KEYS, ROLLUP_SKETCH_ALPHA
+
+MIN_VALUE = 1e-9
+OTHER_KEY = "(other)"
+
+class QuantileSketch:
+    """Log-bucketed histogram (DDSketch style).
+
+    Quantiles are within `alpha` relative error; two sketches merge by
+    adding their bucket counts, so minute sketches roll up into hours.
+    """
+
+    def __init__(self, alpha=ROLLUP_SKETCH_ALPHA):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}      # bucket key -> count
+        self.zero = 0       # values <= MIN_VALUE
+        self.count = 0
+
+    def add_many(self, values):
+        v = np.asarray(values, dtype=np.float64)
+        if not len(v):
+            return
+        small = v <= MIN_VALUE
+        self.zero += int(small.sum())
+        keys, counts = np.unique(np.ceil(np.log(v[~small]) / self._log_gamma).astype(np.int64), return_counts=True)
+        bins = self.bins
+        for k, c in zip(keys.tolist(), counts.tolist()):
+            bins[k] = bins.get(k, 0) + c
+        self.count += len(v)
+
+    def merge(self, other):
+        for k, c in other.bins.items():
+            self.bins[k] = self.bins.get(k, 0) + c
+        self.zero += other.zero
+        self.count += other.count
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float("nan")
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.bins):
+            seen += self.bins[k]
+            if seen > rank:
+                return 2 * self.gamma ** k / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_bytes(self):
+        keys = np.fromiter(self.bins.keys(), dtype=np.int32, count=len(self.bins))
+        counts = np.fromiter(self.bins.values(), dtype=np.uint32, count=len(self.bins))
+        return struct.pack("<dQI", self.alpha, self.zero, len(keys)) + keys.tobytes() + counts.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        alpha, zero, n = struct.unpack_from("<dQI", data)
+        off = struct.calcsize("<dQI")
+        keys = np.frombuffer(data, dtype=np.int32, count=n, offset=off)
+        counts = np.frombuffer(data, dtype=np.uint32, count=n, offset=off + 4 * n)
+        sk = cls(alpha)
+        sk.bins = dict(zip(keys.tolist(), counts.tolist()))
+        sk.zero = zero
+        sk.count = zero + int(counts.sum())
+        return sk
+
+class _Bucket:
+    __slots__ = ("count", "failures", "amount_sum", "latency_sum", "sketch", "merchants", "regions", "dirty")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.amount_sum = 0.0
+        self.latency_sum = 0.0
+        self.sketch = QuantileSketch()
+        self.merchants = {}   # merchant -> [count, failures, amount_sum]
+        self.regions = {}     # region -> [count, failures, amount_sum]
+        self.dirty = False
+
+def _add_breakdown(table, keys, failed, amount):
+    codes, uniq = pd.factorize(keys)
+    counts = np.bincount(codes, minlength=len(uniq))
+    fails = np.bincount(codes, weights=failed, minlength=len(uniq))
+    amounts = np.bincount(codes, weights=amount, minlength=len(uniq))
+    for k, c, f, a in zip(uniq.tolist(), counts.tolist(), fails.tolist(), amounts.tolist()):
+        if k not in table and len(table) >= ROLLUP_MAX_KEYS:
+            k = OTHER_KEY   # bounded breakdowns: one-off merchants share a row
+        row = table.setdefault(k, [0, 0, 0.0])
+        row[0] += c; row[1] += int(f); row[2] += a
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tx_rollups (
+    granularity TEXT NOT NULL,      -- minute | hour
+    bucket      TEXT NOT NULL,      -- bucket start 'YYYY-MM-DD HH:MM:SS' (log timestamps)
+    count       INTEGER NOT NULL,
+    failures    INTEGER NOT NULL,
+    amount_sum  REAL NOT NULL,
+    latency_sum REAL NOT NULL,
+    latency_p50 REAL,
+    latency_p95 REAL,
+    latency_p99 REAL,
+    sketch      BLOB,               -- QuantileSketch.to_bytes(), for merging
+    merchants   TEXT,               -- JSON {merchant: [count, failures, amount_sum]}
+    regions     TEXT,               -- JSON {region: [count, failures, amount_sum]}
+    PRIMARY KEY (granularity, bucket)
+);
+"""
+
+GRANULARITY_UNITS = {"minute": "datetime64[m]", "hour": "datetime64[h]"}
+GRANULARITY_WIDTH = {"minute": np.timedelta64(1, "m"), "hour": np.timedelta64(1, "h")}
+
+class RollupStore:
+    """tx_rollups table (by default inside the anomaly SQLite database)."""
+
+    def __init__(self, path, readonly=False):
+        self._lock = threading.Lock()
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(ROLLUP_SCHEMA)
+
+    def load(self, granularity, bucket):
+        """Existing row for a bucket as a _Bucket (late rows extend it), or None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT count, failures, amount_sum, latency_sum, sketch, merchants, regions "
+                "FROM tx_rollups WHERE granularity = ? AND bucket = ?", (granularity, bucket)).fetchone()
+        if row is None:
+            return None
+        b = _Bucket()
+        b.count, b.failures, b.amount_sum, b.latency_sum = row[:4]
+        b.sketch = QuantileSketch.from_bytes(row[4])
+        b.merchants = json.loads(row[5])
+        b.regions = json.loads(row[6])
+        return b
+
+    def save(self, items):
+        """items: iterable of (granularity, bucket, _Bucket)."""
+        rows = [(g, key, b.count, b.failures, b.amount_sum, b.latency_sum,
+                 b.sketch.quantile(0.5), b.sketch.quantile(0.95), b.sketch.quantile(0.99),
+                 b.sketch.to_bytes(), json.dumps(b.merchants, ensure_ascii=False),
+                 json.dumps(b.regions, ensure_ascii=False)) for g, key, b in items]
+        if not rows:
+            return
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO tx_rollups VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+
+    def query(self, granularity="minute", since=None, until=None):
+        """Rollup rows for charts: bucket, count, failure_rate, latency p50/p95/p99, mean latency, amount_sum."""
+        sql = ("SELECT bucket, count, failures, amount_sum, latency_sum, latency_p50, latency_p95, latency_p99 "
+               "FROM tx_rollups WHERE granularity = ?")
+        params = [granularity]
+        if since is not None:
+            sql += " AND bucket >= ?"; params.append(str(since))
+        if until is not None:
+            sql += " AND bucket < ?"; params.append(str(until))
+        with self._lock:
+            df = pd.read_sql_query(sql + " ORDER BY bucket", self.conn, params=params)
+        df["bucket"] = pd.to_datetime(df["bucket"])
+        df["failure_rate"] = df["failures"] / df["count"].where(df["count"] > 0)
+        df["latency_mean"] = df["latency_sum"] / df["count"].where(df["count"] > 0)
+        return df
+
+    def breakdown(self, granularity="hour", since=None, column="merchants"):
+        """Merged per-merchant/region totals over a period: DataFrame(key, count, failures, amount_sum)."""
+        sql = f"SELECT {column} FROM tx_rollups WHERE granularity = ?"
+        params = [granularity]
+        if since is not None:
+            sql += " AND bucket >= ?"; params.append(str(since))
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        total = {}
+        for (js,) in rows:
+            for k, (c, f, a) in json.loads(js).items():
+                t = total.setdefault(k, [0, 0, 0.0])
+                t[0] += c; t[1] += f; t[2] += a
+        return pd.DataFrame([(k, *v) for k, v in total.items()], columns=["key", "count", "failures", "amount_sum"])
+
+    def close(self):
+        self.conn.close()
+
+class RollupAggregator:
+    """Maintains rollups while ai_monitor ingests.
+
+    add_batch() folds a parsed batch into in-memory buckets for each
+    granularity. flush() (called at most every flush_sec from maybe_flush)
+    writes changed buckets and drops buckets that ended more than one
+    bucket width before the newest timestamp seen. Rows arriving later for
+    a dropped bucket reload it from the store first, so counts stay exact.
+    """
+
+    def __init__(self, store, granularities=ROLLUP_GRANULARITIES, flush_sec=ROLLUP_FLUSH_SEC):
+        self.store = store
+        self.granularities = granularities
+        self.flush_sec = flush_sec
+        self._buckets = {g: {} for g in granularities}
+        self._last_flush = time.monotonic()
+        self._watermark = None
+
+    def add_batch(self, df):
+        if df.empty:
+            return
+        ts = df["timestamp"].to_numpy(dtype="datetime64[ns]")
+        latency = df["latency"].to_numpy(dtype=np.float64)
+        amount = df["amount"].to_numpy(dtype=np.float64)
+        failed = (df["status"].to_numpy() == 0)
+        merchants = df["merchant"].to_numpy(dtype=object)
+        regions = df["region"].to_numpy(dtype=object)
+        valid = ~np.isnat(ts)
+        if not valid.all():
+            # rows without a usable timestamp belong to no bucket (and must not move the watermark)
+            ts, latency, amount, failed = ts[valid], latency[valid], amount[valid], failed[valid]
+            merchants, regions = merchants[valid], regions[valid]
+            if not len(ts):
+                return
+        newest = ts.max()
+        self._watermark = newest if self._watermark is None else max(self._watermark, newest)
+        for g in self.granularities:
+            starts = ts.astype(GRANULARITY_UNITS[g])
+            uniq, inverse = np.unique(starts, return_inverse=True)
+            for j, start in enumerate(uniq):
+                sel = inverse == j if len(uniq) > 1 else slice(None)
+                b = self._bucket(g, str(pd.Timestamp(start)))
+                b.count += int(len(latency[sel]))
+                b.failures += int(failed[sel].sum())
+                b.amount_sum += float(amount[sel].sum())
+                b.latency_sum += float(latency[sel].sum())
+                b.sketch.add_many(latency[sel])
+                _add_breakdown(b.merchants, merchants[sel], failed[sel], amount[sel])
+                _add_breakdown(b.regions, regions[sel], failed[sel], amount[sel])
+                b.dirty = True
+
+    def _bucket(self, g, key):
+        buckets = self._buckets[g]
+        b = buckets.get(key)
+        if b is None:
+            b = buckets[key] = self.store.load(g, key) or _Bucket()
+        return b
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_sec:
+            self.flush()
+
+    def flush(self, final=False):
+        self._last_flush = time.monotonic()
+        items = []
+        for g, buckets in self._buckets.items():
+            width = GRANULARITY_WIDTH[g]
+            for key, b in list(buckets.items()):
+                if b.dirty:
+                    items.append((g, key, b))
+                    b.dirty = False
+                # closed: ended at least one bucket width before the newest row
+                if final or (self._watermark is not None and np.datetime64(key) + 2 * width <= self._watermark):
+                    del buckets[key]
+        self.store.save(items)
@@ -0,0 +1,68 @@
+# rules.py
+# column-wise rule evaluation over a parsed batch -> per-row anomaly type bitmask
+from functools import lru_cache
+import numpy as np
+from config import HIGH_LATENCY_MS, HIGH_AMOUNT, OFF_HOURS, COMPOSITE_MIN_TYPES
+
+ANOMALY_TYPES = [
+    "autoencoder", "high_latency", "high_amount", "unknown_merchant", "unknown_region",
+    "failure", "off_hour", "burst", "card_testing", "merchant_spike", "composite",
+]
+BIT = {t: 1 << i for i, t in enumerate(ANOMALY_TYPES)}
+
+# number of set bits for every possible mask (11 types -> 2048 entries)
+_POPCOUNT = np.array([bin(m).count("1") for m in range(1 << len(ANOMALY_TYPES))], dtype=np.uint8)
+
+@lru_cache(maxsize=None)
+def mask_to_types(mask):
+    """Bitmask -> sorted tuple of type names (same order as the anomaly records)."""
+    return tuple(sorted(t for t in ANOMALY_TYPES if mask & BIT[t]))
+
+def hour_of(ts):
+    """Hour of day for a datetime64 array."""
+    return (ts.astype("datetime64[h]").astype(np.int64) % 24)
+
+def evaluate_rows(df, rec_err=None, threshold=None):
+    """Single-row rules (and the autoencoder flag when rec_err/threshold are given).
+
+    Returns a uint16 mask per row without the window and composite flags.
+    """
+    n = len(df)
+    mask = np.zeros(n, dtype=np.uint16)
+    if n == 0:
+        return mask
+    ts = df["timestamp"].to_numpy(dtype="datetime64[ns]")
+    amount = df["amount"].to_numpy(dtype=np.float64)
+
+    if rec_err is not None and threshold is not None:
+        mask[np.asarray(rec_err) > threshold] |= BIT["autoencoder"]
+    mask[df["latency"].to_numpy() > HIGH_LATENCY_MS] |= BIT["high_latency"]
+    mask[amount > HIGH_AMOUNT] |= BIT["high_amount"]
+    mask[df["merchant"].str.startswith("odd_", na=False).to_numpy(dtype=bool)] |= BIT["unknown_merchant"]
+    mask[df["region"].str.startswith("odd_region", na=False).to_numpy(dtype=bool)] |= BIT["unknown_region"]
+    mask[df["status"].to_numpy() == 0] |= BIT["failure"]
+    mask[np.isin(hour_of(ts), OFF_HOURS)] |= BIT["off_hour"]
+    return mask
+
+def add_composite(mask):
+    """Set the composite flag in place on rows with COMPOSITE_MIN_TYPES or more types."""
+    mask[_POPCOUNT[mask] >= COMPOSITE_MIN_TYPES] |= BIT["composite"]
+    return mask
+
+def evaluate_batch(df, rec_err=None, threshold=None, windows=None):
+    """Evaluate every rule for a parsed batch (see tx_parser).
+
+    rec_err/threshold add the autoencoder flag; windows is a WindowRuleEngine
+    that is advanced with the batch rows in order. Returns a uint16 mask per row.
+    """
+    mask = evaluate_rows(df, rec_err, threshold)
+    if len(mask) == 0:
+        return mask
+    if windows is not None:
+        ts = df["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        burst, card_testing, spike = windows.evaluate(ts, df["merchant"].tolist(),
+                                                      df["amount"].to_numpy(dtype=np.float64))
+        mask[burst] |= BIT["burst"]
+        mask[card_testing] |= BIT["card_testing"]
+        mask[spike] |= BIT["merchant_spike"]
+    return add_composite(mask)
@@ -0,0 +1,101 @@
+# tail_reader.py
+# tail-from-end readers for the dashboard: last N lines without reading the whole file,
+# then only newly appended bytes on each refresh
+import os, threading
+import pandas as pd
+
+BLOCK_SIZE = 1 << 16
+
+def tail_bytes(f, n_lines, end):
+    """Bytes of the last n_lines lines before offset `end`, read backwards in blocks.
+
+    The result is an exact suffix of the file, so an unfinished last line
+    (no trailing newline) is included as is.
+    """
+    pos = end
+    blocks = []
+    newlines = 0
+    while pos > 0 and newlines <= n_lines:
+        step = min(BLOCK_SIZE, pos)
+        pos -= step
+        f.seek(pos)
+        block = f.read(step)
+        blocks.append(block)
+        newlines += block.count(b"\n")
+    data = b"".join(reversed(blocks))
+    # ignore the newline terminating the last line, then step back n_lines newlines
+    idx = len(data) - 1 if data.endswith(b"\n") else len(data)
+    for _ in range(n_lines):
+        idx = data.rfind(b"\n", 0, idx)
+        if idx < 0:
+            return data
+    return data[idx + 1:]
+
+def tail_lines(path, n_lines):
+    """Last n_lines lines of a text file as a list of str."""
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        data = tail_bytes(f, n_lines, end)
+    return data.decode("utf-8", errors="replace").splitlines()
+
+class TailCache:
+    """Last `limit` records of an append-only file as a DataFrame, kept up to date.
+
+    `parse(text) -> DataFrame` turns a block of complete lines into rows.
+    The frame is refreshed only when the file identity (inode) or size
+    changed: appended bytes are parsed and concatenated, a rotated or
+    truncated file is re-read from its end. One instance can be shared by
+    every dashboard session (see app.py), so N viewers cost one read.
+    """
+
+    def __init__(self, path, limit, parse):
+        self.path = path
+        self.limit = limit
+        self.parse = parse
+        self._lock = threading.Lock()
+        self._key = None          # (inode, size) the frame reflects
+        self._offset = 0          # end of the last complete line consumed
+        self._frame = None
+
+    def _reload(self, f, st):
+        end = st.st_size
+        data = tail_bytes(f, self.limit, end)
+        # do not include an unfinished last line; it is picked up once complete
+        cut = data.rfind(b"\n") + 1
+        self._offset = end - len(data) + cut
+        self._frame = self._parse(data[:cut])
+
+    def _parse(self, data):
+        if not data:
+            return pd.DataFrame()
+        return self.parse(data.decode("utf-8", errors="replace"))
+
+    def _append(self, f):
+        f.seek(self._offset)
+        data = f.read()
+        cut = data.rfind(b"\n") + 1
+        if not cut:
+            return
+        self._offset += cut
+        new = self._parse(data[:cut])
+        if new.empty:
+            return
+        frame = new if self._frame is None or self._frame.empty else pd.concat([self._frame, new], ignore_index=True)
+        self._frame = frame.iloc[-self.limit:].reset_index(drop=True)
+
+    def get(self):
+        """Current frame (do not modify it in place: it is shared)."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return pd.DataFrame()
+        key = (st.st_ino, st.st_size)
+        with self._lock:
+            if key != self._key:
+                with open(self.path, "rb") as f:
+                    if self._key is None or st.st_ino != self._key[0] or st.st_size < self._offset:
+                        self._reload(f, st)
+                    else:
+                        self._append(f)
+                self._key = key
+            return self._frame if self._frame is not None else pd.DataFrame()
@@ -0,0 +1,214 @@
+# tailer.py
+# event-driven log tailer: inotify wakeups (polling fallback), rotation/truncation
+# handling, partial-line buffering and a persisted committed offset
+import ctypes, ctypes.util, json, os, select, struct, time
+from config import TAIL_CHUNK_BYTES, TAIL_MAX_BATCH_BYTES, TAIL_POLL_SEC
+
+_EVENT_HEADER = struct.Struct("iIII")   # wd, mask, cookie, len
+
+class _Inotify:
+    """Minimal ctypes binding: watch a directory for changes to one file name."""
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, directory, name):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {directory}")
+        self.name = os.fsencode(name)
+
+    def wait(self, timeout):
+        """Block until an event for our file arrives or timeout; True if one did."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if ready and self.drain():
+                return True
+
+    def drain(self):
+        """Consume queued events; True if any concerned our file."""
+        hit = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos + _EVENT_HEADER.size <= len(data):
+                _, _, _, length = _EVENT_HEADER.unpack_from(data, pos)
+                pos += _EVENT_HEADER.size
+                if data[pos:pos + length].rstrip(b"\0") == self.name:
+                    hit = True
+                pos += length
+        return hit
+
+    def close(self):
+        os.close(self.fd)
+
+class LogTailer:
+    """Follows an append-only log file in large binary chunks.
+
+    read() returns the complete lines written since the last call as one
+    text block; a trailing line without newline is held back until it is
+    finished. Rotation (inode change) drains the old file before switching
+    to the new one, truncation restarts at offset 0. commit() persists the
+    offset just past the last line handed out, so a restart resumes exactly
+    there instead of re-reading the whole file.
+    """
+
+    def __init__(self, path, offset_file=None, chunk_size=TAIL_CHUNK_BYTES,
+                 max_batch_bytes=TAIL_MAX_BATCH_BYTES, use_inotify=True):
+        self.path = path
+        self.offset_file = offset_file
+        self.chunk_size = chunk_size
+        self.max_batch_bytes = max_batch_bytes
+        self._fh = None
+        self._inode = None
+        self._partial = b""
+        self._offset = 0          # file offset just past the last complete line read
+        self._committed = None
+        self._restore()
+        self._notify = None
+        if use_inotify:
+            try:
+                self._notify = _Inotify(os.path.dirname(os.path.abspath(path)), os.path.basename(path))
+            except (OSError, AttributeError):
+                self._notify = None   # not Linux / no inotify: plain polling
+
+    # ---- offsets ----
+    def _restore(self):
+        if not self.offset_file or not os.path.exists(self.offset_file):
+            return
+        try:
+            with open(self.offset_file, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            st = os.stat(self.path)
+        except (OSError, ValueError):
+            return
+        if saved.get("inode") == st.st_ino and saved.get("offset", 0) <= st.st_size:
+            self._inode = st.st_ino
+            self._offset = saved["offset"]
+            self._committed = self.position()
+
+    def position(self):
+        """(inode, offset) just past the last line returned by read(); see commit()."""
+        return (self._inode, self._offset)
+
+    def commit(self, position=None):
+        """Persist the offset of everything returned by read() so far.
+
+        position commits an earlier position() instead, when the lines read
+        since then are still being processed.
+        """
+        position = position or self.position()
+        if self._committed == position:
+            return
+        if self.offset_file:
+            inode, offset = position
+            tmp = self.offset_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"path": self.path, "inode": inode, "offset": offset}, f)
+            os.replace(tmp, self.offset_file)
+        self._committed = position
+
+    @property
+    def offset(self):
+        return self._offset
+
+    def lag_bytes(self):
+        """How far the committed read position is behind the end of the file.
+
+        Nothing committed yet, or only lines of a rotated file: the whole
+        current file is behind.
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return 0
+        inode, offset = self._committed or (st.st_ino, 0)
+        return max(0, st.st_size - offset) if inode == st.st_ino else st.st_size
+
+    # ---- reading ----
+    def _open(self, st):
+        if self._fh is not None:
+            self._fh.close()
+        self._fh = open(self.path, "rb")
+        if st.st_ino != self._inode:
+            self._offset = 0
+        self._inode = st.st_ino
+        self._partial = b""
+        self._fh.seek(self._offset)
+
+    def _read_chunks(self, budget):
+        parts = []
+        while budget > 0:
+            data = self._fh.read(min(self.chunk_size, budget))
+            if not data:
+                break
+            parts.append(data)
+            budget -= len(data)
+        return b"".join(parts)
+
+    def read(self):
+        """Return newly completed lines as one str ('' if nothing new)."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return ""
+        if self._notify is not None:
+            self._notify.drain()   # events up to now are covered by this read
+        out = []
+        if self._fh is None:
+            self._open(st)
+        elif st.st_ino != self._inode:
+            # rotated: drain the old file first, over several reads if it is behind by more
+            # than one batch; only at its end may a last line lack a newline
+            data = self._read_chunks(self.max_batch_bytes)
+            if self._fh.tell() < os.fstat(self._fh.fileno()).st_size:
+                return self._consume(data).decode("utf-8", errors="replace")
+            out.append(self._consume(data, final=True))
+            self._open(st)
+        elif st.st_size < self._offset + len(self._partial):
+            # truncated in place (copytruncate): start over
+            self._offset = 0
+            self._open(st)
+        out.append(self._consume(self._read_chunks(self.max_batch_bytes)))
+        return b"".join(out).decode("utf-8", errors="replace")
+
+    def _consume(self, data, final=False):
+        buf = self._partial + data
+        cut = len(buf) if final else buf.rfind(b"\n") + 1
+        self._partial = buf[cut:]
+        self._offset += cut
+        if final and buf and not buf.endswith(b"\n"):
+            return buf + b"\n"
+        return buf[:cut]
+
+    def wait(self, timeout=TAIL_POLL_SEC):
+        """Sleep until the file changes (inotify) or timeout elapses."""
+        if self._notify is not None:
+            self._notify.wait(timeout)
+        else:
+            select.select([], [], [], timeout)
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if self._notify is not None:
+            self._notify.close()
+            self._notify = None
@@ -0,0 +1,5 @@
+# tests/conftest.py
+# the modules live at the repository root (flat layout)
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
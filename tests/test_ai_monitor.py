@@ -0,0 +1,29 @@
+# tests/test_ai_monitor.py
+# Monitor warmup: a failed first training is retried instead of leaving the monitor without a model
+import time
+import ai_monitor
+import generate_transactions as gen
+from config import MIN_WARMUP
+from tx_parser import parse_block
+
+def test_failed_warmup_training_is_retried(tmp_path):
+    calls = []
+    def train(frame, prev=None, **kwargs):
+        calls.append(len(frame))
+        if len(calls) == 1:
+            raise RuntimeError("training failed")
+        return ai_monitor.train_model(frame, prev, detector="mahalanobis", **kwargs)
+
+    monitor = ai_monitor.Monitor(anomaly_file=str(tmp_path / "anomalies.jsonl"), outputs=(), alert=lambda *a, **k: None,
+                                 rollups=False, checkpoint_dir=None, retrain_every=10 ** 9)
+    monitor.trainer.train_fn = train
+    for _ in range(6):
+        monitor.poll_model()
+        df, _ = parse_block("".join(gen.generate_tx_line() + "\n" for _ in range(MIN_WARMUP // 2)))
+        monitor.process_batch(df)
+        deadline = time.monotonic() + 10
+        while monitor.trainer.busy and time.monotonic() < deadline:
+            time.sleep(0.01)
+    monitor.poll_model()
+    assert calls == [MIN_WARMUP, 2 * MIN_WARMUP]
+    assert monitor.state is not None and monitor.state.version == 1
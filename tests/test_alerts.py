@@ -0,0 +1,188 @@
+# tests/test_alerts.py
+# AlertDispatcher against a local Bot API server (TELEGRAM_API_BASE) and an injected sender:
+# retries / backoff, token bucket rate limit, coalescing and the queue overflow policies
+import asyncio, json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import pytest
+from alerts import AlertDispatcher, TokenBucket, telegram_sender
+
+class FakeBotApi:
+    """Minimal Telegram Bot API: getMe, sendMessage; `failures` lists status codes to answer first."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.messages = []   # (monotonic time, text)
+        self.attempts = []   # monotonic time of every sendMessage request
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+                try:
+                    params = json.loads(body) if body else {}
+                except ValueError:
+                    params = {k: v[0] for k, v in parse_qs(body).items()}
+                method = self.path.rsplit("/", 1)[-1]
+                if method == "getMe":
+                    api.reply(self, 200, {"id": 1, "is_bot": True, "first_name": "test", "username": "test_bot"})
+                elif method == "sendMessage":
+                    api.attempts.append(time.monotonic())
+                    status = api.failures.pop(0) if api.failures else 200
+                    if status == 200:
+                        api.messages.append((time.monotonic(), params["text"]))
+                        api.reply(self, 200, {"message_id": len(api.messages), "date": int(time.time()),
+                                              "chat": {"id": int(params["chat_id"]), "type": "private"},
+                                              "text": params["text"]})
+                    else:
+                        api.reply(self, status, None)
+                else:
+                    api.reply(self, 404, None)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = "http://127.0.0.1:%d" % self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def reply(handler, status, result):
+        if status == 200:
+            payload = {"ok": True, "result": result}
+        elif status == 429:
+            payload = {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                       "parameters": {"retry_after": 1}}
+        else:
+            payload = {"ok": False, "error_code": status, "description": "Internal Server Error"}
+        data = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def api():
+    server = FakeBotApi()
+    yield server
+    server.close()
+
+def recording_sender(gate=None):
+    """(send, close) pair appending (monotonic time, text); with a gate, the first send waits for it."""
+    sent, started = [], threading.Event()
+
+    async def send(text):
+        if gate is not None and not sent:
+            started.set()
+            while not gate.is_set():
+                await asyncio.sleep(0.005)
+        sent.append((time.monotonic(), text))
+
+    async def close():
+        pass
+
+    return (send, close), sent, started
+
+def dispatcher(sender, **kwargs):
+    opts = dict(coalesce_sec=0, rate=1000, burst=1000, max_retries=3, backoff_sec=0.05)
+    opts.update(kwargs)
+    return AlertDispatcher(sender, **opts)
+
+def test_sends_through_api_base(api):
+    d = dispatcher(telegram_sender("123:abc", "42", api.base))
+    d.submit("first")
+    d.submit("second")
+    d.close()
+    assert [text for _, text in api.messages] == ["first", "second"]
+    assert d.stats["sent"] == 2 and d.stats["failed"] == 0
+
+def test_retries_with_exponential_backoff(api):
+    api.failures = [500, 502]
+    d = dispatcher(telegram_sender("123:abc", "42", api.base), backoff_sec=0.1)
+    d.submit("flaky")
+    d.close()
+    assert [text for _, text in api.messages] == ["flaky"]
+    gaps = [b - a for a, b in zip(api.attempts, api.attempts[1:])]
+    assert len(gaps) == 2 and gaps[0] >= 0.1 and gaps[1] >= 0.2
+    assert d.stats["sent"] == 1 and d.stats["failed"] == 0
+
+def test_honours_retry_after(api):
+    api.failures = [429]
+    d = dispatcher(telegram_sender("123:abc", "42", api.base), backoff_sec=0.01)
+    d.submit("limited")
+    d.close()
+    assert [text for _, text in api.messages] == ["limited"]
+    assert api.attempts[1] - api.attempts[0] >= 1.0
+
+def test_gives_up_after_max_retries(api):
+    api.failures = [500] * 10
+    d = dispatcher(telegram_sender("123:abc", "42", api.base), max_retries=2, backoff_sec=0.01)
+    d.submit("lost")
+    d.close()
+    assert api.messages == [] and len(api.attempts) == 3
+    assert d.stats["sent"] == 0 and d.stats["failed"] == 1
+
+def test_token_bucket_limits_send_rate():
+    sender, sent, _ = recording_sender()
+    d = dispatcher(sender, rate=20, burst=2)
+    for i in range(8):
+        d.submit(f"alert {i}")
+    d.close()
+    times = [t for t, _ in sent]
+    assert [text for _, text in sent] == [f"alert {i}" for i in range(8)]
+    assert times[1] - times[0] < 0.04                  # the burst goes out at once
+    assert times[-1] - times[1] >= 6 / 20 * 0.9        # then about one per 1/rate seconds
+
+def test_token_bucket_refills_to_capacity():
+    async def take(bucket, n):
+        t0 = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - t0
+    bucket = TokenBucket(rate=50, capacity=3)
+    assert asyncio.run(take(bucket, 3)) < 0.02
+    assert asyncio.run(take(bucket, 2)) >= 2 / 50 * 0.9
+    time.sleep(0.2)   # refills, but never above capacity
+    assert asyncio.run(take(bucket, 3)) < 0.02
+    assert asyncio.run(take(bucket, 1)) >= 1 / 50 * 0.9
+
+def test_coalesces_alerts_with_the_same_key():
+    sender, sent, _ = recording_sender()
+    d = dispatcher(sender, coalesce_sec=0.3)
+    for i in range(7):
+        d.submit(f"burst {i}", key="burst")
+    d.submit("spike", key="merchant_spike")
+    d.submit("one-off")
+    d.submit("one-off")   # key None is never merged
+    d.close()
+    texts = [text for _, text in sent]
+    assert len(texts) == 4
+    assert texts[0].startswith("🧾 7x [burst] within 0.3s\n")
+    assert texts[0].splitlines()[1:] == [f"burst {i}" for i in range(5)] + ["... +2 more"]
+    assert texts[1:] == ["spike", "one-off", "one-off"]
+    assert d.stats["digests"] == 1
+
+@pytest.mark.parametrize("overflow, accepted, delivered", [
+    ("drop_oldest", [True] * 5, ["blocker", "m2", "m3", "m4"]),
+    ("drop_new", [True, True, True, False, False], ["blocker", "m0", "m1", "m2"]),
+])
+def test_queue_overflow_policy(overflow, accepted, delivered):
+    gate = threading.Event()
+    sender, sent, started = recording_sender(gate)
+    d = dispatcher(sender, maxsize=3, overflow=overflow)
+    d.submit("blocker")
+    assert started.wait(5)   # the dispatcher is stuck sending, later alerts stay queued
+    assert [d.submit(f"m{i}") for i in range(5)] == accepted
+    gate.set()
+    d.close()
+    assert [text for _, text in sent] == delivered
+    assert d.stats["submitted"] == 6 and d.stats["dropped"] == 2
+
+def test_unknown_overflow_policy_is_rejected():
+    with pytest.raises(ValueError, match="unknown overflow policy"):
+        AlertDispatcher(recording_sender()[0], overflow="block")
@@ -0,0 +1,115 @@
+# tests/test_anomaly_sink.py
+# AnomalySink: size / age rotation, the fsync policies and flush on close
+import json
+import pytest
+import anomaly_sink
+from anomaly_sink import AnomalySink
+
+class FakeClock:
+    """Stands in for the time module inside anomaly_sink."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(anomaly_sink, "time", clock)
+    return clock
+
+@pytest.fixture
+def fsyncs(monkeypatch, clock):
+    calls = []   # clock time of every fsync
+    monkeypatch.setattr(anomaly_sink.os, "fsync", lambda fd: calls.append(clock.now - 1_000_000.0))
+    return calls
+
+def records(start, n):
+    return [{"detected_at": "2025-01-01 09:00:00", "types": ["burst"], "raw": f"line {i}"} for i in range(start, start + n)]
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["raw"] for line in f]
+
+def test_rotates_by_size_and_keeps_backups(tmp_path, clock):
+    path = str(tmp_path / "anomalies.jsonl")
+    sink = AnomalySink(path, fsync="never", rotate_bytes=200, backups=2)
+    for b in range(8):
+        assert sink.write_batch(records(2 * b, 2)) == 2
+    sink.close()
+    # a batch is about 160 bytes: each file takes two batches (over the limit with the second),
+    # the oldest file was dropped
+    assert read(path) == [f"line {i}" for i in range(12, 16)]
+    assert read(path + ".1") == [f"line {i}" for i in range(8, 12)]
+    assert read(path + ".2") == [f"line {i}" for i in range(4, 8)]
+    assert not (tmp_path / "anomalies.jsonl.3").exists()
+
+def test_size_of_an_existing_file_counts(tmp_path, clock):
+    path = str(tmp_path / "anomalies.jsonl")
+    sink = AnomalySink(path, fsync="never", rotate_bytes=150)
+    sink.write_batch(records(0, 3))
+    sink.close()
+    sink = AnomalySink(path, fsync="never", rotate_bytes=150)
+    sink.write_batch(records(3, 1))   # opens and appends
+    sink.write_batch(records(4, 1))   # the reopened file is already over the limit
+    sink.close()
+    assert read(path + ".1") == ["line 0", "line 1", "line 2", "line 3"]
+    assert read(path) == ["line 4"]
+
+def test_rotates_by_age(tmp_path, clock):
+    path = str(tmp_path / "anomalies.jsonl")
+    sink = AnomalySink(path, fsync="never", rotate_bytes=0, rotate_sec=3600, backups=3)
+    sink.write_batch(records(0, 1))
+    clock.now += 3599
+    sink.write_batch(records(1, 1))
+    clock.now += 1
+    sink.write_batch(records(2, 1))
+    clock.now += 1800
+    sink.write_batch(records(3, 1))
+    sink.close()
+    assert read(path + ".1") == ["line 0", "line 1"]
+    assert read(path) == ["line 2", "line 3"]
+
+def test_rotation_without_backups_starts_over(tmp_path, clock):
+    path = str(tmp_path / "anomalies.jsonl")
+    sink = AnomalySink(path, fsync="never", rotate_bytes=1, backups=0)
+    sink.write_batch(records(0, 1))
+    sink.write_batch(records(1, 1))
+    sink.close()
+    assert read(path) == ["line 1"]
+    assert not (tmp_path / "anomalies.jsonl.1").exists()
+
+@pytest.mark.parametrize("policy, expected", [
+    ("never", []),
+    ("batch", [0.0, 0.4, 0.8, 1.2, 1.7, 2.0]),
+    ("interval", [0.0, 1.2, 2.0]),   # at most one fsync per fsync_sec, and one on close
+])
+def test_fsync_policy(tmp_path, clock, fsyncs, policy, expected):
+    sink = AnomalySink(str(tmp_path / "anomalies.jsonl"), fsync=policy, fsync_sec=1.0)
+    for i, dt in enumerate([0.0, 0.4, 0.4, 0.4, 0.5]):
+        clock.now += dt
+        sink.write_batch(records(i, 1))
+    clock.now += 0.3
+    sink.close()
+    assert fsyncs == pytest.approx(expected)
+
+def test_close_flushes_and_reopens_for_append(tmp_path, clock):
+    path = str(tmp_path / "anomalies.jsonl")
+    sink = AnomalySink(path, fsync="never")
+    sink.write_batch(records(0, 3))
+    assert sink.write_batch([]) == 0
+    sink.close()
+    sink.close()   # a second close is a no-op
+    assert read(path) == ["line 0", "line 1", "line 2"]
+    sink.write_batch(records(3, 1))
+    sink.close()
+    assert read(path) == ["line 0", "line 1", "line 2", "line 3"]
+
+def test_unknown_fsync_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="unknown fsync policy"):
+        AnomalySink(str(tmp_path / "anomalies.jsonl"), fsync="always")
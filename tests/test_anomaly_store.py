@@ -0,0 +1,86 @@
+# tests/test_anomaly_store.py
+# AnomalyStore: insert_many / the dashboard queries, and two writer processes on one database
+import json, multiprocessing
+import pandas as pd
+from anomaly_store import AnomalyStore, import_jsonl
+from rollups import RollupStore
+
+def record(i, types, merchant="CU", minute=0):
+    return {"detected_at": f"2025-01-01 09:{minute:02d}:{i % 60:02d}", "timestamp": f"2025-01-01 09:{minute:02d}:00",
+            "merchant": merchant, "region": "Seoul", "amount": 1000.0 + i, "latency": 120.0, "status": 1,
+            "err": 0.5, "types": types, "raw": f"line {i}"}
+
+def test_insert_and_queries(tmp_path):
+    store = AnomalyStore(str(tmp_path / "anomalies.db"))
+    assert store.insert_many([]) == 0
+    records = ([record(i, ["burst"], minute=0) for i in range(3)]
+               + [record(i, ["ai_anomaly", "card_testing"], merchant="GS25", minute=1) for i in range(3, 5)]
+               + [record(5, [], minute=2)])
+    assert store.insert_many(records) == 6
+    assert store.count() == 6
+    assert store.count(since="2025-01-01 09:01:00") == 3
+    assert store.count(until="2025-01-01 09:01:00") == 3
+    assert store.type_counts() == {"burst": 3, "ai_anomaly": 2, "card_testing": 2}
+    assert store.type_counts(since="2025-01-01 09:01:00") == {"ai_anomaly": 2, "card_testing": 2}
+    minutes = store.time_buckets(bucket="minute")
+    assert minutes["bucket"].astype(str).tolist() == ["2025-01-01 09:00:00", "2025-01-01 09:01:00", "2025-01-01 09:02:00"]
+    assert minutes["count"].tolist() == [3, 2, 1]
+    assert store.time_buckets(bucket="hour", anomaly_type="card_testing")["count"].tolist() == [2]
+    latest = store.latest(limit=2)
+    assert latest["raw"].tolist() == ["line 5", "line 4"]
+    assert latest["types"].tolist() == [[], ["ai_anomaly", "card_testing"]]
+    assert pd.api.types.is_datetime64_any_dtype(latest["detected_at"])
+    assert store.latest(merchant="GS25")["raw"].tolist() == ["line 4", "line 3"]
+    assert store.latest(anomaly_type="burst")["raw"].tolist() == ["line 2", "line 1", "line 0"]
+    store.close()
+
+    reader = AnomalyStore(str(tmp_path / "anomalies.db"), readonly=True)
+    assert reader.count() == 6
+    reader.close()
+
+def test_rollups_only_database_has_no_anomalies(tmp_path):
+    # ANOMALY_OUTPUTS = ("jsonl",) with rollups on: the dashboard must fall back to the JSONL file
+    path = str(tmp_path / "anomalies.db")
+    RollupStore(path).close()
+    reader = AnomalyStore(path, readonly=True)
+    assert not reader.has_anomalies()
+    AnomalyStore(path).close()
+    assert reader.has_anomalies() and reader.count() == 0
+    reader.close()
+
+def test_import_jsonl_skips_broken_lines(tmp_path):
+    path = tmp_path / "anomalies.jsonl"
+    path.write_text("\n".join(json.dumps(record(i, ["burst"])) for i in range(7))
+                    + "\n{broken\n", encoding="utf-8")
+    store = AnomalyStore(str(tmp_path / "anomalies.db"))
+    assert import_jsonl(store, str(path), batch=3) == 7
+    assert store.type_counts() == {"burst": 7}
+    store.close()
+
+def write(path, writer, batches, start):
+    store = AnomalyStore(path)
+    start.wait()
+    for b in range(batches):
+        store.insert_many([record(i, [f"w{writer}"], merchant=f"w{writer}b{b}") for i in range(5)])
+    store.close()
+
+def test_two_writer_processes_get_distinct_ids(tmp_path):
+    path = str(tmp_path / "anomalies.db")
+    AnomalyStore(path).close()   # schema and WAL mode before the writers start
+    ctx = multiprocessing.get_context("fork")
+    start = ctx.Event()
+    writers = [ctx.Process(target=write, args=(path, w, 100, start)) for w in range(2)]
+    for p in writers:
+        p.start()
+    start.set()
+    for p in writers:
+        p.join(60)
+    assert [p.exitcode for p in writers] == [0, 0]
+    store = AnomalyStore(path, readonly=True)
+    assert store.count() == 1000
+    assert store.type_counts() == {"w0": 500, "w1": 500}
+    # every type row points at an anomaly of the same writer
+    mixed = store.conn.execute("SELECT COUNT(*) FROM anomaly_types t JOIN anomalies a ON a.id = t.anomaly_id "
+                               "WHERE substr(a.merchant, 1, 2) != t.type").fetchone()[0]
+    assert mixed == 0
+    store.close()
@@ -0,0 +1,45 @@
+# tests/test_batch_score.py
+# batch_score.py end to end on a generated log: the anomalies file, and no silent mixing with an old one
+import json, sys
+import pytest
+import batch_score
+from ai_monitor import train_model
+from benchmarks.common import write_seeded_log
+from checkpoint import save_checkpoint
+
+@pytest.fixture
+def log_and_model(tmp_path):
+    log = str(tmp_path / "tx_log.txt")
+    write_seeded_log(log, 8000, seed=3)
+    state = train_model(batch_score.first_rows(log, 2000), None, detector="mahalanobis")
+    save_checkpoint(state, str(tmp_path / "checkpoints"))
+    return log, str(tmp_path / "checkpoints")
+
+def run(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["batch_score.py", *args])
+    batch_score.main()
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_scores_a_log_and_refuses_existing_output(tmp_path, log_and_model, monkeypatch, capsys):
+    log, checkpoints = log_and_model
+    out = str(tmp_path / "rescored.jsonl")
+    run(monkeypatch, log, "--out", out, "--model", checkpoints, "--workers", "0", "--block-mb", "0.1")
+    records = read(out)
+    printed = capsys.readouterr().out
+    assert "8,000 rows (0 malformed) -> %s anomalies" % format(len(records), ",") in printed
+    assert 0 < len(records) < 8000
+    assert all(r["types"] and r["raw"].startswith("[") for r in records)
+    # the same anomalies as the sharded run over the same log
+    sharded = str(tmp_path / "sharded.jsonl")
+    run(monkeypatch, log, "--out", sharded, "--model", checkpoints, "--workers", "2")
+    assert sorted(r["raw"] for r in read(sharded)) == sorted(r["raw"] for r in records)
+
+    with pytest.raises(SystemExit):
+        run(monkeypatch, log, "--out", out, "--model", checkpoints, "--workers", "0")
+    assert "already exists" in capsys.readouterr().err
+    assert len(read(out)) == len(records)
+    run(monkeypatch, log, "--out", out, "--model", checkpoints, "--workers", "0", "--append")
+    assert len(read(out)) == 2 * len(records)
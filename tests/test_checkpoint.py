@@ -0,0 +1,46 @@
+# tests/test_checkpoint.py
+# checkpoint save / restore / prune round trip (no TensorFlow needed for these backends)
+import os
+import numpy as np
+import pytest
+import ai_monitor
+from checkpoint import save_checkpoint, load_checkpoint, load_latest, list_checkpoints, checkpoint_path
+from features import featurize
+from tx_parser import parse_block
+from benchmarks.common import seeded_lines
+
+@pytest.fixture(scope="module")
+def frame():
+    return parse_block("".join(seeded_lines(1500, seed=11)))[0]
+
+@pytest.mark.parametrize("detector", ["mahalanobis", "isolation_forest"])
+def test_round_trip_scores_identically(tmp_path, frame, detector):
+    state = ai_monitor.train_model(frame, None, detector=detector)
+    path = save_checkpoint(state, str(tmp_path))
+    assert path == checkpoint_path(str(tmp_path), 1)
+    restored = load_checkpoint(path)
+    assert restored.version == state.version and restored.threshold == state.threshold
+    assert restored.merchant_map == state.merchant_map and restored.region_map == state.region_map
+    X, _, _, _ = featurize(frame, state.merchant_map, state.region_map, state.scaler)
+    Xr, _, _, _ = featurize(frame, restored.merchant_map, restored.region_map, restored.scaler)
+    np.testing.assert_array_equal(X, Xr)
+    np.testing.assert_allclose(restored.scorer.score(Xr), state.scorer.score(X), rtol=1e-12)
+
+def test_prunes_old_versions_and_skips_corrupt_files(tmp_path, frame):
+    state = None
+    for _ in range(4):
+        state = ai_monitor.train_model(frame, state, detector="mahalanobis")
+        save_checkpoint(state, str(tmp_path), keep=2)
+    assert [os.path.basename(p) for p in list_checkpoints(str(tmp_path))] == ["model-v000003.npz", "model-v000004.npz"]
+    with open(checkpoint_path(str(tmp_path), 5), "wb") as f:
+        f.write(b"not a checkpoint")
+    assert load_latest(str(tmp_path)).version == 4
+    assert load_latest(str(tmp_path / "missing")) is None
+
+def test_monitor_does_not_checkpoint_by_default(tmp_path, frame, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monitor = ai_monitor.Monitor(anomaly_file=str(tmp_path / "anomalies.jsonl"), outputs=(), rollups=False,
+                                 alert=lambda *a, **k: None)
+    assert monitor.checkpoint_dir is None and not monitor.restore()
+    monitor.train(frame, None, detector="mahalanobis")
+    assert not os.path.exists(tmp_path / "logs" / "checkpoints")
@@ -0,0 +1,60 @@
+# tests/test_detectors.py
+# flattened isolation forest vs sklearn's score_samples, streaming Mahalanobis merge vs a one-shot estimate
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from detectors import IsolationForestDetector, MahalanobisDetector
+
+def sample(n, seed, dims=6):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, dims)) @ rng.normal(size=(dims, dims))
+    X[rng.random(n) < 0.02] += rng.normal(0, 8, dims)   # a few outliers
+    return X
+
+@pytest.mark.parametrize("n, max_samples", [(3000, 256), (100, 256), (2, 256)])
+def test_isolation_forest_matches_sklearn(n, max_samples):
+    X = sample(n, seed=n)
+    det = IsolationForestDetector(n_trees=50, max_samples=max_samples, seed=3).fit(X)
+    forest = IsolationForest(n_estimators=50, max_samples=min(max_samples, n), random_state=3).fit(X)
+    Y = np.vstack([X, sample(500, seed=1)])
+    expected = -forest.score_samples(Y)
+    np.testing.assert_allclose(det.score(Y), expected, rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(det.score(Y, chunk=7), expected, rtol=1e-12, atol=1e-15)
+
+def test_isolation_forest_arrays_round_trip():
+    X = sample(1000, seed=5)
+    det = IsolationForestDetector(n_trees=20, seed=1).fit(X)
+    copy = IsolationForestDetector.from_arrays(*det.to_arrays())
+    np.testing.assert_array_equal(copy.score(X), det.score(X))
+
+def one_shot(X, w):
+    mean = w @ X / w.sum()
+    D = X - mean
+    return w.sum(), mean, (D * w[:, None]).T @ D
+
+@pytest.mark.parametrize("chunk", [1, 17, 500])
+def test_mahalanobis_chunked_merge_matches_one_shot(chunk):
+    X = sample(2000, seed=7)
+    w = np.random.default_rng(7).uniform(0.1, 1.0, len(X))
+    det = MahalanobisDetector()
+    for i in range(0, len(X), chunk):
+        det._merge(X[i:i + chunk], w[i:i + chunk])
+    n, mean, m2 = one_shot(X, w)
+    assert det.n == pytest.approx(n)
+    np.testing.assert_allclose(det.mean, mean, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(det.m2, m2, rtol=1e-9, atol=1e-9)
+
+def test_mahalanobis_incremental_fit_matches_one_shot_fit():
+    # without decay and Huber weights, fitting chunk by chunk on the previous model is one fit on all rows
+    X = sample(3000, seed=11)
+    full = MahalanobisDetector(decay=1.0, clip=np.inf).fit(X)
+    det = None
+    for i in range(0, len(X), 700):
+        det = MahalanobisDetector(decay=1.0, clip=np.inf).fit(X[i:i + 700], prev=det)
+    assert det.n == pytest.approx(full.n)
+    np.testing.assert_allclose(det.mean, full.mean, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(det.m2, full.m2, rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(det.score(X), full.score(X), rtol=1e-8)
+    D = X[:5] - X.mean(axis=0)
+    expected = np.einsum("ij,jk,ik->i", D, np.linalg.inv(np.cov(X.T, bias=True)), D)
+    np.testing.assert_allclose(full.score(X[:5]), expected, rtol=1e-5)
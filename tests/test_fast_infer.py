@@ -0,0 +1,65 @@
+# tests/test_fast_infer.py
+# NumpyAutoencoder against the model output within check_equivalence's tolerance
+import numpy as np
+import pytest
+from fast_infer import NumpyAutoencoder, check_equivalence, reconstruction_error
+
+DIMS = [6, 32, 16, 8, 16, 32, 6]   # the layer sizes of detectors.build_autoencoder on featurize() output
+
+class ReferenceModel:
+    """float64 dense forward pass with the Keras predict() signature."""
+
+    def __init__(self, layers):
+        self.layers = layers
+
+    def predict(self, X, verbose=0):
+        h = np.asarray(X, dtype=np.float64)
+        for W, b, act in self.layers:
+            h = h @ W.astype(np.float64) + b.astype(np.float64)
+            if act == "relu":
+                h = np.maximum(h, 0)
+        return h
+
+def random_layers(seed=0):
+    rng = np.random.default_rng(seed)
+    acts = ["relu"] * (len(DIMS) - 2) + ["linear"]
+    return [(rng.normal(0, 1 / np.sqrt(i), (i, o)).astype(np.float32), rng.normal(0, 0.1, o).astype(np.float32), act)
+            for i, o, act in zip(DIMS[:-1], DIMS[1:], acts)]
+
+@pytest.mark.parametrize("n", [1, 7, 64, 300])
+def test_matches_reference_forward_pass(n):
+    layers = random_layers()
+    net, model = NumpyAutoencoder(layers), ReferenceModel(layers)
+    X = np.random.default_rng(n).normal(size=(n, DIMS[0]))
+    ok, diff = check_equivalence(net, model, X)
+    assert ok, diff
+    np.testing.assert_allclose(net.predict(X), model.predict(X), rtol=1e-3, atol=1e-5)
+
+def test_buffers_are_reused_without_leaking_between_batches():
+    layers = random_layers(1)
+    net = NumpyAutoencoder(layers, capacity=4)
+    rng = np.random.default_rng(1)
+    small, large = rng.normal(size=(3, DIMS[0])), rng.normal(size=(50, DIMS[0]))
+    first = net.predict(small)
+    first_scores = net.score(small)
+    net.score(large)   # grows the buffers
+    np.testing.assert_array_equal(net.predict(small), first)
+    np.testing.assert_array_equal(net.score(small), first_scores)
+    np.testing.assert_allclose(net.score(large[:3]), NumpyAutoencoder(layers).score(large[:3]))
+
+def test_unsupported_activation_is_rejected():
+    W, b, _ = random_layers()[0]
+    with pytest.raises(ValueError, match="unsupported activation"):
+        NumpyAutoencoder([(W, b, "tanh")])
+
+def test_matches_trained_keras_model():
+    pytest.importorskip("tensorflow")
+    from detectors import build_autoencoder
+    X = np.random.default_rng(2).normal(size=(512, DIMS[0])).astype(np.float32)
+    model = build_autoencoder(X.shape[1])
+    model.fit(X, X, epochs=2, batch_size=32, verbose=0)
+    net = NumpyAutoencoder.from_keras(model)
+    for n in (1, 16, 512):
+        ok, diff = check_equivalence(net, model, X[:n])
+        assert ok, diff
+    np.testing.assert_allclose(net.score(X), reconstruction_error(model, X), rtol=1e-3, atol=1e-6)
@@ -0,0 +1,119 @@
+# tests/test_ingest.py
+# IngestServer: a failing batch is answered with ERR, a dead detection loop stops the server
+import os, re, threading, time
+import pytest
+import generate_transactions as gen
+from ingest import IngestClient, IngestServer
+from metrics import Metrics
+
+class FakeMonitor:
+    """process_batch raises for frames with a POISON merchant, flush() raises when fail_flush is set.
+
+    With a gate, the first process_batch waits for it (later batches queue up meanwhile).
+    """
+
+    def __init__(self, tmp_path, gate=None):
+        self.metrics = Metrics(str(tmp_path / "metrics.prom"))
+        self.rows = 0
+        self.pending = 0
+        self.fail_flush = False
+        self.gate = gate
+        self.batches = []   # rows per process_batch call
+
+    def poll_model(self):
+        pass
+
+    def process_batch(self, df):
+        if self.gate is not None and not self.batches:
+            self.batches.append(0)
+            assert self.gate.wait(10)
+        self.batches.append(len(df))
+        if (df["merchant"] == "POISON").any():
+            raise ValueError("bad batch")
+        self.rows += len(df)
+        self.pending = 1   # like a ShardedMonitor: written on the next flush
+
+    def flush(self):
+        if self.fail_flush:
+            raise RuntimeError("writer died")
+        self.pending = 0
+
+def start(tmp_path, monitor):
+    address = "unix://" + str(tmp_path / "ingest.sock")
+    server = IngestServer(monitor, address)
+    errors = []
+    def run():
+        try:
+            server.run()
+        except Exception as e:
+            errors.append(e)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not os.path.exists(str(tmp_path / "ingest.sock")):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return address, thread, errors
+
+def lines(n):
+    return "".join(gen.generate_tx_line() + "\n" for _ in range(n)).encode("utf-8")
+
+def test_failed_batch_gets_err_and_ingestion_continues(tmp_path):
+    monitor = FakeMonitor(tmp_path)
+    address, thread, errors = start(tmp_path, monitor)
+    bad = re.sub(rb"merchant=\S+", b"merchant=POISON", lines(1))
+    client = IngestClient(address, window=1, timeout=10)
+    client.send_batch(bad)
+    with pytest.raises(ConnectionError, match="detection failed"):
+        client._read_ack()
+    client.sock.close()
+    with IngestClient(address, window=1, timeout=10) as client:
+        client.send_batch(lines(20))
+    assert client.acked_rows == 20
+    assert monitor.rows == 20
+    assert thread.is_alive() and not errors
+
+def test_failing_batch_of_a_merged_group_only_fails_its_producer(tmp_path):
+    gate = threading.Event()
+    monitor = FakeMonitor(tmp_path, gate)
+    address, thread, errors = start(tmp_path, monitor)
+    blocker = IngestClient(address, window=1, timeout=10)
+    blocker.send_batch(lines(5))
+    deadline = time.monotonic() + 5
+    while not monitor.batches:   # detection is stuck on the first batch
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    producers = [IngestClient(address, window=1, timeout=10) for _ in range(3)]
+    poison = re.sub(rb"merchant=\S+", b"merchant=POISON", lines(4), count=1)
+    queued = monitor.metrics._values["ingest_queue_batches"]
+    for k, (client, data) in enumerate(zip(producers, [lines(10), poison, lines(30)])):
+        client.send_batch(data)
+        while queued.get((), 0) <= k:   # keep the queue order of the producers
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    gate.set()
+    blocker.close()
+    with pytest.raises(ConnectionError, match="detection failed"):
+        producers[1]._read_ack()
+    producers[1].sock.close()
+    for client in (producers[0], producers[2]):
+        client.close()
+    assert [c.acked_rows for c in (blocker, producers[0], producers[2])] == [5, 10, 30]
+    # the merged group (10 + 4 + 30 rows) failed, then each batch was detected on its own
+    assert monitor.batches[2:] == [44, 10, 4, 30]
+    assert monitor.rows == 45
+    assert thread.is_alive() and not errors
+
+def test_dead_detection_loop_fails_producers_and_stops(tmp_path):
+    monitor = FakeMonitor(tmp_path)
+    monitor.fail_flush = True
+    address, thread, errors = start(tmp_path, monitor)
+    client = IngestClient(address, window=1, timeout=10)
+    client.send_batch(lines(20))
+    with pytest.raises(ConnectionError, match="detection stopped"):
+        client._read_ack()
+    client.sock.close()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert [str(e) for e in errors] == ["ingest detection stopped"]
+    assert not os.path.exists(str(tmp_path / "ingest.sock"))
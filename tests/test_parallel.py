@@ -0,0 +1,29 @@
+# tests/test_parallel.py
+# DETECT_WORKERS = 0 vs > 0 on a seeded log: the same anomalies in the same order
+import pytest
+from ai_monitor import create_monitor, train_model
+from benchmarks.bench_parallel import read_batches, run, anomaly_set
+from benchmarks.common import write_seeded_log
+
+@pytest.fixture(scope="module")
+def seeded(tmp_path_factory):
+    log = str(tmp_path_factory.mktemp("log") / "tx_log.txt")
+    write_seeded_log(log, 12000, seed=7)
+    batches = read_batches(log, 1000)
+    state = train_model(batches[0], None, detector="mahalanobis")
+    return batches, state
+
+def detect(tmp_path, workers, batches, state):
+    monitor = create_monitor(workers, anomaly_file=str(tmp_path / f"w{workers}.jsonl"),
+                             anomaly_db=str(tmp_path / f"w{workers}.db"), alert=lambda *a, **k: None,
+                             retrain_every=float("inf"), checkpoint_dir=None)
+    return run(monitor, state, batches)[0]
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_sharded_detection_matches_single_process(tmp_path, seeded, workers):
+    batches, state = seeded
+    single = detect(tmp_path, 0, batches, state)
+    sharded = detect(tmp_path, workers, batches, state)
+    assert len(single) > 0
+    assert anomaly_set(sharded) == anomaly_set(single)
+    assert [r["raw"] for r in sharded] == [r["raw"] for r in single]
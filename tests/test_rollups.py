@@ -0,0 +1,21 @@
+# tests/test_rollups.py
+# RollupAggregator: rows without a timestamp are left out of every bucket
+import pandas as pd
+from rollups import RollupAggregator, RollupStore
+
+def frame(timestamps):
+    n = len(timestamps)
+    return pd.DataFrame({"timestamp": pd.to_datetime(timestamps), "status": [1] * n, "latency": [100.0] * n,
+                         "merchant": ["CU"] * n, "region": ["Seoul"] * n, "amount": [1000.0] * n})
+
+def test_nat_timestamps_are_skipped(tmp_path):
+    store = RollupStore(str(tmp_path / "rollups.db"))
+    agg = RollupAggregator(store, granularities=("minute", "hour"))
+    agg.add_batch(frame(["2025-01-01 09:00:10", None, "2025-01-01 09:01:30"]))
+    agg.add_batch(frame([None, None]))
+    agg.flush(final=True)
+    minutes = store.query("minute")
+    assert minutes["bucket"].astype(str).tolist() == ["2025-01-01 09:00:00", "2025-01-01 09:01:00"]
+    assert minutes["count"].tolist() == [1, 1]
+    assert store.query("hour")["count"].tolist() == [2]
+    store.close()
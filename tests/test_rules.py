@@ -0,0 +1,73 @@
+# tests/test_rules.py
+# evaluate_batch against the original per-row rule loop of ai_monitor.py (before rules.py) on a seeded log
+import numpy as np
+import pandas as pd
+import pytest
+from config import HIGH_LATENCY_MS, HIGH_AMOUNT, OFF_HOURS, COMPOSITE_MIN_TYPES
+import generate_transactions as gen
+from rules import ANOMALY_TYPES, evaluate_batch, mask_to_types
+from tx_parser import parse_block
+from window_rules import WindowRuleEngine
+
+THRESHOLD = 3.0   # about 5% of the exponential(1) scores below
+
+def per_row_rules(df, rec_err, threshold, windows):
+    """The original loop: one row at a time, types appended in rule order."""
+    out = []
+    for i, row in df.reset_index(drop=True).iterrows():
+        types = []
+        if rec_err[i] > threshold:
+            types.append("autoencoder")
+        if row["latency"] > HIGH_LATENCY_MS:
+            types.append("high_latency")
+        if row["amount"] > HIGH_AMOUNT:
+            types.append("high_amount")
+        if str(row["merchant"]).startswith("odd_"):
+            types.append("unknown_merchant")
+        if str(row["region"]).startswith("odd_region"):
+            types.append("unknown_region")
+        if row["status"] == 0:
+            types.append("failure")
+        if pd.to_datetime(row["timestamp"]).hour in set(OFF_HOURS):
+            types.append("off_hour")
+        burst, card_testing, merchant_spike = windows.update(
+            pd.Timestamp(row["timestamp"]).value, row["merchant"], row["amount"])
+        if burst:
+            types.append("burst")
+        if card_testing:
+            types.append("card_testing")
+        if merchant_spike:
+            types.append("merchant_spike")
+        if len(types) >= COMPOSITE_MIN_TYPES:
+            types.append("composite")
+        out.append(tuple(sorted(set(types))))
+    return out
+
+@pytest.fixture(scope="module")
+def seeded(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("log") / "tx.txt")
+    start = np.datetime64("2025-01-01T09:00:00")
+    gen.backfill(path, str(start), str(start + np.timedelta64(1500, "s")), 4.0, seed=4)
+    with open(path, encoding="utf-8") as f:
+        df = parse_block(f.read())[0]
+    rec_err = np.random.default_rng(4).exponential(1.0, len(df))
+    return df, rec_err, per_row_rules(df, rec_err, THRESHOLD, WindowRuleEngine())
+
+@pytest.mark.parametrize("batch", [1, 97, 1000])
+def test_batch_matches_per_row_rules(seeded, batch):
+    df, rec_err, expected = seeded
+    windows = WindowRuleEngine()
+    got = []
+    for i in range(0, len(df), batch):
+        part = df.iloc[i:i + batch].reset_index(drop=True)
+        got += [mask_to_types(int(m)) for m in evaluate_batch(part, rec_err[i:i + batch], THRESHOLD, windows)]
+    assert got == expected
+    # every rule fired somewhere on the log
+    seen = {t for types in expected for t in types}
+    assert seen == set(ANOMALY_TYPES)
+
+def test_without_model_scores_no_autoencoder_flag(seeded):
+    df = seeded[0]
+    mask = evaluate_batch(df)
+    assert not any("autoencoder" in mask_to_types(int(m)) for m in mask)
+    assert len(evaluate_batch(df.iloc[:0])) == 0
@@ -0,0 +1,90 @@
+# tests/test_tail_reader.py
+# tail_lines / TailCache: reads from the end, reuses the offset, detects truncation / rotation
+import os
+import pandas as pd
+import pytest
+import tail_reader
+from tail_reader import TailCache, tail_lines
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(tail_reader, "BLOCK_SIZE", 7)   # lines span several blocks
+
+class RecordingParser:
+    def __init__(self):
+        self.calls = []   # the text of every parse call
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return pd.DataFrame({"line": text.splitlines()})
+
+def lines(start, stop):
+    return "".join(f"line {i}\n" for i in range(start, stop))
+
+def append(path, text):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+def test_tail_lines(tmp_path):
+    path = tmp_path / "log.txt"
+    path.write_text(lines(0, 20), encoding="utf-8")
+    assert tail_lines(str(path), 3) == ["line 17", "line 18", "line 19"]
+    assert tail_lines(str(path), 50) == [f"line {i}" for i in range(20)]
+    append(path, "unfinished")
+    assert tail_lines(str(path), 2) == ["line 19", "unfinished"]
+
+def test_appends_reuse_the_offset(tmp_path):
+    path = str(tmp_path / "log.txt")
+    append(path, lines(0, 10))
+    parse = RecordingParser()
+    cache = TailCache(path, 5, parse)
+    first = cache.get()
+    assert first["line"].tolist() == [f"line {i}" for i in range(5, 10)]
+    assert cache.get() is first and len(parse.calls) == 1   # unchanged file: nothing read
+    append(path, lines(10, 13))
+    assert cache.get()["line"].tolist() == [f"line {i}" for i in range(8, 13)]
+    assert parse.calls[1:] == [lines(10, 13)]   # only the appended bytes are parsed
+
+def test_partial_last_line_waits_until_complete(tmp_path):
+    path = str(tmp_path / "log.txt")
+    append(path, lines(0, 3) + "line 3 (half")
+    parse = RecordingParser()
+    cache = TailCache(path, 10, parse)
+    assert cache.get()["line"].tolist() == ["line 0", "line 1", "line 2"]
+    append(path, " still")
+    assert cache.get()["line"].tolist() == ["line 0", "line 1", "line 2"]
+    append(path, " going)\n")
+    assert cache.get()["line"].tolist() == ["line 0", "line 1", "line 2", "line 3 (half still going)"]
+    assert parse.calls == [lines(0, 3), "line 3 (half still going)\n"]
+
+def test_truncated_file_is_read_again(tmp_path):
+    path = str(tmp_path / "log.txt")
+    append(path, lines(0, 10))
+    cache = TailCache(path, 5, RecordingParser())
+    cache.get()
+    ino = os.stat(path).st_ino
+    with open(path, "w", encoding="utf-8") as f:   # same inode, shorter
+        f.write(lines(100, 102))
+    assert os.stat(path).st_ino == ino
+    assert cache.get()["line"].tolist() == ["line 100", "line 101"]
+    append(path, lines(102, 104))
+    assert cache.get()["line"].tolist() == [f"line {i}" for i in range(100, 104)]
+
+def test_rotated_file_is_read_again(tmp_path):
+    path = str(tmp_path / "log.txt")
+    append(path, lines(0, 10))
+    cache = TailCache(path, 5, RecordingParser())
+    cache.get()
+    # a new, larger file replaces the old one: its size alone would look like an append
+    append(path + ".new", lines(200, 230))
+    os.replace(path + ".new", path)
+    assert cache.get()["line"].tolist() == [f"line {i}" for i in range(225, 230)]
+
+def test_missing_or_empty_file(tmp_path):
+    path = str(tmp_path / "log.txt")
+    cache = TailCache(path, 5, RecordingParser())
+    assert cache.get().empty
+    open(path, "w").close()
+    assert cache.get().empty
+    append(path, lines(0, 2))
+    assert cache.get()["line"].tolist() == ["line 0", "line 1"]
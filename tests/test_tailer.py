@@ -0,0 +1,46 @@
+# tests/test_tailer.py
+# LogTailer rotation with a backlog larger than one batch, and lag against the committed offset
+import os
+from tailer import LogTailer
+
+def write_lines(path, start, n, mode="a"):
+    with open(path, mode, encoding="utf-8") as f:
+        for i in range(start, start + n):
+            f.write(f"line {i:06d} " + "x" * 40 + "\n")
+
+def read_all(tailer):
+    lines = []
+    while True:
+        text = tailer.read()
+        if not text:
+            return lines
+        lines.extend(text.splitlines())
+
+def test_rotation_drains_backlog_beyond_one_batch(tmp_path):
+    path = str(tmp_path / "tx.log")
+    write_lines(path, 0, 10, "w")
+    tailer = LogTailer(path, chunk_size=256, max_batch_bytes=1024, use_inotify=False)
+    assert len(read_all(tailer)) == 10
+    write_lines(path, 10, 500)             # ~26 KB behind when the file is rotated
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("last line of the old file without newline")
+    os.rename(path, path + ".1")
+    write_lines(path, 510, 20, "w")
+    lines = read_all(tailer)
+    tailer.close()
+    assert lines[:500] == [f"line {i:06d} " + "x" * 40 for i in range(10, 510)]
+    assert lines[500] == "last line of the old file without newline"
+    assert lines[501:] == [f"line {i:06d} " + "x" * 40 for i in range(510, 530)]
+
+def test_lag_bytes_follows_committed_offset(tmp_path):
+    path = str(tmp_path / "tx.log")
+    write_lines(path, 0, 10, "w")
+    size = os.path.getsize(path)
+    tailer = LogTailer(path, use_inotify=False)
+    assert len(tailer.read().splitlines()) == 10
+    assert tailer.lag_bytes() == size       # read but not committed yet
+    tailer.commit()
+    assert tailer.lag_bytes() == 0
+    write_lines(path, 10, 5)
+    assert tailer.lag_bytes() == os.path.getsize(path) - size
+    tailer.close()
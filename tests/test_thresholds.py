@@ -0,0 +1,50 @@
+# tests/test_thresholds.py
+# streaming thresholds: carried across model swaps, so they leave the training fallback under the default config
+import numpy as np
+import pandas as pd
+import ai_monitor
+from config import THRESHOLD_MIN_COUNT
+from retrainer import BackgroundTrainer
+from thresholds import ThresholdTracker
+from tx_parser import parse_block
+from benchmarks.common import seeded_lines
+
+def frame(n, merchants=("CU", "GS25")):
+    return pd.DataFrame({"timestamp": pd.date_range("2025-01-01 09:00", periods=n, freq="s"),
+                         "merchant": [merchants[i % len(merchants)] for i in range(n)]})
+
+def test_rescale_moves_quantiles_by_the_threshold_ratio():
+    tracker = ThresholdTracker(fallback=1.0, segment="merchant", min_count=10)
+    scores = np.random.default_rng(0).lognormal(0, 0.5, 2000)
+    tracker.update(frame(2000), scores)
+    before = tracker.global_threshold()
+    assert tracker.rescale(2.0, 8.0)
+    assert tracker.fallback == 8.0
+    assert abs(tracker.global_threshold() / before - 4.0) < 0.1
+    assert tracker.thresholds(frame(2)).min() >= tracker.global_threshold()   # segments kept too
+    assert not tracker.rescale(0.0, 8.0) and not tracker.rescale(1.0, float("nan"))
+
+def test_thresholds_leave_the_fallback_under_default_config(tmp_path):
+    def train(frame, prev=None, **kwargs):
+        return ai_monitor.train_model(frame, prev, detector="mahalanobis", **kwargs)
+    monitor = ai_monitor.Monitor(anomaly_file=str(tmp_path / "anomalies.jsonl"), outputs=(), alert=lambda *a, **k: None,
+                                 rollups=False, checkpoint_dir=None)
+    monitor.trainer = BackgroundTrainer(train, background=False)   # swap models at a fixed cadence
+    monitor.thresholds = ThresholdTracker(segment="merchant")
+    lines = seeded_lines(6000, seed=3, merchants=6)
+    streaming = swaps = batches = 0
+    segments_ready = False
+    for i in range(0, len(lines), 50):
+        version = monitor.state.version if monitor.state else 0
+        monitor.poll_model()
+        swaps += monitor.state is not None and monitor.state.version != version
+        monitor.process_batch(parse_block("".join(lines[i:i + 50]))[0])
+        if monitor.state is not None:
+            batches += 1
+            tracker = monitor.thresholds
+            streaming += tracker.global_threshold() != tracker.fallback
+            _, n = tracker._quantiles(list(tracker._slots.values()))
+            segments_ready |= bool((n >= THRESHOLD_MIN_COUNT).any())
+    assert swaps > 10                      # retrained every RETRAIN_EVERY rows
+    assert streaming / batches > 0.9
+    assert segments_ready
@@ -0,0 +1,41 @@
+# tests/test_tx_binary.py
+# BinaryTailer rotation with a backlog larger than one batch, dictionary id width
+import os
+import numpy as np
+import pytest
+from tx_binary import BinaryLogWriter, BinaryTailer, RECORD_SIZE
+
+def write_records(path, start, n):
+    with BinaryLogWriter(path) as w:
+        w.write_columns(np.arange(start, start + n, dtype=np.int64) * 1_000_000_000, np.ones(n, dtype=np.int8),
+                        np.full(n, 100.0), ["m%d" % (i % 7) for i in range(n)], ["Seoul"] * n,
+                        np.arange(start, start + n, dtype=np.float64))
+
+def read_all(tailer):
+    amounts = []
+    while True:
+        records = tailer.read()
+        if not len(records):
+            return amounts
+        amounts.extend(records["amount"].astype(int).tolist())
+
+def test_rotation_drains_backlog_beyond_one_batch(tmp_path):
+    path = str(tmp_path / "tx.bin")
+    write_records(path, 0, 10)
+    tailer = BinaryTailer(path, max_batch_bytes=16 * RECORD_SIZE, use_inotify=False)
+    assert read_all(tailer) == list(range(10))
+    write_records(path, 10, 500)
+    os.rename(path, path + ".1")
+    write_records(path, 510, 20)
+    assert read_all(tailer) == list(range(10, 530))
+    tailer.close()
+
+def test_dictionary_rejects_ids_beyond_field_width(tmp_path):
+    path = str(tmp_path / "tx.bin")
+    n = np.iinfo(np.uint16).max + 1
+    with BinaryLogWriter(path) as w:
+        w.dictionary.intern("region", ["r%d" % i for i in range(n)])
+        with pytest.raises(ValueError, match="region dictionary full"):
+            w.dictionary.intern("region", ["one too many"])
+        assert len(w.dictionary.names["region"]) == n
+        assert w.dictionary.intern("region", ["r%d" % (n - 1)]).tolist() == [n - 1]
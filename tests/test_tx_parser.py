@@ -0,0 +1,49 @@
+# tests/test_tx_parser.py
+# parse_block: malformed accounting on the fast (csv) and the regex path
+import numpy as np
+import ai_monitor
+from tx_parser import parse_block
+from benchmarks.common import seeded_lines
+
+BAD_TS = "[2025-13-45 99:00:00] status=SUCCESS latency=120.0ms merchant=CU region=Seoul amount=5000\n"
+
+def test_invalid_timestamp_counts_as_malformed():
+    lines = seeded_lines(1000, seed=5)
+    lines[500] = BAD_TS
+    for text in ("".join(lines), "".join(lines) + "\n  \n"):   # fast path, regex path (blank lines)
+        df, malformed = parse_block(text)
+        assert malformed == 1 and len(df) == 999
+        assert not np.isnat(df["timestamp"].to_numpy()).any()
+        assert BAD_TS.strip() not in set(df["raw"])
+    # the rest trains as usual
+    ai_monitor.train_model(parse_block("".join(lines))[0], None, detector="mahalanobis")
+
+GOOD = "[2025-01-01 09:00:00] status=SUCCESS latency=120.5ms merchant=CU region=Seoul amount=5000"
+VARIANTS = [
+    GOOD,
+    GOOD.replace("amount=5000", "amount=-5"),
+    GOOD.replace("amount=5000", "amount=1e3"),
+    GOOD.replace("amount=5000", "amount=+7"),
+    GOOD.replace("amount=5000", "amount=inf"),
+    GOOD.replace("amount=5000", "amount=1.2.3"),
+    GOOD.replace("amount=5000", "amount=."),
+    GOOD.replace("amount=5000", "amount=5."),
+    GOOD.replace("amount=5000", "amount=.5"),
+    GOOD.replace("latency=120.5ms", "latency=-1ms"),
+    GOOD.replace("latency=120.5ms", "latency=nanms"),
+    GOOD.replace("latency=120.5ms", "latency=1E2ms"),
+    GOOD.replace("status=SUCCESS", "status=N/A"),
+    GOOD.replace("merchant=CU", "merchant="),
+    GOOD.replace("region=Seoul", "region=Se oul"),
+    GOOD.replace("[2025-01-01 09:00:00]", "[2025]01-01 09:00:00]"),
+]
+
+def test_fast_and_regex_paths_agree():
+    head = seeded_lines(200, seed=9)
+    for line in VARIANTS:
+        block = "".join(head) + line + "\n"
+        fast = parse_block(block)
+        slow = parse_block(block + " \n")   # a blank line forces the regex path
+        assert fast[1] == slow[1], line
+        assert fast[0].drop(columns="raw").equals(slow[0].drop(columns="raw")), line
+        assert (fast[1] == 0) == (line in (GOOD, VARIANTS[7], VARIANTS[8])), line
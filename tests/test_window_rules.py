@@ -0,0 +1,146 @@
+# tests/test_window_rules.py
+# WindowRuleEngine against the original per-row rules of ai_monitor.py (before window_rules.py)
+from collections import deque, defaultdict
+import numpy as np
+import pytest
+from config import WINDOW_SEC, WINDOW_MAX_LATENESS_SEC, BURST_THRESHOLD, CARD_TEST_MAX_AMOUNT, CARD_TEST_THRESHOLD, MERCHANT_SPIKE_THRESHOLD
+import generate_transactions as gen
+from tx_parser import parse_block
+from window_rules import WindowRuleEngine, NS
+
+def baseline_rules(ts, merchants, amounts, in_window_only=False):
+    """The original loop (recent_window / merchant_windows deques) over ns timestamps.
+
+    The original burst rule counted only entries with ts >= cutoff, while
+    card_testing and merchant_spike counted every entry left in the deques
+    (stale ones included when a later timestamp blocks expiry at the front);
+    in_window_only applies the burst filter to all three.
+    """
+    recent_window = deque()
+    merchant_windows = defaultdict(deque)
+    out = []
+    for t, m, a in zip(ts.tolist(), merchants, amounts.tolist()):
+        recent_window.append((t, m, a))
+        merchant_windows[m].append(t)
+        cutoff = t - WINDOW_SEC * NS
+        while recent_window and recent_window[0][0] < cutoff:
+            recent_window.popleft()
+        while merchant_windows[m] and merchant_windows[m][0] < cutoff:
+            merchant_windows[m].popleft()
+        lo = cutoff if in_window_only else -np.inf
+        burst = len([x for x in recent_window if x[0] >= cutoff]) >= BURST_THRESHOLD
+        small = sum(1 for x, mm, aa in recent_window if x >= lo and mm == m and aa < CARD_TEST_MAX_AMOUNT)
+        spike = sum(1 for x in merchant_windows[m] if x >= lo) >= MERCHANT_SPIKE_THRESHOLD
+        out.append((burst, small >= CARD_TEST_THRESHOLD, spike))
+    return np.array(out, dtype=bool).reshape(-1, 3)
+
+def in_window_rules(ts, merchants, amounts):
+    """Brute force: each row counts the rows so far (itself included) in [its cutoff, its ts]."""
+    merchants = np.array(merchants, dtype=object)
+    small = amounts < CARD_TEST_MAX_AMOUNT
+    out = np.zeros((len(ts), 3), dtype=bool)
+    for i in range(len(ts)):
+        inside = (ts[:i + 1] >= ts[i] - WINDOW_SEC * NS) & (ts[:i + 1] <= ts[i])
+        same = inside & (merchants[:i + 1] == merchants[i])
+        out[i] = (inside.sum() >= BURST_THRESHOLD, (same & small[:i + 1]).sum() >= CARD_TEST_THRESHOLD,
+                  same.sum() >= MERCHANT_SPIKE_THRESHOLD)
+    return out
+
+def covered_rows(ts, merchants):
+    """Rows none of whose earlier window rows were dropped before the row was counted (global and own merchant)."""
+    cutoff = ts - WINDOW_SEC * NS
+    lateness = WINDOW_MAX_LATENESS_SEC * NS
+    merchants = np.array(merchants, dtype=object)
+    out = np.zeros(len(ts), dtype=bool)
+    dropped, prev = -np.inf, None
+    merchant_dropped, merchant_prev = defaultdict(lambda: -np.inf), {}
+    for i, (c, m) in enumerate(zip(cutoff.tolist(), merchants.tolist())):
+        dropped = max(dropped, (c if prev is None else min(c, prev)) - lateness)
+        p = merchant_prev.get(m)
+        merchant_dropped[m] = max(merchant_dropped[m], (c if p is None else min(c, p)) - lateness)
+        prev, merchant_prev[m] = c, c
+        # the row itself is always counted, earlier rows of its window may be gone
+        inside = (ts[:i] >= c) & (ts[:i] <= ts[i])
+        lost = inside & ((ts[:i] < dropped) | ((merchants[:i] == m) & (ts[:i] < merchant_dropped[m])))
+        out[i] = not lost.any()
+    return out
+
+def seeded_rows(n, mean_gap_sec, seed, jitter_sec=0.0):
+    rng = np.random.default_rng(seed)
+    ts = np.cumsum(rng.exponential(mean_gap_sec * NS, n)).astype(np.int64) + 1_700_000_000 * NS
+    if jitter_sec:
+        ts = ts + rng.integers(-jitter_sec * NS, jitter_sec * NS, n)
+    merchants = rng.choice(["CU", "GS25", "Starbucks", "Amazon", "odd_1", "odd_2"], n).tolist()
+    amounts = np.where(rng.random(n) < 0.3, rng.integers(100, 2000, n), rng.integers(2000, 90000, n)).astype(float)
+    return ts, merchants, amounts
+
+def engine_rules(ts, merchants, amounts, batch=500):
+    engine = WindowRuleEngine(idle_sec=10 ** 9)   # no idle eviction (the original kept every merchant)
+    parts = [np.column_stack(engine.evaluate(ts[i:i + batch], merchants[i:i + batch], amounts[i:i + batch]))
+             for i in range(0, len(ts), batch)]
+    return np.concatenate(parts), engine
+
+@pytest.mark.parametrize("gap", [0.5, 5.0, 60.0])
+def test_in_order_matches_baseline(gap):
+    ts, merchants, amounts = seeded_rows(5000, gap, seed=3)
+    got, _ = engine_rules(ts, merchants, amounts)
+    np.testing.assert_array_equal(got, baseline_rules(ts, merchants, amounts))
+
+@pytest.mark.parametrize("gap, jitter", [(0.5, 5.0), (5.0, 20.0), (1.0, WINDOW_MAX_LATENESS_SEC / 2)])
+def test_out_of_order_counts_in_window_rows(gap, jitter):
+    # disorder up to 2 * jitter <= lateness: every row sees exactly the earlier rows of its window
+    ts, merchants, amounts = seeded_rows(4000, gap, seed=5, jitter_sec=jitter)
+    got, _ = engine_rules(ts, merchants, amounts)
+    np.testing.assert_array_equal(got, in_window_rules(ts, merchants, amounts))
+
+@pytest.mark.parametrize("gap", [0.2, 5.0, 60.0])
+def test_generated_log_counts_in_window_rows(tmp_path, gap):
+    # backfill logs contain injected off-hour timestamps, hours away from their neighbours
+    path = str(tmp_path / "tx.txt")
+    start = np.datetime64("2025-01-01T09:00:00")
+    gen.backfill(path, str(start), str(start + np.timedelta64(int(gap * 10000), "s")), 1 / gap, seed=1)
+    with open(path, encoding="utf-8") as f:
+        df = parse_block(f.read())[0].head(10000)
+    ts = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    merchants, amounts = df["merchant"].tolist(), df["amount"].to_numpy()
+    got, engine = engine_rules(ts, merchants, amounts)
+    expected = in_window_rules(ts, merchants, amounts)
+    # rows whose window reaches behind what was already dropped (later than the lateness bound)
+    # only see the rows still kept
+    exact = covered_rows(ts, merchants)
+    assert exact.mean() > 0.9
+    np.testing.assert_array_equal(got[exact], expected[exact])
+
+def test_future_dated_row_does_not_block_expiry():
+    n = 120
+    ts = 1_700_000_000 * NS + np.arange(n, dtype=np.int64) * 60 * NS   # 1 tx / minute
+    ts[0] += 3 * 3600 * NS                                               # first row 3 h in the future
+    merchants = ["CU"] * n
+    amounts = np.full(n, 500.0)
+    got, engine = engine_rules(ts, merchants, amounts, batch=10)
+    np.testing.assert_array_equal(got, baseline_rules(ts, merchants, amounts, in_window_only=True))
+    np.testing.assert_array_equal(got, in_window_rules(ts, merchants, amounts))
+    assert not got.any()
+    # the future row and the rows since the previous row's cutoff - lateness
+    limit = 1 + (60 + WINDOW_SEC + WINDOW_MAX_LATENESS_SEC) // 60 + 1
+    mw = engine._merchants["CU"]
+    assert max(len(engine._recent), len(mw.times), len(mw.small)) <= limit
+
+def test_past_dated_rows_count_only_their_window(tmp_path):
+    # off-hour injections are dated hours before the rows around them: their window must not
+    # count the (later dated) rows already seen
+    path = str(tmp_path / "tx.txt")
+    start = np.datetime64("2025-01-01T09:00:00")
+    gen.backfill(path, str(start), str(start + np.timedelta64(2000, "s")), 5.0, seed=1)
+    with open(path, encoding="utf-8") as f:
+        df = parse_block(f.read())[0].head(10000)
+    ts = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    merchants, amounts = df["merchant"].tolist(), df["amount"].to_numpy()
+    past = ts < np.maximum.accumulate(ts) - (WINDOW_SEC + WINDOW_MAX_LATENESS_SEC) * NS
+    assert past.sum() > 100
+    got, _ = engine_rules(ts, merchants, amounts)
+    expected = in_window_rules(ts, merchants, amounts)
+    exact = covered_rows(ts, merchants)
+    assert exact[past].mean() > 0.5
+    np.testing.assert_array_equal(got[past & exact], expected[past & exact])
+    assert not got[past].any()
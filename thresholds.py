@@ -0,0 +1,153 @@
+# thresholds.py
+# streaming, decaying quantile thresholds for detector scores (global and per segment)
+import math
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from config import (DETECTOR_THRESHOLD_PERCENTILE, THRESHOLD_SEGMENT, THRESHOLD_SKETCH_ALPHA,
+                    THRESHOLD_HALF_LIFE, THRESHOLD_MIN_COUNT, THRESHOLD_MAX_KEYS)
+from rules import hour_of
+
+# score range covered by the sketch buckets (values outside land in the end buckets)
+MIN_SCORE = 1e-6
+MAX_SCORE = 1e6
+SEGMENTS = ("global", "merchant", "hour", "merchant_hour")
+
+def segment_keys(df, segment):
+    """Segment key per row of a parsed batch."""
+    if segment == "merchant":
+        return df["merchant"].to_numpy(dtype=object)
+    hours = hour_of(df["timestamp"].to_numpy(dtype="datetime64[ns]"))
+    if segment == "hour":
+        return hours
+    return (df["merchant"].astype(str) + "|" + pd.Series(hours, index=df.index).astype(str)).to_numpy(dtype=object)
+
+class ThresholdTracker:
+    """Score quantile thresholds kept in decaying log-bucketed sketches.
+
+    One sketch row is global, the others belong to segment keys (merchant,
+    hour of day or both; at most max_keys, least recently seen evicted).
+    Buckets are DDSketch style, so quantiles are within `alpha` relative
+    error, and every sketch decays with a half-life of half_life scored
+    rows. The decay is lazy: new observations get a growing weight and the
+    table is renormalized rarely, so an update costs O(batch).
+
+    thresholds(df) gives each row the global quantile, raised to its
+    segment's quantile once that segment has min_count effective samples
+    (segments only suppress flags on naturally noisy merchants / hours).
+    Until the global sketch itself has min_count samples the model's
+    training threshold (`fallback`) is used. A retrained model does not
+    reset the sketches (that would keep them below min_count when models
+    are swapped every few hundred rows): rescale() shifts them to the new
+    model's score scale.
+    """
+
+    def __init__(self, fallback=None, percentile=DETECTOR_THRESHOLD_PERCENTILE, segment=THRESHOLD_SEGMENT,
+                 alpha=THRESHOLD_SKETCH_ALPHA, half_life=THRESHOLD_HALF_LIFE, min_count=THRESHOLD_MIN_COUNT,
+                 max_keys=THRESHOLD_MAX_KEYS):
+        if segment not in SEGMENTS:
+            raise ValueError(f"unknown threshold segment {segment!r}; choose from {', '.join(SEGMENTS)}")
+        self.q = percentile / 100.0
+        self.segment = segment
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.n_bins = int(math.ceil(math.log(MAX_SCORE / MIN_SCORE) / self._log_gamma)) + 1
+        self.half_life = half_life
+        self.min_count = min_count
+        self.max_keys = max_keys if segment != "global" else 0
+        self.counts = np.zeros((1 + self.max_keys, self.n_bins))   # row 0 is global
+        self.reset(fallback)
+
+    def reset(self, fallback=None):
+        """Forget all scores (e.g. a new model with another score scale)."""
+        self.fallback = fallback
+        self.counts[:] = 0.0
+        self._weight = 1.0          # weight of the next observation (grows instead of decaying the table)
+        self._slots = OrderedDict()  # segment key -> counts row, least recently seen first
+        self._free = list(range(self.max_keys, 0, -1))
+
+    def rescale(self, old_threshold, new_threshold):
+        """Carry the sketches over to a new model: shift them by new/old (the ratio of the two
+        models' training thresholds) and use new_threshold as fallback. False (nothing
+        changed) if the ratio is unusable; the caller then starts over with reset().
+        """
+        if not (old_threshold > 0 and new_threshold > 0 and math.isfinite(old_threshold)
+                and math.isfinite(new_threshold)):
+            return False
+        shift = int(round(math.log(new_threshold / old_threshold) / self._log_gamma))
+        if shift:
+            target = np.clip(np.arange(self.n_bins) + shift, 0, self.n_bins - 1)
+            counts = np.zeros_like(self.counts)
+            np.add.at(counts.T, target, self.counts.T)
+            self.counts = counts
+        self.fallback = new_threshold
+        return True
+
+    def _bins(self, scores):
+        b = np.ceil(np.log(np.maximum(scores, MIN_SCORE) / MIN_SCORE) / self._log_gamma)
+        return np.clip(b, 0, self.n_bins - 1).astype(np.int64)
+
+    def _quantiles(self, rows):
+        """Quantile and effective count of counts rows."""
+        c = self.counts[rows]
+        cum = np.cumsum(c, axis=1)
+        total = cum[:, -1]
+        idx = np.minimum((cum <= (self.q * total)[:, None]).sum(axis=1), self.n_bins - 1)
+        return MIN_SCORE * 2 * self.gamma ** idx / (self.gamma + 1), total / self._weight
+
+    def global_threshold(self):
+        value, n = self._quantiles([0])
+        return float(value[0]) if n[0] >= self.min_count or self.fallback is None else self.fallback
+
+    def thresholds(self, df):
+        """Threshold per row of a parsed batch (from the scores seen before this batch)."""
+        out = np.full(len(df), self.global_threshold(), dtype=np.float64)
+        if not self.max_keys or not len(df) or not self._slots:
+            return out
+        codes, uniques = pd.factorize(segment_keys(df, self.segment))
+        slots = np.array([self._slots.get(k, 0) for k in uniques.tolist()], dtype=np.int64)
+        known = np.flatnonzero(slots)
+        if not len(known):
+            return out
+        value, n = self._quantiles(slots[known])
+        seg = np.full(len(uniques), -np.inf)
+        seg[known[n >= self.min_count]] = value[n >= self.min_count]
+        return np.maximum(out, seg[codes])
+
+    def update(self, df, scores):
+        """Add a batch's scores (after its rows were evaluated) and advance the decay."""
+        scores = np.asarray(scores, dtype=np.float64)
+        ok = np.isfinite(scores)
+        if not ok.any():
+            return
+        bins = self._bins(scores[ok])
+        w = self._weight
+        np.add.at(self.counts[0], bins, w)
+        if self.max_keys:
+            codes, uniques = pd.factorize(segment_keys(df, self.segment)[ok])
+            slot_of = np.empty(len(uniques), dtype=np.int64)
+            for i, k in enumerate(uniques.tolist()):
+                slot_of[i] = self._slot(k)
+            np.add.at(self.counts, (slot_of[codes], bins), w)
+        # decay: older observations lose half their weight every half_life rows
+        if self.half_life:
+            self._weight *= 2.0 ** (len(bins) / self.half_life)
+            if self._weight > 1e12:
+                self.counts /= self._weight
+                self._weight = 1.0
+
+    def _slot(self, key):
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            return slot
+        if not self._free:
+            _, slot = self._slots.popitem(last=False)
+            self.counts[slot] = 0.0
+        else:
+            slot = self._free.pop()
+        self._slots[key] = slot
+        return slot
+
+    def __len__(self):
+        return len(self._slots)
@@ -0,0 +1,347 @@
+# tx_binary.py
+# compact binary transaction log: fixed-width little-endian records behind a 64-byte header,
+# merchant / region names interned in an append-only side dictionary (<path>.dict)
+#   python tx_binary.py to-binary ./logs/tx_log.txt ./logs/tx_log.bin
+#   python tx_binary.py to-text ./logs/tx_log.bin ./logs/tx_log.txt
+import argparse, mmap, os, struct, threading, time
+import numpy as np
+import pandas as pd
+from config import TAIL_MAX_BATCH_BYTES
+from tx_parser import iter_blocks, parse_block, format_lines
+from tailer import LogTailer
+
+MAGIC = b"TXBIN\x00\x00\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sHHI48x")   # magic, version, record size, reserved -> 64 bytes
+RECORD_DTYPE = np.dtype([
+    ("ts_ms", "<i8"),       # epoch milliseconds (UTC-naive, like the text timestamps)
+    ("amount", "<f8"),
+    ("latency", "<f8"),     # ms (f8: same values as the text parser)
+    ("merchant", "<u4"),    # dictionary ids
+    ("region", "<u2"),
+    ("status", "u1"),       # 1 = SUCCESS, 0 = FAIL
+    ("flags", "u1"),        # reserved
+])
+RECORD_SIZE = RECORD_DTYPE.itemsize   # 32 bytes
+DICT_SUFFIX = ".dict"
+KINDS = ("merchant", "region")
+_EMPTY = np.empty(0, dtype=RECORD_DTYPE)
+
+def check_header(data):
+    magic, version, record_size, _ = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a binary transaction log")
+    if version != VERSION or record_size != RECORD_SIZE:
+        raise ValueError(f"unsupported binary log version {version} (record size {record_size})")
+
+class TxDictionary:
+    """Append-only name <-> id tables of a binary log ("kind<TAB>id<TAB>name" lines).
+
+    Writers append new names (and flush) before the records that use them,
+    so a reader that meets an unknown id only has to read the new lines.
+    The dictionary outlives log rotation: ids stay valid for every file
+    written under the same path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.names = {k: [] for k in KINDS}
+        self.ids = {k: {} for k in KINDS}
+        self._offset = 0
+        self._arrays = {}   # kind -> names as an object array (for lookup)
+        self.refresh()
+
+    def refresh(self):
+        """Load lines appended since the last call."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        cut = data.rfind(b"\n") + 1
+        self._offset += cut
+        for line in data[:cut].decode("utf-8").splitlines():
+            kind, i, name = line.split("\t", 2)
+            if int(i) != len(self.names[kind]):
+                raise ValueError(f"corrupt dictionary {self.path}: {line!r}")
+            self.ids[kind][name] = len(self.names[kind])
+            self.names[kind].append(name)
+
+    def intern(self, kind, values):
+        """Dictionary id per value, adding new names to the file first."""
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        table = self.ids[kind]
+        new = [u for u in uniques.tolist() if u not in table]
+        if new:
+            limit = np.iinfo(RECORD_DTYPE[kind]).max + 1
+            if len(self.names[kind]) + len(new) > limit:
+                raise ValueError(f"{kind} dictionary full: at most {limit} names fit the {RECORD_DTYPE[kind].name} id field")
+            lines = []
+            for name in new:
+                if "\t" in name or "\n" in name:
+                    raise ValueError(f"invalid {kind} name: {name!r}")
+                table[name] = len(self.names[kind])
+                lines.append(f"{kind}\t{table[name]}\t{name}\n")
+                self.names[kind].append(name)
+            with open(self.path, "ab") as f:
+                f.write("".join(lines).encode("utf-8"))
+                self._offset = f.tell()
+            self._arrays.pop(kind, None)
+        lookup = np.fromiter((table[u] for u in uniques.tolist()), dtype=np.int64, count=len(uniques))
+        return lookup[codes]
+
+    def lookup(self, kind, ids):
+        """Names for an id array (object array)."""
+        ids = np.asarray(ids)
+        if len(ids) and int(ids.max()) >= len(self.names[kind]):
+            self.refresh()
+        arr = self._arrays.get(kind)
+        if arr is None or len(arr) != len(self.names[kind]):
+            arr = self._arrays[kind] = np.array(self.names[kind], dtype=object)
+        return arr[ids]
+
+def to_frame(records, dictionary):
+    """Parsed-transaction DataFrame (tx_parser columns without raw) from records."""
+    return pd.DataFrame({
+        "timestamp": (records["ts_ms"].astype(np.int64) * 1_000_000).view("datetime64[ns]"),
+        "status": records["status"].astype(np.int8),
+        "latency": records["latency"],
+        "merchant": dictionary.lookup("merchant", records["merchant"]),
+        "region": dictionary.lookup("region", records["region"]),
+        "amount": records["amount"],
+    })
+
+# ---- writing ----
+class BinaryLogWriter:
+    """Appends records to a binary log (creating it with its header).
+
+    vocabulary = {"merchant": [...], "region": [...]} interns names in a
+    fixed order up front, so several writers produce compatible ids.
+    """
+
+    def __init__(self, path, vocabulary=None):
+        self.path = path
+        self._f = open(path, "ab")
+        if self._f.tell() == 0:
+            self._f.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, 0))
+        else:
+            with open(path, "rb") as f:
+                check_header(f.read(HEADER.size))
+        self.dictionary = TxDictionary(path + DICT_SUFFIX)
+        for kind, names in (vocabulary or {}).items():
+            self.dictionary.intern(kind, list(names))
+
+    def write_columns(self, ts, status, latency, merchant, region, amount):
+        """ts: datetime64 or epoch-ns int array; status: 1/0 or "SUCCESS"/"FAIL"."""
+        n = len(ts)
+        rec = np.zeros(n, dtype=RECORD_DTYPE)
+        ts = np.asarray(ts)
+        if np.issubdtype(ts.dtype, np.datetime64):
+            ts = ts.astype("datetime64[ns]").view(np.int64)
+        rec["ts_ms"] = np.asarray(ts, dtype=np.int64) // 1_000_000
+        status = np.asarray(status)
+        rec["status"] = (status == "SUCCESS") if status.dtype == object else status.astype(bool)
+        rec["latency"] = latency
+        rec["merchant"] = self.dictionary.intern("merchant", merchant)
+        rec["region"] = self.dictionary.intern("region", region)
+        rec["amount"] = amount
+        self._f.write(rec.tobytes())
+        return n
+
+    def write_frame(self, df):
+        """Write parsed rows (see tx_parser.parse_block)."""
+        return self.write_columns(df["timestamp"].to_numpy(dtype="datetime64[ns]"), df["status"].to_numpy(),
+                                  df["latency"].to_numpy(), df["merchant"].to_numpy(dtype=object),
+                                  df["region"].to_numpy(dtype=object), df["amount"].to_numpy())
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ---- reading ----
+class BinaryLog:
+    """Read-only memory map of a binary log; records() are zero-copy structured views.
+
+    The map follows the file as it grows (and is replaced on rotation or
+    truncation); views taken earlier stay valid.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dictionary = TxDictionary(path + DICT_SUFFIX)
+        self._mm = None
+        self._key = None
+        self._lock = threading.Lock()
+        self._tail = (None, None)
+
+    def _map(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._mm, self._key = None, None
+            return
+        key = (st.st_ino, st.st_size)
+        if key == self._key:
+            return
+        self._key = key
+        if st.st_size < HEADER.size:
+            self._mm = None
+            return
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        check_header(mm)
+        self._mm = mm
+
+    def __len__(self):
+        self._map()
+        return 0 if self._mm is None else (len(self._mm) - HEADER.size) // RECORD_SIZE
+
+    def records(self, start=0, stop=None):
+        n = len(self)
+        start, stop, _ = slice(start, stop).indices(n)
+        if stop <= start:
+            return _EMPTY
+        return np.frombuffer(self._mm, RECORD_DTYPE, stop - start, HEADER.size + start * RECORD_SIZE)
+
+    def tail(self, n):
+        return self.records(max(0, len(self) - n))
+
+    def frame(self, records):
+        return to_frame(records, self.dictionary)
+
+    def tail_frame(self, n):
+        """Last n transactions as a DataFrame; cached until the file changes (shared, do not modify)."""
+        with self._lock:
+            records = self.tail(n)
+            key = (self._key, n)
+            if self._tail[0] != key:
+                self._tail = (key, self.frame(records))
+            return self._tail[1]
+
+class BinaryTailer(LogTailer):
+    """LogTailer for binary logs: read() returns the newly completed records.
+
+    Records are zero-copy views of a memory map of the open file (kept
+    across renames, so a rotated file is drained before switching). The
+    offsets used by position() / commit() / lag_bytes() are byte offsets
+    as for text logs; a partially written record is left for the next read.
+    """
+
+    def __init__(self, path, offset_file=None, max_batch_bytes=TAIL_MAX_BATCH_BYTES, use_inotify=True):
+        self.dictionary = TxDictionary(path + DICT_SUFFIX)
+        self._mm = None
+        super().__init__(path, offset_file, max_batch_bytes=max_batch_bytes, use_inotify=use_inotify)
+
+    def _open(self, st):
+        if self._fh is not None:
+            self._fh.close()
+        self._fh = open(self.path, "rb")
+        if st.st_ino != self._inode:
+            self._offset = 0
+        self._inode = st.st_ino
+        self._mm = None
+
+    def _remap(self):
+        size = os.fstat(self._fh.fileno()).st_size
+        if size < HEADER.size or (self._mm is not None and size == len(self._mm)):
+            return
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._offset < HEADER.size:
+            check_header(self._mm)
+            self._offset = HEADER.size
+
+    def _take(self, budget):
+        self._remap()
+        if self._mm is None:
+            return _EMPTY
+        n = min((len(self._mm) - self._offset) // RECORD_SIZE, max(1, budget // RECORD_SIZE))
+        if n <= 0:
+            return _EMPTY
+        records = np.frombuffer(self._mm, RECORD_DTYPE, n, self._offset)
+        self._offset += n * RECORD_SIZE
+        return records
+
+    def read(self):
+        """Structured array of new records (empty if nothing new)."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return _EMPTY
+        if self._notify is not None:
+            self._notify.drain()
+        out = []
+        if self._fh is None:
+            self._open(st)
+        elif st.st_ino != self._inode:
+            # rotated: drain the old map first, over several reads if it is behind by more than one batch
+            records = self._take(self.max_batch_bytes)
+            if self._mm is not None and len(self._mm) - self._offset >= RECORD_SIZE:
+                return records
+            out.append(records)
+            self._open(st)
+        elif st.st_size < self._offset:
+            self._offset = 0   # truncated in place
+            self._open(st)
+        out.append(self._take(self.max_batch_bytes - sum(r.nbytes for r in out)))
+        out = [r for r in out if len(r)]
+        if not out:
+            return _EMPTY
+        return out[0] if len(out) == 1 else np.concatenate(out)
+
+    def to_frame(self, records):
+        return to_frame(records, self.dictionary)
+
+    def close(self):
+        self._mm = None
+        super().close()
+
+# ---- conversion ----
+def text_to_binary(src, dst, block_chars=8 << 20):
+    """Convert a text log; returns (records written, malformed lines skipped)."""
+    writer = BinaryLogWriter(dst)
+    rows = malformed = 0
+    try:
+        for text in iter_blocks(src, block_chars):
+            df, bad = parse_block(text)
+            rows += writer.write_frame(df)
+            malformed += bad
+    finally:
+        writer.close()
+    return rows, malformed
+
+def binary_to_text(src, dst, chunk_records=200_000):
+    """Convert a binary log to text lines; returns the number of lines written."""
+    log = BinaryLog(src)
+    n = len(log)
+    with open(dst, "w", encoding="utf-8") as f:
+        for start in range(0, n, chunk_records):
+            f.write("".join(line + "\n" for line in format_lines(log.frame(log.records(start, start + chunk_records)))))
+    return n
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Convert transaction logs between the text and binary formats.")
+    ap.add_argument("direction", choices=["to-binary", "to-text"])
+    ap.add_argument("src")
+    ap.add_argument("dst")
+    args = ap.parse_args()
+    if os.path.exists(args.dst):
+        ap.error(f"{args.dst} already exists")
+    t0 = time.perf_counter()
+    if args.direction == "to-binary":
+        n, malformed = text_to_binary(args.src, args.dst)
+        print(f"{n:,} records ({malformed} malformed lines skipped) -> {args.dst}")
+    else:
+        n = binary_to_text(args.src, args.dst)
+        print(f"{n:,} lines -> {args.dst}")
+    dt = time.perf_counter() - t0
+    src_mb, dst_mb = os.path.getsize(args.src) / 1e6, os.path.getsize(args.dst) / 1e6
+    print(f"{src_mb:.1f} MB -> {dst_mb:.1f} MB in {dt:.1f}s ({n / max(dt, 1e-9):,.0f} records/sec)")
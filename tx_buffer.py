@@ -0,0 +1,65 @@
+# tx_buffer.py
+import numpy as np
+import pandas as pd
+
+# column name -> dtype of the parsed rolling buffer (raw text is not kept)
+BUFFER_COLUMNS = {
+    "timestamp": "datetime64[ns]",
+    "status": np.int8,
+    "latency": np.float64,
+    "merchant": object,
+    "region": object,
+    "amount": np.float64,
+}
+
+class TxRingBuffer:
+    """Fixed-capacity, column-oriented ring buffer of parsed transactions.
+
+    Each line is parsed once, appended into preallocated NumPy columns and the
+    oldest rows are overwritten in place once the buffer is full.
+    """
+
+    def __init__(self, capacity=5000):
+        self.capacity = int(capacity)
+        self._cols = {c: np.empty(self.capacity, dtype=dt) for c, dt in BUFFER_COLUMNS.items()}
+        self._head = 0   # next write position
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, df):
+        """Append the rows of a parsed DataFrame (see parse_lines)."""
+        n = len(df)
+        if n == 0:
+            return
+        if n > self.capacity:
+            df = df.iloc[n - self.capacity:]
+            n = self.capacity
+        for c in BUFFER_COLUMNS:
+            values = df[c].to_numpy()
+            if c == "timestamp":
+                values = pd.to_datetime(values).values
+            self._write(self._cols[c], values)
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def _write(self, col, values):
+        # at most two contiguous slices: [head:end] then wrap to [0:rest]
+        n = len(values)
+        first = min(n, self.capacity - self._head)
+        col[self._head:self._head + first] = values[:first]
+        if first < n:
+            col[:n - first] = values[first:]
+
+    def column(self, name):
+        """Return one column in insertion order (oldest first)."""
+        col = self._cols[name]
+        start = (self._head - self._size) % self.capacity
+        if start + self._size <= self.capacity:
+            return col[start:start + self._size].copy()
+        return np.concatenate((col[start:], col[:self._head]))
+
+    def to_frame(self):
+        """Snapshot of the buffer as a DataFrame, oldest row first."""
+        return pd.DataFrame({c: self.column(c) for c in BUFFER_COLUMNS})
@@ -0,0 +1,181 @@
+# tx_parser.py
+# shared bulk parser for transaction log lines (used by ai_monitor.py and app.py)
+import io, re
+import numpy as np
+import pandas as pd
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+COLUMNS = ["timestamp", "status", "latency", "merchant", "region", "amount", "raw"]
+
+# field grammar shared by both paths (numbers: unsigned decimals, no exponent / sign;
+# the amount ends at whitespace or the end of the line)
+NUMBER = r"\d+(?:\.\d*)?|\.\d+"
+TS_FIELD = re.compile(r"[^\]\n]+")
+STATUS_FIELD = re.compile(r"\w+")
+NAME_FIELD = re.compile(r"\S+")
+
+# fallback: one regex scan over the whole block; group 1 is the stripped line (raw)
+TX_BLOCK_PATTERN = re.compile(
+    r"^[ \t]*(.*?\[([^\]\n]+)\][ \t]+status=(\w+)[ \t]+latency=(" + NUMBER + r")ms[ \t]+merchant=(\S+)[ \t]+region=(\S+)[ \t]+amount=(" + NUMBER + r")(?!\S).*?)[ \t\r]*$",
+    re.M,
+)
+BLANK_PATTERN = re.compile(r"^[ \t\r]*$", re.M)
+
+# fast path: "[ts] status=S latency=Lms merchant=M region=R amount=A" becomes
+# "[ts\tS\tL\tM\tR\tA" and is handed to the C csv tokenizer
+FIELD_SEPARATORS = ["] status=", " latency=", "ms merchant=", " region=", " amount="]
+CSV_DTYPES = {0: object, 1: object, 2: np.float64, 3: object, 4: object, 5: np.float64}
+# the csv float parser also takes signs, exponents, inf / nan: a block with such a number
+# (anything but NUMBER-like digits and dots) is left to the regex path
+_FAST_BAD_NUMBER = re.compile(r" latency=(?![\d.]+ms merchant=)| amount=(?![\d.]+$)", re.M)
+
+# many lines share the same second -> parse each timestamp string once
+_TS_CACHE = {}
+TS_CACHE_MAX = 200_000
+
+def _parse_timestamps(ts_strings):
+    codes, uniques = pd.factorize(np.asarray(ts_strings, dtype=object))
+    missing = [u for u in uniques if u not in _TS_CACHE]
+    if missing:
+        if len(_TS_CACHE) + len(missing) > TS_CACHE_MAX:
+            _TS_CACHE.clear()
+        stripped = pd.Series([u.lstrip("[") for u in missing], dtype=object)
+        parsed = pd.to_datetime(stripped, format=TS_FORMAT, errors="coerce")
+        bad = parsed.isna().to_numpy()
+        if bad.any():
+            # non-standard formats: fall back to pandas inference
+            parsed[bad] = pd.to_datetime(stripped[bad], errors="coerce", format="mixed")
+        _TS_CACHE.update(zip(missing, parsed.to_numpy(dtype="datetime64[ns]")))
+    lookup = np.array([_TS_CACHE[u] for u in uniques], dtype="datetime64[ns]")
+    return lookup[codes]
+
+def empty_frame():
+    return pd.DataFrame({
+        "timestamp": np.array([], dtype="datetime64[ns]"),
+        "status": np.array([], dtype=np.int8),
+        "latency": np.array([], dtype=np.float64),
+        "merchant": np.array([], dtype=object),
+        "region": np.array([], dtype=object),
+        "amount": np.array([], dtype=np.float64),
+        "raw": np.array([], dtype=object),
+    })
+
+def _frame(ts, status, lat, merchant, region, amount, raw):
+    return pd.DataFrame({
+        "timestamp": _parse_timestamps(ts),
+        "status": (np.asarray(status, dtype=object) == "SUCCESS").astype(np.int8),
+        "latency": lat,
+        "merchant": np.asarray(merchant, dtype=object),
+        "region": np.asarray(region, dtype=object),
+        "amount": amount,
+        "raw": np.asarray(raw, dtype=object),
+    })
+
+def _parse_fast(text):
+    """Tokenize a block of well-formed lines with the C csv reader.
+
+    Returns None when the block contains anything unusual (blank or
+    malformed lines, extra whitespace); the caller then uses the regex path.
+    """
+    text = text.rstrip("\n")
+    if not text or "\n\n" in text or "\t" in text or "\r" in text or text[0] != "[":
+        return None
+    n = text.count("\n") + 1
+    if text.count("\n[") != n - 1:
+        return None
+    if _FAST_BAD_NUMBER.search(text):
+        return None
+    tabbed = text
+    for sep in FIELD_SEPARATORS:
+        tabbed = tabbed.replace(sep, "\t")
+    # exactly five separators and the single space inside the timestamp per line
+    if tabbed.count("\t") != 5 * n or tabbed.count(" ") != n:
+        return None
+    try:
+        cols = pd.read_csv(io.StringIO(tabbed), sep="\t", header=None, engine="c",
+                           quoting=3, na_filter=False, dtype=CSV_DTYPES)
+    except ValueError:
+        return None
+    if len(cols) != n:
+        return None
+    ts, status, merchant, region = (cols[i].to_numpy(object) for i in (0, 1, 3, 4))
+    # anything else the regex path would reject (e.g. status=N/A, an empty merchant) goes there too
+    if (not _fields_match(ts, TS_FIELD, 1) or not _fields_match(status, STATUS_FIELD)
+            or not _fields_match(merchant, NAME_FIELD) or not _fields_match(region, NAME_FIELD)):
+        return None
+    return _frame(ts, status, cols[2].to_numpy(), merchant, region, cols[5].to_numpy(), text.split("\n"))
+
+def _fields_match(values, pattern, skip=0):
+    # checked once per distinct value (few merchants / statuses / timestamps per block)
+    return all(pattern.fullmatch(u, skip) for u in pd.unique(values).tolist())
+
+def _drop_bad_timestamps(df, malformed):
+    # a line matching the grammar with an impossible timestamp (NaT) is malformed too:
+    # NaT rows would turn into NaN features and break training
+    bad = np.isnat(df["timestamp"].to_numpy(dtype="datetime64[ns]"))
+    if bad.any():
+        df = df[~bad].reset_index(drop=True)
+        malformed += int(bad.sum())
+    return df, malformed
+
+def parse_block(text):
+    """Parse a block of newline separated log lines into typed columns.
+
+    Returns (DataFrame, malformed) where malformed is the number of
+    non-blank lines that did not match the transaction format (or whose
+    timestamp could not be parsed).
+    """
+    df = _parse_fast(text)
+    if df is not None:
+        return _drop_bad_timestamps(df, 0)
+
+    matches = TX_BLOCK_PATTERN.findall(text)
+    n_lines = text.count("\n") + 1
+    malformed = n_lines - len(BLANK_PATTERN.findall(text)) - len(matches)
+    if not matches:
+        return empty_frame(), malformed
+    raw, ts, status, lat, merchant, region, amount = zip(*matches)
+    df = _frame(ts, status, np.array(lat, dtype=np.float64), merchant, region,
+                np.array(amount, dtype=np.float64), raw)
+    return _drop_bad_timestamps(df, malformed)
+
+def format_lines(df):
+    """Text log lines (without newline) for parsed rows, e.g. records of the binary log."""
+    ts = np.datetime_as_string(df["timestamp"].to_numpy(dtype="datetime64[ns]").astype("datetime64[s]")).tolist()
+    status = np.where(df["status"].to_numpy() == 1, "SUCCESS", "FAIL").tolist()
+    amount = [f"{a:.0f}" if a.is_integer() else repr(a) for a in df["amount"].to_numpy(dtype=np.float64).tolist()]
+    return [f"[{t.replace('T', ' ')}] status={s} latency={l:.1f}ms merchant={m} region={r} amount={a}"
+            for t, s, l, m, r, a in zip(ts, status, df["latency"].tolist(), df["merchant"].tolist(),
+                                        df["region"].tolist(), amount)]
+
+def iter_blocks(path, block_chars=8 << 20):
+    """Read a log file as blocks of complete lines (about block_chars each).
+
+    Memory stays bounded by the block size; a last line without a trailing
+    newline is returned as well.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        rest = ""
+        while True:
+            data = f.read(block_chars)
+            if not data:
+                break
+            data = rest + data
+            cut = data.rfind("\n") + 1
+            if cut == 0:
+                rest = data
+                continue
+            rest = data[cut:]
+            yield data[:cut]
+        if rest:
+            yield rest
+
+def parse_lines(lines):
+    """Parse a list of log lines; the malformed count is kept in df.attrs."""
+    if lines and lines[0].endswith("\n"):
+        text = "".join(lines)
+    else:
+        text = "\n".join(lines)
+    df, malformed = parse_block(text)
+    df.attrs["malformed"] = malformed
+    return df
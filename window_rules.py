@@ -0,0 +1,181 @@
+# window_rules.py
+# incremental sliding-window counters for the behavioral rules
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+import numpy as np
+from config import (WINDOW_SEC, WINDOW_MAX_LATENESS_SEC, BURST_THRESHOLD, CARD_TEST_MAX_AMOUNT,
+                    CARD_TEST_THRESHOLD, MERCHANT_SPIKE_THRESHOLD, MERCHANT_IDLE_SEC, MAX_MERCHANT_KEYS)
+
+NS = 1_000_000_000
+COMPACT_MIN = 4096   # dropped entries kept in a window's list before it is compacted
+
+class _Window:
+    """Event timestamps (ns) in sorted order; ts[head:] are the live entries.
+
+    In-order rows append, a late row is inserted at its place. count()
+    returns the entries in the row's window [cutoff, t] (entries dated
+    after the row are not part of it) and drops those older than a
+    horizon, so a late or future-dated entry never keeps expired ones
+    alive behind it. The horizon is the older of this row's and the
+    previous row's cutoff, minus `lateness`: rows up to that much out of
+    order still see every row of their window, and a single future-dated
+    row does not drop the current window's rows.
+    """
+    __slots__ = ("ts", "head", "prev_cutoff")
+
+    def __init__(self):
+        self.ts = []
+        self.head = 0
+        self.prev_cutoff = None
+
+    def add(self, t):
+        ts = self.ts
+        if not ts or t >= ts[-1]:
+            ts.append(t)
+        else:
+            insort(ts, t, self.head)
+
+    def count(self, t, cutoff, lateness):
+        prev, self.prev_cutoff = self.prev_cutoff, cutoff
+        horizon = (cutoff if prev is None else min(cutoff, prev)) - lateness
+        ts = self.ts
+        head = bisect_left(ts, horizon, self.head)
+        if head > COMPACT_MIN and 2 * head > len(ts):
+            del ts[:head]
+            head = 0
+        self.head = head
+        end = bisect_right(ts, t, head) if ts and t < ts[-1] else len(ts)
+        return end - bisect_left(ts, cutoff, head)
+
+    def __len__(self):
+        return len(self.ts) - self.head
+
+class _MerchantWindow:
+    __slots__ = ("times", "small", "last_ts")
+
+    def __init__(self):
+        self.times = _Window()   # timestamps of all tx of this merchant
+        self.small = _Window()   # timestamps of small-amount tx (card testing)
+        self.last_ts = 0
+
+class WindowRuleEngine:
+    """burst / card_testing / merchant_spike with incremental per-row updates.
+
+    Each window keeps event timestamps (ns) sorted (see _Window); a row
+    counts the entries in [ts - window_sec, ts], like the original rule
+    (which only saw earlier rows). Entries older than the cutoff minus
+    lateness_sec are dropped, so a window holds about window_sec +
+    lateness_sec of rows however the timestamps are ordered, and rows
+    arriving up to lateness_sec out of order are counted exactly (in-order
+    rows cost an append and two bisects). Per-merchant state lives in an LRU
+    ordered dict; sweep() evicts merchants idle for idle_sec (and the least
+    recently used beyond max_keys), so one-off merchants do not accumulate
+    forever. Sweeps run between batches against the highest timestamp seen,
+    so the evicted set only depends on each merchant's own rows and the
+    batch boundaries (merchant-sharded engines evict exactly like one engine).
+    max_keys bounds this engine only: with DETECT_WORKERS each shard has
+    its own engine, so up to workers * max_keys merchants are kept overall,
+    and once a shard is over its limit the LRU eviction depends on the
+    shard's merchants and no longer matches a single engine.
+    """
+
+    def __init__(self, window_sec=WINDOW_SEC, burst_threshold=BURST_THRESHOLD,
+                 card_test_max_amount=CARD_TEST_MAX_AMOUNT, card_test_threshold=CARD_TEST_THRESHOLD,
+                 spike_threshold=MERCHANT_SPIKE_THRESHOLD, idle_sec=MERCHANT_IDLE_SEC,
+                 max_keys=MAX_MERCHANT_KEYS, lateness_sec=WINDOW_MAX_LATENESS_SEC):
+        self.window_ns = int(window_sec * NS)
+        self.lateness_ns = int(lateness_sec * NS)
+        self.burst_threshold = burst_threshold
+        self.card_test_max_amount = card_test_max_amount
+        self.card_test_threshold = card_test_threshold
+        self.spike_threshold = spike_threshold
+        self.idle_ns = int(max(idle_sec, window_sec) * NS)
+        self.max_keys = max_keys
+        self._recent = _Window()
+        self._merchants = OrderedDict()
+        self._watermark = None
+        self._next_sweep = None
+
+    def __len__(self):
+        return len(self._merchants)
+
+    def update_burst(self, ts):
+        """Add one transaction to the global window; returns burst flag."""
+        recent = self._recent
+        recent.add(ts)
+        return recent.count(ts, ts - self.window_ns, self.lateness_ns) >= self.burst_threshold
+
+    def update_merchant(self, ts, merchant, amount):
+        """Add one transaction to its merchant window; returns (card_testing, merchant_spike)."""
+        merchants = self._merchants
+        mw = merchants.get(merchant)
+        if mw is None:
+            mw = merchants[merchant] = _MerchantWindow()
+        else:
+            merchants.move_to_end(merchant)
+        cutoff = ts - self.window_ns
+        mw.times.add(ts)
+        if amount < self.card_test_max_amount:
+            mw.small.add(ts)
+        if ts > mw.last_ts:
+            mw.last_ts = ts
+        return (mw.small.count(ts, cutoff, self.lateness_ns) >= self.card_test_threshold,
+                mw.times.count(ts, cutoff, self.lateness_ns) >= self.spike_threshold)
+
+    def sweep(self, now):
+        """Evict idle merchants; now is the batch's latest timestamp (ns).
+
+        The idle scan runs at most once per window of watermark time.
+        """
+        if self._watermark is None or now > self._watermark:
+            self._watermark = now
+        merchants = self._merchants
+        if self._next_sweep is None or self._watermark >= self._next_sweep:
+            self._next_sweep = self._watermark + self.window_ns
+            idle_cutoff = self._watermark - self.idle_ns
+            for key in [k for k, mw in merchants.items() if mw.last_ts < idle_cutoff]:
+                del merchants[key]
+        while len(merchants) > self.max_keys:
+            merchants.popitem(last=False)
+
+    def update(self, ts, merchant, amount):
+        """ts in epoch ns; returns (burst, card_testing, merchant_spike). Call sweep() periodically."""
+        burst = self.update_burst(ts)
+        card_testing, spike = self.update_merchant(ts, merchant, amount)
+        return burst, card_testing, spike
+
+    def evaluate_burst(self, ts):
+        """Global window only (row order); returns the burst bool array."""
+        update = self.update_burst
+        return np.fromiter((update(t) for t in ts.tolist()), dtype=bool, count=len(ts))
+
+    def evaluate_merchants(self, ts, merchants, amounts, now=None):
+        """Merchant windows only (row order); returns (card_testing, merchant_spike) bool arrays.
+
+        Used by the sharded workers, which each see every row of their merchants;
+        now is the latest timestamp of the whole batch (default: of ts).
+        """
+        n = len(ts)
+        card_testing = np.zeros(n, dtype=bool)
+        spike = np.zeros(n, dtype=bool)
+        update = self.update_merchant
+        for i, (t, m, a) in enumerate(zip(ts.tolist(), merchants, amounts.tolist())):
+            card_testing[i], spike[i] = update(t, m, a)
+        if now is None and n:
+            now = int(ts.max())
+        if now is not None:
+            self.sweep(now)
+        return card_testing, spike
+
+    def evaluate(self, ts, merchants, amounts):
+        """Batch form of update() over arrays in row order; returns three bool arrays."""
+        n = len(ts)
+        burst = np.zeros(n, dtype=bool)
+        card_testing = np.zeros(n, dtype=bool)
+        spike = np.zeros(n, dtype=bool)
+        update = self.update
+        for i, (t, m, a) in enumerate(zip(ts.tolist(), merchants, amounts.tolist())):
+            burst[i], card_testing[i], spike[i] = update(t, m, a)
+        if n:
+            self.sweep(int(ts.max()))
+        return burst, card_testing, spike